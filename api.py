@@ -0,0 +1,237 @@
+import argparse
+import json
+import math
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from recomendador import (CICLOS_TABLA, BaseCompacta, aplicar_pronostico, cargar_precios_mensuales,
+                          crear_base_conocimiento, recomendar_todos)
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+HOST = '0.0.0.0'
+PUERTO = 8000
+MAX_CONSULTAS_LOTE = 1000  # Consultas aceptadas en una sola petición
+FUENTES = ('historico', 'pronostico')  # Índice con que se ordenan los meses de cosecha
+
+def _limpiar(valor):
+    """Convierte NaN en None para que el JSON sea válido."""
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return valor
+
+def _registros(df):
+    return [{k: _limpiar(v) for k, v in fila.items()} for fila in df.to_dict('records')]
+
+def _entero(valor):
+    """Entero de un texto o número JSON; None si no lo es (5.5, "abc", [])."""
+    if isinstance(valor, float):
+        return int(valor) if valor.is_integer() else None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+# ============================================
+# 1. SERVICIO EN MEMORIA
+# ============================================
+class ServicioRecomendador:
+    """
+    Carga la base de conocimiento una vez y responde consultas desde memoria.
+    Las recomendaciones para los ciclos 1-36 quedan precalculadas; otros
+    ciclos se calculan la primera vez y se memorizan.
+    Con `pronosticos` (salida de pronostico.pronosticar) también responde
+    la fuente 'pronostico': meses ordenados por el precio pronosticado.
+    """
+
+    def __init__(self, pronosticos=None):
+        base, ciclos = crear_base_conocimiento()
+        # Residente en cada worker: se guarda compacta, no el DataFrame largo
+        self.base = BaseCompacta.desde_base(base)
+        self.bases = {'historico': self.base}
+        if pronosticos is not None:
+            self.bases['pronostico'] = BaseCompacta.desde_base(aplicar_pronostico(base, pronosticos))
+        self.ciclo_por_defecto = {p: int(c) for p, c in zip(ciclos['producto'], ciclos['ciclo_meses'])}
+
+        productos, matriz = self.base.matriz_recomendacion()
+        self.productos = sorted(productos)
+        self.indices = {p: [round(float(x), 4) for x in fila] for p, fila in zip(productos, matriz)}
+
+        self.tablas = {}
+        for fuente, base_fuente in self.bases.items():
+            tabla = recomendar_todos(base_fuente, CICLOS_TABLA)
+            self.tablas[fuente] = {(r['producto'], r['ciclo_meses']): r for r in _registros(tabla)}
+
+        precios = cargar_precios_mensuales()
+        self.precios = {}
+        if not precios.empty:
+            precios = precios.sort_values(['producto', 'año', 'mes'])
+            for producto, grupo in precios.groupby('producto', observed=True):
+                self.precios[producto] = _registros(
+                    grupo[['año', 'mes', 'precio_promedio', 'desv_estandar', 'num_registros']])
+
+        # Memoización de ciclos fuera de la tabla
+        self._recomendar_fuera_de_tabla = lru_cache(maxsize=4096)(self._calcular)
+
+    def _calcular(self, producto, ciclo, fuente):
+        df = recomendar_todos(self.bases[fuente].subconjunto([producto]), [ciclo])
+        return _registros(df)[0] if not df.empty else None
+
+    def recomendar(self, producto, ciclo=None, fuente='historico'):
+        """Recomendación para un producto; retorna (dict, código HTTP)."""
+        if fuente not in FUENTES:
+            return {'error': f"Fuente inválida: {fuente} (use {' o '.join(FUENTES)})."}, 400
+        if fuente not in self.bases:
+            return {'error': "Los pronósticos no están cargados (inicie la API con --pronostico)."}, 503
+        if producto not in self.indices:
+            return {'error': f"Producto no encontrado: {producto}"}, 404
+        if ciclo is None:
+            ciclo = self.ciclo_por_defecto.get(producto)
+            if ciclo is None:
+                return {'error': "No se tiene ciclo para este producto.", 'producto': producto}, 422
+        if ciclo < 1:
+            return {'error': "El ciclo debe ser un entero positivo."}, 400
+        fila = self.tablas[fuente].get((producto, ciclo))
+        if fila is None:
+            fila = self._recomendar_fuera_de_tabla(producto, ciclo, fuente)
+        return fila, 200
+
+    def recomendar_lote(self, consultas, fuente='historico'):
+        """
+        Lista de {'producto', 'ciclo'} -> lista de resultados en el mismo orden.
+        Un ciclo presente que no es entero da un error en esa consulta.
+        """
+        resultados = []
+        for consulta in consultas:
+            ciclo = consulta.get('ciclo')
+            if ciclo is not None:
+                ciclo = _entero(ciclo)
+                if ciclo is None:
+                    resultados.append({'error': "El ciclo debe ser un entero.", 'producto': consulta.get('producto')})
+                    continue
+            resultado, codigo = self.recomendar(consulta.get('producto'), ciclo, fuente)
+            if codigo != 200:
+                resultado = dict(resultado, producto=consulta.get('producto'))
+            resultados.append(resultado)
+        return resultados
+
+# ============================================
+# 2. SERVIDOR HTTP
+# ============================================
+class ManejadorAPI(BaseHTTPRequestHandler):
+    """
+    GET  /productos
+    GET  /recomendar?producto=Camote&ciclo=5&fuente=pronostico  (producto puede repetirse)
+    POST /recomendar  {"consultas": [{"producto": "...", "ciclo": 5}, ...], "fuente": "pronostico"}
+    GET  /indices/{producto}
+    GET  /precios/{producto}
+    """
+
+    servicio = None  # Se asigna en crear_servidor
+
+    def _responder(self, cuerpo, codigo=200):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = [unquote(p) for p in url.path.strip('/').split('/', 1)]
+        ruta = partes[0]
+        argumento = partes[1] if len(partes) > 1 else None
+        servicio = self.servicio
+
+        if ruta == 'productos':
+            self._responder({'productos': servicio.productos})
+        elif ruta == 'recomendar':
+            params = parse_qs(url.query)
+            productos = params.get('producto', [])
+            if not productos:
+                self._responder({'error': "Falta el parámetro 'producto'."}, 400)
+                return
+            ciclo = None
+            if 'ciclo' in params:
+                ciclo = _entero(params['ciclo'][0])
+                if ciclo is None:
+                    self._responder({'error': "El ciclo debe ser un entero."}, 400)
+                    return
+            fuente = params.get('fuente', ['historico'])[0]
+            if len(productos) == 1:
+                resultado, codigo = servicio.recomendar(productos[0], ciclo, fuente)
+                self._responder(resultado, codigo)
+            else:
+                consultas = [{'producto': p, 'ciclo': ciclo} for p in productos]
+                self._responder({'resultados': servicio.recomendar_lote(consultas, fuente)})
+        elif ruta == 'indices' and argumento:
+            if argumento not in servicio.indices:
+                self._responder({'error': f"Producto no encontrado: {argumento}"}, 404)
+            else:
+                self._responder({'producto': argumento, 'indices': servicio.indices[argumento]})
+        elif ruta == 'precios' and argumento:
+            if argumento not in servicio.precios:
+                self._responder({'error': f"No hay precios para: {argumento}"}, 404)
+            else:
+                self._responder({'producto': argumento, 'precios': servicio.precios[argumento]})
+        else:
+            self._responder({'error': "Ruta no encontrada."}, 404)
+
+    def do_POST(self):
+        if urlparse(self.path).path.strip('/') != 'recomendar':
+            self._responder({'error': "Ruta no encontrada."}, 404)
+            return
+        try:
+            largo = int(self.headers.get('Content-Length', 0))
+            cuerpo = json.loads(self.rfile.read(largo) or b'{}')
+            consultas = cuerpo['consultas']
+            if not isinstance(consultas, list):
+                raise ValueError
+            consultas = [{'producto': c.get('producto'), 'ciclo': c.get('ciclo')} for c in consultas]
+            fuente = cuerpo.get('fuente', 'historico')
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self._responder({'error': "Se espera {\"consultas\": [{\"producto\": ..., \"ciclo\": ...}]}"}, 400)
+            return
+        if len(consultas) > MAX_CONSULTAS_LOTE:
+            self._responder({'error': f"Máximo {MAX_CONSULTAS_LOTE} consultas por petición."}, 413)
+            return
+        if fuente not in FUENTES or fuente not in self.servicio.bases:
+            self._responder(*self.servicio.recomendar(None, None, fuente))
+            return
+        self._responder({'resultados': self.servicio.recomendar_lote(consultas, fuente)})
+
+    def log_message(self, format, *args):
+        pass  # Sin un print por petición; el volumen esperado es alto
+
+def crear_servidor(host=HOST, puerto=PUERTO, servicio=None):
+    """Crea el servidor con un ServicioRecomendador ya cargado."""
+    ManejadorAPI.servicio = servicio or ServicioRecomendador()
+    return ThreadingHTTPServer((host, puerto), ManejadorAPI)
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON del recomendador de siembra y venta.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    parser.add_argument('--pronostico', action='store_true',
+                        help="Cargar los modelos de pronostico.py para responder fuente=pronostico")
+    args = parser.parse_args()
+
+    print("Cargando base de conocimiento...")
+    pronosticos = None
+    if args.pronostico:
+        import pronostico  # pronostico importa construccion_paralela, que importa recomendador
+        pronosticos = pronostico.pronosticar(pronostico.cargar_modelos(), 12)
+    servidor = crear_servidor(args.host, args.puerto, ServicioRecomendador(pronosticos))
+    print(f"API escuchando en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    main()
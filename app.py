@@ -1,9 +1,19 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
-from datetime import datetime
+
+import graficos
+import instrumentacion as instr
+import ingesta
+import pronostico
+import simulacion
+from buscador import IndiceProductos
+from cache_datos import leer_csv
+from calidad import validos
+from refresco import INTERVALO, Refrescador, firma_archivos
+from tablas_compartidas import FUENTES as FUENTES_TABLAS, cargar_tablas
+from resumen_productos import FUENTES as FUENTES_RESUMEN, cargar_resumen
 
 # ============================================
 # CONFIGURACIÓN DE LA PÁGINA
@@ -22,169 +32,208 @@ Basada en datos históricos del CENADA y FAOSTAT.
 """)
 
 # ============================================
-# CARGA DE DATOS (con caché)
+# CARGA DE DATOS (versión en segundo plano, datos bajo demanda)
 # ============================================
-@st.cache_data
-def cargar_datos():
-    """Carga todos los archivos CSV necesarios."""
-    archivos = {
-        'frutas': 'frutas_estacionales.csv',
-        'hortalizas': 'hortalizas_estacionales.csv',
-        'precios_mensuales': 'precios_mensuales_producto.csv',
-        'camote_precios': 'camote_precios.csv',
-        'camote_oferta': 'camote_oferta.csv',
-        'faostat': 'FAOSTAT_data_en_2-19-2026.csv',
-        'precio_general': 'precio_general_producto.csv' # <- Nuevo archivo útil
-    }
+# Los precios mensuales no se leen aquí: salen del cubo mapeado de tablas_compartidas
+ARCHIVOS = {
+    'camote_precios': 'camote_precios.csv',
+    'camote_oferta': 'camote_oferta.csv',
+    'precio_general': 'precio_general_producto.csv' # <- Nuevo archivo útil
+}
 
+def _leer_archivo(key):
+    """Carga un archivo CSV; retorna (DataFrame o None, avisos para la barra lateral)."""
+    filename = ARCHIVOS[key]
+    if not os.path.exists(filename):
+        return None, (('warning', f"Archivo no encontrado: {filename}"),)
+    try:
+        # Usa la copia Parquet si el CSV no cambió (utf-8 / latin1 al parsear).
+        # Las filas marcadas por calidad.py en la ingesta se descartan aquí.
+        return validos(leer_csv(filename)), ()
+    except Exception as e:
+        return None, (('error', f"Error cargando {filename}: {e}"),)
+
+def firma_datos():
+    """Versión de los datos: cambia cuando cambia cualquier archivo de entrada."""
+    fuentes_hechos = [config['ruta'] for config in ingesta.ADAPTADORES.values()] + [ingesta.RUTA_ALIAS]
+    return firma_archivos(list(ARCHIVOS.values()) + FUENTES_TABLAS + FUENTES_RESUMEN
+                          + pronostico.FUENTES + fuentes_hechos)
+
+# Conjuntos de datos por clave; el hilo de refresco los arma todos antes de publicar
+CONSTRUCTORES = {key: (lambda key=key: _leer_archivo(key)) for key in ARCHIVOS}
+CONSTRUCTORES.update({
+    'tablas': cargar_tablas,
+    'resumen': cargar_resumen,
+    'pronosticos': pronostico.cargar_modelos,  # Solo ajusta los meses nuevos
+    'hechos': ingesta.cargar_hechos,           # Solo reescribe las fuentes que cambiaron
+})
+
+def construir_instantanea():
+    """
+    Arma todos los conjuntos de datos de la versión vigente de los archivos.
+    Corre en el hilo de refresco: ninguna petición paga la reconstrucción
+    y la instantánea guarda los datos con los que se armó.
+    """
     datos = {}
-    for key, filename in archivos.items():
-        if os.path.exists(filename):
-            try:
-                # Leer archivos, manejando posibles errores de codificación o formato
-                if filename.endswith('.csv'):
-                    # Intentar con codificación utf-8, si falla, probar con latin1
-                    try:
-                        datos[key] = pd.read_csv(filename, encoding='utf-8')
-                    except UnicodeDecodeError:
-                        datos[key] = pd.read_csv(filename, encoding='latin1')
-                else:
-                    datos[key] = pd.read_csv(filename)
-            except Exception as e:
-                st.sidebar.error(f"Error cargando {filename}: {e}")
-                datos[key] = None
-        else:
-            datos[key] = None
-            st.sidebar.warning(f"Archivo no encontrado: {filename}")
-
+    for clave, construir in CONSTRUCTORES.items():
+        with instr.seccion(f'datos:{clave}'):
+            datos[clave] = construir()
     return datos
 
-datos = cargar_datos()
-
-# Extraer datos específicos
-indices_frutas = datos.get('frutas')
-indices_hortalizas = datos.get('hortalizas')
-precios_mensuales = datos.get('precios_mensuales')
-camote_precios = datos.get('camote_precios')
-camote_oferta = datos.get('camote_oferta')
-faostat = datos.get('faostat')
-precio_general = datos.get('precio_general')
+@st.cache_resource
+def obtener_refrescador():
+    """
+    Un refrescador por proceso del servidor. El hilo revisa la firma de
+    los archivos cada INTERVALO segundos y publica la nueva versión ya
+    armada, sin que una petición tenga que revisar ni leer los archivos.
+    """
+    return Refrescador(construir_instantanea, firma_datos, INTERVALO).iniciar()
+
+def conjunto(clave):
+    """Conjunto `clave` de la instantánea vigente (compartido entre sesiones, de solo lectura)."""
+    return instantanea[clave]
+
+def archivo(key):
+    """DataFrame de un archivo de ARCHIVOS; sus avisos van a la barra lateral."""
+    df, avisos = conjunto(key)
+    for tipo, mensaje in avisos:
+        getattr(st.sidebar, tipo)(mensaje)
+    return df
+
+class RegistroPerezoso:
+    """
+    Conjuntos de datos que se toman de la instantánea (o se derivan de ella)
+    la primera vez que una sección los pide y se reutilizan durante el resto
+    del rerun. Así la vista de un solo cultivo no procesa lo que no usa.
+    """
+
+    def __init__(self, cargadores):
+        self._cargadores = cargadores
+        self._valores = {}
+
+    def __getitem__(self, clave):
+        if clave not in self._valores:
+            self._valores[clave] = self._cargadores[clave]()
+        return self._valores[clave]
+
+    def cargados(self):
+        return list(self._valores)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _buscador(version):
+    """Índice de nombres del índice estacional y de los productos con precio."""
+    tablas = datos['tablas']
+    return IndiceProductos(tablas.indices.productos + list(tablas.productos_precio))
 
 # ============================================
 # PROCESAR DATOS DE PLÁTANO
 # ============================================
-def procesar_platano():
-    """Extrae datos de plátano de los índices y precios."""
+@instr.medir(cache=True)
+@st.cache_data(max_entries=2)
+def procesar_platano(version):
+    """Extrae datos de plátano de los índices y precios (una vez por versión de los datos)."""
+    instr.fallo_cache('procesar_platano')
+    indices = datos['indices']
+    tablas = datos['tablas']
+    precio_general = datos['precio_general']
+    buscador = datos['buscador']
     platano_data = {}
 
     # Buscar en índices de frutas (Plátano Maduro y Verde)
-    if indices_frutas is not None:
-        # Asegurarse de que la columna 'Cultivo' existe
-        if 'Cultivo' in indices_frutas.columns:
-            maduro = indices_frutas[indices_frutas['Cultivo'] == 'Plátano Maduro']
-            verde = indices_frutas[indices_frutas['Cultivo'] == 'Plátano Verde']
-
-            if not maduro.empty:
-                platano_data['indice_maduro'] = maduro.iloc[0]
-            if not verde.empty:
-                platano_data['indice_verde'] = verde.iloc[0]
-        else:
-            st.sidebar.warning("El archivo 'frutas_estacionales.csv' no tiene la columna 'Cultivo'.")
-
-    # Buscar precios reales en 'precios_mensuales'
-    if precios_mensuales is not None:
-        if 'producto' in precios_mensuales.columns:
-            # Filtrar por productos que contengan 'Plátano' (maduro, verde, primera, segunda)
-            precios_platano = precios_mensuales[
-                precios_mensuales['producto'].str.contains('Plátano', na=False, case=False)
-            ].copy()
-            if not precios_platano.empty:
-                platano_data['precios'] = precios_platano
-        else:
-            st.sidebar.warning("El archivo 'precios_mensuales_producto.csv' no tiene la columna 'producto'.")
+    if 'Plátano Maduro' in indices:
+        platano_data['indice_maduro'] = indices.fila('Plátano Maduro')
+    if 'Plátano Verde' in indices:
+        platano_data['indice_verde'] = indices.fila('Plátano Verde')
+
+    # Precios reales de los productos que contengan 'Plátano' (maduro, verde, primera, segunda)
+    precios_platano = tablas.precios_varios(sorted(buscador.nombres_con('Plátano')))
+    if not precios_platano.empty:
+        platano_data['precios'] = precios_platano
 
     # También podrías buscar en 'precio_general' si existe
     if precio_general is not None:
         if 'producto' in precio_general.columns:
             precios_gral_platano = precio_general[
-                precio_general['producto'].str.contains('Plátano', na=False, case=False)
+                buscador.mascara(precio_general['producto'], 'Plátano')
             ]
             if not precios_gral_platano.empty:
                 platano_data['precio_general'] = precios_gral_platano
 
+    # Precios al productor (FAOSTAT 'Bananas' / 'Plantains' son alias de Plátano en ingesta.py)
+    productor = datos['hechos'].consultar(familia='Plátano', mercado='Productor')
+    if not productor.empty:
+        platano_data['productor'] = productor
+
     return platano_data
 
 # ============================================
 # PROCESAR DATOS DE CAMOTE
 # ============================================
-def procesar_camote():
-    """Extrae todos los datos de camote disponibles."""
+@instr.medir(cache=True)
+@st.cache_data(max_entries=2)
+def procesar_camote(version):
+    """Extrae todos los datos de camote disponibles (una vez por versión de los datos)."""
+    instr.fallo_cache('procesar_camote')
+    indices = datos['indices']
+    tablas = datos['tablas']
+    camote_precios = datos['camote_precios']
+    camote_oferta = datos['camote_oferta']
+    precio_general = datos['precio_general']
+    buscador = datos['buscador']
     camote_data = {}
 
     # Índice estacional de hortalizas
-    if indices_hortalizas is not None:
-        if 'Cultivo' in indices_hortalizas.columns:
-            idx = indices_hortalizas[indices_hortalizas['Cultivo'] == 'Camote']
-            if not idx.empty:
-                camote_data['indice'] = idx.iloc[0]
-        else:
-            st.sidebar.warning("El archivo 'hortalizas_estacionales.csv' no tiene la columna 'Cultivo'.")
-
-    # Precios mensuales generales
-    if precios_mensuales is not None:
-        if 'producto' in precios_mensuales.columns:
-            precios_camote = precios_mensuales[
-                precios_mensuales['producto'].str.contains('Camote', na=False, case=False) &
-                ~precios_mensuales['producto'].str.contains('Zanahoria', na=False, case=False) # Excluir Camote Zanahoria si es necesario
-            ].copy()
-            if not precios_camote.empty:
-                camote_data['precios_mensuales'] = precios_camote
-        else:
-            st.sidebar.warning("El archivo 'precios_mensuales_producto.csv' no tiene la columna 'producto'.")
-
-    # Datos históricos específicos de camote (precios y oferta)
-    if camote_precios is not None:
-        # Limpiar datos de precios históricos (hay valores 1.0 que son errores y valores atípicos altos como 980.95)
-        # También hay valores como 66.67 en el índice. Vamos a filtrar con más cuidado.
-        try:
-            # Convertir a numérico para asegurar
-            camote_precios['Precio_ColonesKg'] = pd.to_numeric(camote_precios['Precio_ColonesKg'], errors='coerce')
-            # Filtrar precios que probablemente sean erróneos (menores a 10 o mayores a 2000, por ejemplo)
-            camote_precios_clean = camote_precios[
-                (camote_precios['Precio_ColonesKg'] > 10) &
-                (camote_precios['Precio_ColonesKg'] < 2000)
-            ].copy()
-            if not camote_precios_clean.empty:
-                camote_data['precios_historicos'] = camote_precios_clean
-        except Exception as e:
-            st.sidebar.error(f"Error limpiando camote_precios: {e}")
+    if 'Camote' in indices:
+        camote_data['indice'] = indices.fila('Camote')
+
+    # Precios mensuales generales (sin Camote Zanahoria)
+    precios_camote = tablas.precios_varios(sorted(buscador.nombres_con('Camote', excluir='Zanahoria')))
+    if not precios_camote.empty:
+        camote_data['precios_mensuales'] = precios_camote
+
+    # Datos históricos específicos de camote (precios y oferta).
+    # Los valores 1.0 (errores del PDF) y los atípicos ya se descartaron en la ingesta (calidad.py)
+    if camote_precios is not None and not camote_precios.empty:
+        camote_data['precios_historicos'] = camote_precios
 
     if camote_oferta is not None:
         camote_data['oferta'] = camote_oferta
 
-    # FAOSTAT para precios al productor (Sweet potatoes)
-    if faostat is not None:
-        if 'Item' in faostat.columns:
-            fao_camote = faostat[faostat['Item'].str.contains('Sweet potatoes', na=False, case=False)].copy()
-            if not fao_camote.empty:
-                camote_data['faostat'] = fao_camote
-        else:
-            st.sidebar.warning("El archivo 'FAOSTAT...csv' no tiene la columna 'Item'.")
+    # Precios al productor (FAOSTAT 'Sweet potatoes' es alias de Camote en ingesta.py)
+    productor = datos['hechos'].consultar(familia='Camote', mercado='Productor')
+    if not productor.empty:
+        camote_data['productor'] = productor
 
     # Precio general
     if precio_general is not None:
         if 'producto' in precio_general.columns:
             precio_gral_camote = precio_general[
-                (precio_general['producto'].str.contains('Camote', na=False, case=False)) &
-                (~precio_general['producto'].str.contains('Zanahoria', na=False, case=False))
+                buscador.mascara(precio_general['producto'], 'Camote', excluir='Zanahoria')
             ]
             if not precio_gral_camote.empty:
                 camote_data['precio_general'] = precio_gral_camote
 
     return camote_data
 
-platano_data = procesar_platano()
-camote_data = procesar_camote()
+# Instantánea vigente: se lee una vez por rerun, así todo el rerun usa la
+# misma versión aunque el hilo de refresco publique otra mientras tanto
+instantanea = obtener_refrescador().actual()
+
+# Cada sección pide solo lo que usa; el primer pedido de una versión lo arma
+cargadores = {key: (lambda key=key: archivo(key)) for key in ARCHIVOS}
+cargadores.update({
+    'tablas': lambda: conjunto('tablas'),
+    'indices': lambda: datos['tablas'].indices,
+    'buscador': lambda: _buscador(instantanea.version),
+    'resumen': lambda: conjunto('resumen'),
+    'pronosticos': lambda: conjunto('pronosticos'),
+    'hechos': lambda: conjunto('hechos'),
+    # Se pide una sola vez por rerun aunque varias secciones conviertan precios en USD
+    'tipo_cambio': lambda: st.sidebar.number_input("Tipo de cambio USD a CRC", value=500.0, key="tc_fao"),
+    'platano': lambda: procesar_platano(instantanea.version),
+    'camote': lambda: procesar_camote(instantanea.version),
+})
+datos = RegistroPerezoso(cargadores)
 
 # ============================================
 # MAPA DE MESES
@@ -204,9 +253,25 @@ st.sidebar.header("⚙️ Configuración")
 # Selector principal con énfasis en los dos cultivos
 opcion = st.sidebar.radio(
     "Seleccionar análisis:",
-    ["🍌 Plátano", "🥔 Camote", "📊 Comparar ambos"]
+    ["🍌 Plátano", "🥔 Camote", "📊 Comparar ambos", "🔎 Cualquier producto"]
 )
 
+# Producto del catálogo para la vista genérica
+if opcion == "🔎 Cualquier producto":
+    catalogo = datos['resumen'].index.tolist()
+    producto_sel = st.sidebar.selectbox(
+        "Producto", catalogo,
+        index=catalogo.index('Camote') if 'Camote' in catalogo else 0
+    )
+    ciclo_defecto = datos['resumen'].loc[producto_sel, 'ciclo_meses']
+    ciclo_producto = st.sidebar.number_input(
+        "Ciclo del producto (meses)",
+        min_value=1, max_value=35,
+        value=int(min(max(ciclo_defecto, 1), 35)) if pd.notna(ciclo_defecto) else 4, step=1,
+        key=f"ciclo_{producto_sel}",
+        help="Por defecto, el ciclo conocido del producto (4 si no se tiene)"
+    )
+
 # Parámetros comunes
 ciclo_platano = st.sidebar.number_input(
     "Ciclo del plátano (meses)",
@@ -220,25 +285,30 @@ ciclo_camote = st.sidebar.number_input(
     help="El camote tarda típicamente 4-5 meses"
 )
 
+modo_nativo = st.sidebar.checkbox(
+    "⚡ Gráficos nativos (sin matplotlib)",
+    value=False,
+    help="Dibuja los gráficos en el navegador; más rápido bajo carga"
+)
+
+modo_depuracion = st.sidebar.checkbox(
+    "🐞 Panel de depuración",
+    value=False,
+    help="Tiempos por sección, aciertos de caché y tamaños de datos de este proceso"
+)
+
 # ============================================
 # FUNCIÓN PARA CALCULAR ESTACIONALIDAD
 # ============================================
+@instr.medir()
 def calcular_estacionalidad(serie_indice, titulo):
     """Calcula y devuelve un DataFrame con los índices mensuales."""
     if serie_indice is None:
         st.warning(f"No hay datos de estacionalidad para {titulo}")
         return None
 
-    # Extraer índices mensuales, asumiendo que las columnas son las abreviaturas de los meses
-    valores = []
-    for mes in meses_abrev:
-        if mes in serie_indice.index:
-            val = pd.to_numeric(serie_indice[mes], errors='coerce')
-            if pd.isna(val):
-                val = 1.0  # Asignar 1.0 si el valor no es numérico
-        else:
-            val = 1.0  # Asignar 1.0 si la columna del mes no existe
-        valores.append(val)
+    # La fila del índice compilado trae los 12 meses; los vacíos (NaN) valen 1.0
+    valores = np.where(np.isnan(serie_indice), 1.0, serie_indice).astype(float)
 
     df_indices = pd.DataFrame({
         'mes_num': list(range(1,13)),
@@ -248,47 +318,33 @@ def calcular_estacionalidad(serie_indice, titulo):
 
     return df_indices
 
+def buscar_recomendacion(producto, ciclo):
+    """
+    Fila de la tabla precalculada para un producto y ciclo de la app.
+    La app cosecha `ciclo` meses después del mes de siembra, que en la
+    convención de recomendador.py corresponde al ciclo + 1.
+    """
+    return datos['tablas'].recomendacion(producto, int(ciclo) + 1)
+
+@instr.medir()
 def mostrar_resultados(df_indices, ciclo, titulo):
     """Muestra los resultados para un cultivo."""
     if df_indices is None:
         return None, None, None
 
-    # Calcular para cada mes de siembra
-    resultados = []
-    for mes_siembra in range(1, 13):
-        mes_cosecha = mes_siembra + ciclo
-        if mes_cosecha > 12:
-            mes_cosecha -= 12
-        # Buscar el índice de cosecha
-        indice_row = df_indices[df_indices['mes_num'] == mes_cosecha]
-        if not indice_row.empty:
-            indice_cosecha = indice_row['indice'].values[0]
-        else:
-            indice_cosecha = 1.0  # Fallback
-        beneficio = (indice_cosecha - 1) * 100
-        resultados.append({
-            'Mes siembra': mes_siembra,
-            'Nombre mes': meses_nombre[mes_siembra],
-            'Mes cosecha': mes_cosecha,
-            'Índice cosecha': indice_cosecha,
-            'Beneficio %': beneficio
-        })
-
-    df_resultados = pd.DataFrame(resultados)
+    fila = buscar_recomendacion(titulo, ciclo)
+    if fila is None:
+        st.warning(f"No hay recomendación precalculada para {titulo}")
+        return None, None, None
 
-    # Encontrar la mejor siembra (mayor índice de cosecha)
-    mejor_fila = df_resultados.loc[df_resultados['Índice cosecha'].idxmax()]
     mejor_siembra = {
-        'mes': mejor_fila['Nombre mes'],
-        'cosecha': meses_nombre[mejor_fila['Mes cosecha']],
-        'beneficio': mejor_fila['Beneficio %']
+        'mes': meses_nombre[int(fila['mejor_mes_siembra'])],
+        'cosecha': meses_nombre[int(fila['mes_cosecha_mejor_siembra'])],
+        'beneficio': fila['beneficio_siembra_%']
     }
-
-    # Encontrar el mejor mes de venta en general
-    mejor_venta_fila = df_indices.loc[df_indices['indice'].idxmax()]
     mejor_venta = {
-        'mes': mejor_venta_fila['mes'],
-        'indice': mejor_venta_fila['indice']
+        'mes': meses_abrev[int(fila['mejor_mes_venta']) - 1],
+        'indice': fila['indice_mejor_venta']
     }
 
     # Mostrar resultados
@@ -312,29 +368,39 @@ def mostrar_resultados(df_indices, ciclo, titulo):
         )
 
     # Gráfico
-    fig, ax = plt.subplots(figsize=(8, 3))
-    colores = ['green' if x < 1 else 'orange' if x < 1.1 else 'red' for x in df_indices['indice']]
-    bars = ax.bar(df_indices['mes'], df_indices['indice'], color=colores, alpha=0.7)
-    ax.axhline(y=1, color='black', linestyle='--', linewidth=0.8)
-    ax.set_ylabel('Índice de Estacionalidad')
-    ax.set_title(f'Estacionalidad - {titulo}')
-    ax.set_ylim(0, max(df_indices['indice']) * 1.1)
-
-    # Resaltar mejor venta
-    mejor_idx = df_indices['indice'].idxmax()
-    if mejor_idx is not None:
-        bars[mejor_idx].set_color('blue')
-        bars[mejor_idx].set_alpha(0.9)
-
-    st.pyplot(fig)
-
-    return df_resultados, mejor_siembra, mejor_venta
+    with instr.seccion('grafico:estacionalidad', cache=not modo_nativo):
+        if modo_nativo:
+            st.vega_lite_chart(df_indices, graficos.vega_barras(
+                'mes', 'indice', f'Estacionalidad - {titulo}', meses_abrev,
+                color='green', ylabel='Índice de Estacionalidad'), width='stretch')
+        else:
+            st.image(graficos.png_estacionalidad(
+                tuple(df_indices['mes']), tuple(df_indices['indice']), titulo))
+
+    return fila, mejor_siembra, mejor_venta
+
+def mostrar_precios_productor(filas):
+    """Últimos precios al productor de la tabla de hechos, con su conversión aproximada a ₡/kg."""
+    st.subheader("🌎 Precios internacionales (FAOSTAT)")
+    filas = filas.sort_values('fecha', ascending=False).groupby('producto_fuente', observed=True).head(10)
+    # El precio es el de `cantidad` unidades base; solo las filas en kg se pasan a ₡/kg
+    kg = filas['cantidad'].where(filas['unidad'].astype(str) == 'kg')
+    tasa = np.where(filas['moneda'].astype(str) == 'USD', datos['tipo_cambio'], 1.0)
+    st.dataframe(pd.DataFrame({
+        'Año': filas['fecha'].dt.year,
+        'Producto (fuente)': filas['producto_fuente'],
+        'Precio': filas['precio'],
+        'Unidad': (filas['moneda'].astype(str) + '/' + filas['cantidad'].map('{:g}'.format)
+                   + ' ' + filas['unidad'].astype(str)),
+        '₡/kg (aprox)': (filas['precio'] * tasa / kg).round(1),
+    }), hide_index=True)
 
 # ============================================
 # SECCIÓN DE PLÁTANO
 # ============================================
 if opcion == "🍌 Plátano" or opcion == "📊 Comparar ambos":
     st.header("🍌 Análisis de Plátano")
+    platano_data = datos['platano']
 
     with st.expander("Ver detalles del plátano", expanded=(opcion=="🍌 Plátano")):
         # Mostrar ambos tipos (maduro y verde)
@@ -369,11 +435,15 @@ if opcion == "🍌 Plátano" or opcion == "📊 Comparar ambos":
             st.subheader("💰 Precio general promedio")
             st.dataframe(platano_data['precio_general'])
 
+        if 'productor' in platano_data:
+            mostrar_precios_productor(platano_data['productor'])
+
 # ============================================
 # SECCIÓN DE CAMOTE
 # ============================================
 if opcion == "🥔 Camote" or opcion == "📊 Comparar ambos":
     st.header("🥔 Análisis de Camote")
+    camote_data = datos['camote']
 
     with st.expander("Ver detalles del camote", expanded=(opcion=="🥔 Camote")):
         # Estacionalidad principal
@@ -411,20 +481,21 @@ if opcion == "🥔 Camote" or opcion == "📊 Comparar ambos":
             hist_mensual.columns = ['Mes', 'precio_promedio']
 
             # Gráfico comparativo
-            fig_hist, ax_hist = plt.subplots(figsize=(10, 4))
             meses_orden = ['Enero','Febrero','Marzo','Abril','Mayo','Junio',
                           'Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre']
             hist_mensual['mes_num'] = hist_mensual['Mes'].apply(lambda x: meses_orden.index(x) + 1 if x in meses_orden else 0)
             hist_mensual = hist_mensual.sort_values('mes_num')
 
-            ax_hist.plot(hist_mensual['Mes'], hist_mensual['precio_promedio'],
-                        marker='o', linewidth=2, color='green')
-            ax_hist.set_ylabel('Precio (₡/kg)')
-            ax_hist.set_xlabel('Mes')
-            ax_hist.set_title('Precio histórico promedio por mes (2017-2024)')
-            ax_hist.grid(True, alpha=0.3)
-            plt.xticks(rotation=45)
-            st.pyplot(fig_hist)
+            titulo_hist = 'Precio histórico promedio por mes (2017-2024)'
+            with instr.seccion('grafico:historico_camote', cache=not modo_nativo):
+                if modo_nativo:
+                    st.vega_lite_chart(hist_mensual, graficos.vega_lineas(
+                        'Mes', 'precio_promedio', titulo_hist, meses_orden,
+                        ylabel='Precio (₡/kg)'), width='stretch')
+                else:
+                    st.image(graficos.png_linea(
+                        tuple(hist_mensual['Mes']), tuple(hist_mensual['precio_promedio']),
+                        titulo_hist, 'Precio (₡/kg)'))
 
             # Tabla
             st.dataframe(hist_mensual[['Mes', 'precio_promedio']].style.format({
@@ -437,32 +508,25 @@ if opcion == "🥔 Camote" or opcion == "📊 Comparar ambos":
             oferta_mensual = camote_data['oferta'].groupby('Mes')['Oferta_Toneladas'].mean().reset_index()
             oferta_mensual.columns = ['Mes', 'oferta_promedio']
 
-            fig_of, ax_of = plt.subplots(figsize=(10, 3))
             meses_orden = ['Enero','Febrero','Marzo','Abril','Mayo','Junio',
                           'Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre']
             oferta_mensual['mes_num'] = oferta_mensual['Mes'].apply(lambda x: meses_orden.index(x) + 1 if x in meses_orden else 0)
             oferta_mensual = oferta_mensual.sort_values('mes_num')
 
-            ax_of.bar(oferta_mensual['Mes'], oferta_mensual['oferta_promedio'], color='orange', alpha=0.7)
-            ax_of.set_ylabel('Toneladas')
-            ax_of.set_xlabel('Mes')
-            ax_of.set_title('Oferta promedio por mes (2017-2024)')
-            plt.xticks(rotation=45)
-            st.pyplot(fig_of)
-
-        # FAOSTAT (precios al productor)
-        if 'faostat' in camote_data:
-            st.subheader("🌎 Precios internacionales (FAOSTAT)")
-            fao = camote_data['faostat'].sort_values('Year', ascending=False).head(10)
-            # Conversión aproximada USD a CRC (usando un tipo de cambio estimado, podrías hacerlo configurable)
-            # Por simplicidad, usaremos un valor fijo o lo dejamos en USD.
-            tipo_cambio = st.sidebar.number_input("Tipo de cambio USD a CRC", value=500.0, key="tc_fao")
-            fao['Valor_CRC'] = fao['Value'] * tipo_cambio
-            st.dataframe(fao[['Year', 'Value', 'Valor_CRC']].rename(columns={
-                'Year': 'Año',
-                'Value': 'USD/tonelada',
-                'Valor_CRC': '₡/kg (aprox)'
-            }), hide_index=True)
+            titulo_of = 'Oferta promedio por mes (2017-2024)'
+            with instr.seccion('grafico:oferta_camote', cache=not modo_nativo):
+                if modo_nativo:
+                    st.vega_lite_chart(oferta_mensual, graficos.vega_barras(
+                        'Mes', 'oferta_promedio', titulo_of, meses_orden,
+                        ylabel='Toneladas'), width='stretch')
+                else:
+                    st.image(graficos.png_barras(
+                        tuple(oferta_mensual['Mes']), tuple(oferta_mensual['oferta_promedio']),
+                        titulo_of, 'Toneladas'))
+
+        # Precios al productor (FAOSTAT y cualquier otra fuente de ese mercado)
+        if 'productor' in camote_data:
+            mostrar_precios_productor(camote_data['productor'])
 
         # Precio general
         if 'precio_general' in camote_data:
@@ -474,16 +538,26 @@ if opcion == "🥔 Camote" or opcion == "📊 Comparar ambos":
 # ============================================
 if opcion == "📊 Comparar ambos":
     st.header("📊 Comparación Plátano vs Camote")
+    platano_data = datos['platano']
+    camote_data = datos['camote']
+
+    # Índices de cada cultivo, calculados una sola vez para métricas y gráfico
+    df_p = None
+    if 'indice_maduro' in platano_data:
+        df_p = calcular_estacionalidad(platano_data['indice_maduro'], "Plátano Maduro")
+    df_c = None
+    if 'indice' in camote_data:
+        df_c = calcular_estacionalidad(camote_data['indice'], "Camote")
 
     col_comp1, col_comp2 = st.columns(2)
 
     with col_comp1:
         st.subheader("🍌 Plátano")
-        if 'indice_maduro' in platano_data:
-            df_p = calcular_estacionalidad(platano_data['indice_maduro'], "Plátano Maduro")
-            if df_p is not None:
-                mejor_p = df_p.loc[df_p['indice'].idxmax()]
-                st.metric("Mejor mes venta (maduro)", f"{mejor_p['mes']}", f"Índice {mejor_p['indice']:.3f}")
+        if df_p is not None:
+            fila_p = buscar_recomendacion("Plátano Maduro", ciclo_platano)
+            if fila_p is not None:
+                st.metric("Mejor mes venta (maduro)", meses_abrev[int(fila_p['mejor_mes_venta']) - 1],
+                          f"Índice {fila_p['indice_mejor_venta']:.3f}")
 
         if 'precios' in platano_data:
             precio_p = platano_data['precios']['precio_promedio'].mean()
@@ -491,11 +565,11 @@ if opcion == "📊 Comparar ambos":
 
     with col_comp2:
         st.subheader("🥔 Camote")
-        if 'indice' in camote_data:
-            df_c = calcular_estacionalidad(camote_data['indice'], "Camote")
-            if df_c is not None:
-                mejor_c = df_c.loc[df_c['indice'].idxmax()]
-                st.metric("Mejor mes venta", f"{mejor_c['mes']}", f"Índice {mejor_c['indice']:.3f}")
+        if df_c is not None:
+            fila_c = buscar_recomendacion("Camote", ciclo_camote)
+            if fila_c is not None:
+                st.metric("Mejor mes venta", meses_abrev[int(fila_c['mejor_mes_venta']) - 1],
+                          f"Índice {fila_c['indice_mejor_venta']:.3f}")
 
         if 'precios_mensuales' in camote_data:
             precio_c = camote_data['precios_mensuales']['precio_promedio'].mean()
@@ -504,26 +578,120 @@ if opcion == "📊 Comparar ambos":
     # Gráfico comparativo
     st.subheader("Comparación de estacionalidad")
 
-    fig_comp, ax_comp = plt.subplots(figsize=(10, 4))
+    series = []
+    if df_p is not None:
+        series.append(('Plátano (Maduro)', 'o', df_p))
+    if df_c is not None:
+        series.append(('Camote', 's', df_c))
+
+    with instr.seccion('grafico:comparacion', cache=not modo_nativo):
+        if modo_nativo:
+            df_comp = pd.concat([df.assign(cultivo=nombre) for nombre, _, df in series]) if series else \
+                pd.DataFrame(columns=['mes', 'indice', 'cultivo'])
+            st.vega_lite_chart(df_comp, graficos.vega_lineas(
+                'mes', 'indice', 'Comparación de estacionalidad', meses_abrev,
+                serie='cultivo', ylabel='Índice (1 = promedio)'), width='stretch')
+        else:
+            st.image(graficos.png_comparacion(
+                tuple(meses_abrev),
+                tuple((nombre, marcador, tuple(df['indice'])) for nombre, marcador, df in series),
+                'Comparación de estacionalidad'))
 
-    if 'indice_maduro' in platano_data:
-        df_p = calcular_estacionalidad(platano_data['indice_maduro'], "")
-        if df_p is not None:
-            ax_comp.plot(df_p['mes'], df_p['indice'], marker='o', label='Plátano (Maduro)', linewidth=2)
+# ============================================
+# VISTA GENÉRICA POR PRODUCTO
+# ============================================
+@instr.medir()
+def mostrar_producto(producto, ciclo):
+    """Estacionalidad, recomendación y precios de cualquier producto del catálogo."""
+    fila = datos['resumen'].loc[producto]
+    st.header(f"🔎 Análisis de {producto}")
+
+    if fila['tiene_indice']:
+        df_indice = calcular_estacionalidad(np.asarray(fila['indice'], dtype=float), producto)
+        mostrar_resultados(df_indice, ciclo, producto)
+    else:
+        st.info("No hay índice estacional ni precios suficientes para estimarlo.")
+
+    # Distribución del precio al cosechar para cada mes de siembra
+    if fila['meses_con_precio'] > 0:
+        with instr.seccion('simulacion'):
+            dist = simulacion.distribuciones(
+                [producto], np.asarray(fila['indice'], dtype=float), datos['tablas'].precios(producto))
+            sim = simulacion.simular(dist, [int(ciclo) + 1])
+            futuro = pronostico.pronosticar(datos['pronosticos'], 12, [producto])
+        tabla_sim = pd.DataFrame({
+            'Siembra': sim['mes_siembra'].map(meses_nombre),
+            'Cosecha': sim['mes_cosecha'].map(meses_nombre),
+            'Precio esperado (₡/kg)': sim['ingreso_esperado'].round(0),
+            'P5': sim['p5'].round(0),
+            'P95': sim['p95'].round(0),
+            'Prob. bajo el promedio': (sim['prob_bajo_promedio'] * 100).round(1).astype(str) + '%',
+        })
+        st.subheader("🎲 Precio simulado al cosechar")
+        nota = (f"{simulacion.SORTEOS:,} escenarios por mes según la variación de los precios "
+                "registrados; P5 es el precio de un año malo (1 de cada 20).")
+        if not futuro.empty:
+            # Pronóstico de los próximos 12 meses: cada mes del año aparece una vez
+            por_mes = futuro.set_index('mes')['precio']
+            tabla_sim['Pronóstico (₡/kg)'] = sim['mes_cosecha'].map(por_mes).round(0).to_numpy()
+            desde = futuro.iloc[0]
+            nota += (f" Pronóstico desde {meses_nombre[int(desde['mes'])]} {int(desde['año'])} "
+                     f"con el modelo {desde['modelo'].replace('_', ' ')}.")
+        st.caption(nota)
+        st.dataframe(tabla_sim, hide_index=True)
+
+    # Precios mensuales recientes
+    if len(fila['fechas_recientes']):
+        st.subheader("📈 Precios mensuales recientes (CENADA)")
+        st.dataframe(pd.DataFrame({
+            'fecha': fila['fechas_recientes'],
+            'precio_promedio': fila['precios_recientes'],
+            'num_registros': fila['registros_recientes'],
+        }), hide_index=True)
+
+        col_e1, col_e2, col_e3 = st.columns(3)
+        col_e1.metric("Precio promedio (general)", f"₡{fila['precio_promedio']:.0f}")
+        col_e2.metric("Máximo histórico", f"₡{fila['precio_maximo']:.0f}")
+        col_e3.metric("Mínimo histórico", f"₡{fila['precio_minimo']:.0f}")
+
+    # Precio promedio por mes del año (solo si hay más de un mes con dato)
+    perfil = np.asarray(fila['perfil_mensual'], dtype=float)
+    con_dato = ~np.isnan(perfil)
+    if con_dato.sum() > 1:
+        st.subheader("📊 Precio promedio por mes")
+        df_perfil = pd.DataFrame({'mes': np.array(meses_abrev)[con_dato], 'precio_promedio': perfil[con_dato]})
+        titulo_perfil = f'Precio promedio por mes - {producto}'
+        with instr.seccion('grafico:perfil_producto', cache=not modo_nativo):
+            if modo_nativo:
+                st.vega_lite_chart(df_perfil, graficos.vega_lineas(
+                    'mes', 'precio_promedio', titulo_perfil, meses_abrev,
+                    ylabel='Precio (₡/kg)'), width='stretch')
+            else:
+                st.image(graficos.png_linea(
+                    tuple(df_perfil['mes']), tuple(df_perfil['precio_promedio']),
+                    titulo_perfil, 'Precio (₡/kg)'))
 
-    if 'indice' in camote_data:
-        df_c = calcular_estacionalidad(camote_data['indice'], "")
-        if df_c is not None:
-            ax_comp.plot(df_c['mes'], df_c['indice'], marker='s', label='Camote', linewidth=2)
+    if pd.notna(fila['precio_general']):
+        st.metric("💰 Precio general promedio", f"₡{fila['precio_general']:.0f}")
 
-    ax_comp.axhline(y=1, color='gray', linestyle='--', alpha=0.5)
-    ax_comp.set_ylabel('Índice (1 = promedio)')
-    ax_comp.set_xlabel('Mes')
-    ax_comp.set_title('Comparación de estacionalidad')
-    ax_comp.legend()
-    ax_comp.grid(True, alpha=0.3)
+if opcion == "🔎 Cualquier producto":
+    mostrar_producto(producto_sel, ciclo_producto)
 
-    st.pyplot(fig_comp)
+# ============================================
+# PANEL DE DEPURACIÓN
+# ============================================
+if modo_depuracion:
+    with st.sidebar.expander("🐞 Métricas del proceso", expanded=True):
+        metricas = pd.DataFrame(instr.resumen())
+        if metricas.empty:
+            st.caption("Sin mediciones todavía.")
+        else:
+            st.dataframe(metricas[['nombre', 'llamadas', 'ultimo_s', 'promedio_s', 'max_s',
+                                   'aciertos', 'fallos', 'filas']], hide_index=True)
+        st.download_button("Prometheus", instr.exportar_prometheus(),
+                           file_name="metricas.prom", mime="text/plain")
+        st.download_button("JSONL", instr.exportar_jsonl(),
+                           file_name="metricas.jsonl", mime="application/jsonl")
 
 # ============================================
 # PIE DE PÁGINA
@@ -533,7 +701,7 @@ st.markdown(
     f"""
     <div style='text-align: center; color: gray;'>
         <p style='font-family: sans-serif; margin-bottom: 10px;'>
-            Última actualización: {datetime.now().strftime("%d/%m/%Y %H:%M")}<br>
+            Versión de datos: {instantanea.version} (detectada el {instantanea.creada.strftime("%d/%m/%Y %H:%M")})<br>
             Datos: PIMA/CENADA, FAOSTAT
         </p>
         <div style='font-family: monospace; color: #00ff00; font-size: 10px; line-height: 1.2; text-align: center; white-space: pre; background-color: transparent; margin: 15px 0;'>
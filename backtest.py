@@ -0,0 +1,198 @@
+import argparse
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+from construccion_paralela import _mapear, particionar_productos
+from estacionalidad import panel, series_completas
+from recomendador import FORMATOS_SALIDA, cargar_ciclos, crear_base_conocimiento, escribir_resultados, matriz_indices
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+MIN_AÑOS_ENTRENAMIENTO = 1  # Años completos de historia antes de la primera ventana
+MIN_MESES_OBJETIVO = 6      # Meses con precio que debe tener el año evaluado
+CICLO_DEFECTO = 12          # Para productos sin ciclo en cargar_ciclos
+LOTE = 500                  # Productos evaluados juntos (memoria: ventanas x LOTE x años x 12)
+ESTRATEGIAS = ('indice_anual', 'indice_mediana', 'ultimo_año', 'indice_base')
+COLUMNAS_DETALLE = ['producto', 'año', 'estrategia', 'mes_cosecha', 'precio_realizado',
+                    'precio_promedio', 'precio_mejor', 'acierto']
+
+# Ventanas walk-forward: para cada año objetivo se decide en qué mes
+# cosechar usando solo los años completos anteriores a la siembra más
+# temprana posible (enero del año objetivo menos ciclo - 1 meses). Con
+# `ventana` se usan solo los últimos años de esa historia.
+# Estrategias (todas eligen el mes de mayor valor):
+# - indice_anual: promedio de precio / promedio del año (calcular_indices_reales);
+# - indice_mediana: mediana de esas razones (robusta a años atípicos);
+# - ultimo_año: razones del último año de entrenamiento;
+# - indice_base: índice actual de la base de conocimiento (el que usa
+#   recomendar_para_producto; no se recalcula por ventana y puede incluir
+#   información posterior al año evaluado).
+# El precio realizado es el del mes elegido en el año objetivo. La base de
+# comparación es el promedio de los meses con precio de ese año (sembrar en
+# un mes al azar); acierto = el mes elegido fue el de mayor precio.
+
+# ============================================
+# 1. MOTOR VECTORIZADO
+# ============================================
+def _elegir(valores):
+    """Mes (0-11) de mayor valor por fila; -1 si no hay ningún dato."""
+    lleno = np.where(np.isnan(valores), -np.inf, valores)
+    eleccion = lleno.argmax(axis=-1)
+    return np.where(np.isnan(valores).all(axis=-1), -1, eleccion)
+
+def evaluar(datos, ciclos, objetivos, indice_base=None, ventana=None, min_meses=MIN_MESES_OBJETIVO):
+    """
+    `datos`: productos x años x 12 (NaN = sin precio); `ciclos`: meses por
+    producto; `objetivos`: posiciones de los años evaluados; `indice_base`:
+    productos x 12 (opcional). Retorna dict estrategia -> (elección,
+    precio realizado) de forma ventanas x productos, más 'promedio',
+    'mejor', 'mes_mejor' y 'evaluable'.
+    """
+    n_prod, n_años, _ = datos.shape
+    objetivos = np.asarray(objetivos)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        razones = datos / np.nanmean(datos, axis=2, keepdims=True)
+
+        # Años de entrenamiento: completos antes de la siembra más temprana
+        limite = (objetivos[:, None] * 12 - (ciclos[None, :] - 1)) // 12        # ventanas x productos (excl.)
+        años = np.arange(n_años)
+        usar = años[None, None, :] < limite[:, :, None]
+        if ventana:
+            usar &= años[None, None, :] >= (limite - ventana)[:, :, None]
+        entrenamiento = np.where(usar[..., None], razones[None], np.nan)    # ventanas x productos x años x 12
+
+        candidatos = {
+            'indice_anual': np.nanmean(entrenamiento, axis=2),
+            'indice_mediana': np.nanmedian(entrenamiento, axis=2),
+        }
+        # Último año de entrenamiento con algún dato
+        con_dato = ~np.isnan(entrenamiento).all(axis=3)
+        ultimo = np.where(con_dato.any(axis=2), n_años - 1 - np.argmax(con_dato[:, :, ::-1], axis=2), 0)
+        v, p = np.meshgrid(np.arange(len(objetivos)), np.arange(n_prod), indexing='ij')
+        candidatos['ultimo_año'] = np.where(con_dato.any(axis=2)[..., None],
+                                            entrenamiento[v, p, ultimo], np.nan)
+        if indice_base is not None:
+            candidatos['indice_base'] = np.where(con_dato.any(axis=2)[..., None], indice_base[None], np.nan)
+
+        real = datos[:, objetivos].transpose(1, 0, 2)                      # ventanas x productos x 12
+        resultado = {
+            'promedio': np.nanmean(real, axis=2),
+            'mejor': np.nanmax(real, axis=2),
+            'mes_mejor': _elegir(real),
+            'evaluable': (~np.isnan(real)).sum(axis=2) >= min_meses,
+        }
+    for nombre, valores in candidatos.items():
+        eleccion = _elegir(valores)
+        precio = np.take_along_axis(real, np.maximum(eleccion, 0)[..., None], axis=2)[..., 0]
+        resultado[nombre] = (eleccion, np.where(eleccion >= 0, precio, np.nan))
+    return resultado
+
+def detalle(productos, años, objetivos, resultado):
+    """Resultado de evaluar() en formato largo: una fila por ventana, producto y estrategia."""
+    filas = []
+    n_vent, n_prod = resultado['promedio'].shape
+    v, p = np.meshgrid(np.arange(n_vent), np.arange(n_prod), indexing='ij')
+    v, p = v.ravel(), p.ravel()
+    evaluable = resultado['evaluable'].ravel()
+    for nombre in ESTRATEGIAS:
+        if nombre not in resultado:
+            continue
+        eleccion, precio = (x.ravel() for x in resultado[nombre])
+        usar = evaluable & (eleccion >= 0)
+        filas.append(pd.DataFrame({
+            'producto': productos[p[usar]],
+            'año': años[objetivos][v[usar]],
+            'estrategia': nombre,
+            'mes_cosecha': eleccion[usar] + 1,
+            'precio_realizado': precio[usar],
+            'precio_promedio': resultado['promedio'].ravel()[usar],
+            'precio_mejor': resultado['mejor'].ravel()[usar],
+            'acierto': eleccion[usar] == resultado['mes_mejor'].ravel()[usar],
+        }))
+    return pd.concat(filas, ignore_index=True) if filas else pd.DataFrame(columns=COLUMNAS_DETALLE)
+
+def resumir(tabla, por=('producto', 'estrategia')):
+    """Aciertos y mejora sobre el promedio del año (solo ventanas con precio en el mes elegido)."""
+    tabla = tabla.assign(con_precio=tabla['precio_realizado'].notna(),
+                         mejora=(tabla['precio_realizado'] / tabla['precio_promedio'] - 1) * 100)
+    grupos = tabla.groupby(list(por), sort=True)
+    resumen = grupos.agg(ventanas=('año', 'size'), con_precio=('con_precio', 'sum'),
+                         mejora_pct=('mejora', 'mean'))
+    resumen['aciertos_pct'] = (tabla[tabla['con_precio']].groupby(list(por))['acierto'].mean()
+                               .reindex(resumen.index) * 100)
+    return resumen.reset_index()
+
+# ============================================
+# 2. CATÁLOGO COMPLETO
+# ============================================
+def _evaluar_grupo(productos, datos, ciclos, indice_base, años, objetivos, ventana, min_meses):
+    """evaluar() + detalle() para un grupo de productos (se usa en el pool de procesos)."""
+    resultado = evaluar(datos, ciclos, objetivos, indice_base, ventana, min_meses)
+    return detalle(productos, años, objetivos, resultado)
+
+def backtest(series, ciclos, indice_base=None, ventana=None, min_meses=MIN_MESES_OBJETIVO,
+             min_años=MIN_AÑOS_ENTRENAMIENTO, workers=1):
+    """
+    Corre todas las ventanas sobre `series` (producto, año, mes, precio).
+    `ciclos` e `indice_base` son dicts producto -> meses / 12 índices.
+    Retorna el detalle por ventana, producto y estrategia.
+    """
+    productos, años, datos = panel(series)
+    if len(productos) == 0 or len(años) <= min_años:
+        return pd.DataFrame(columns=COLUMNAS_DETALLE)
+    objetivos = np.arange(min_años, len(años))
+    ciclo = np.array([ciclos.get(p, CICLO_DEFECTO) for p in productos], dtype=np.int64)
+    base = None
+    if indice_base is not None:
+        base = np.array([indice_base.get(p, np.full(12, np.nan)) for p in productos], dtype=float)
+
+    n_grupos = max(workers, -(-len(productos) // LOTE))
+    grupos = particionar_productos(np.arange(len(productos)), min(n_grupos, len(productos)))
+    tareas = [(productos[g], datos[g], ciclo[g], None if base is None else base[g],
+               años, objetivos, ventana, min_meses) for g in grupos]
+    partes = _mapear(_evaluar_grupo, tareas, workers)
+    # Mismo orden con cualquier número de workers
+    return pd.concat(partes, ignore_index=True).sort_values(['estrategia', 'producto', 'año'], ignore_index=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtesting walk-forward de estrategias de siembra.")
+    parser.add_argument('--ventana', type=int, help="Años de historia por ventana (por defecto, toda)")
+    parser.add_argument('--min-meses', type=int, default=MIN_MESES_OBJETIVO,
+                        help="Meses con precio exigidos en el año evaluado")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--detalle', help="Guardar el detalle por ventana en este archivo")
+    parser.add_argument('--format', choices=FORMATOS_SALIDA, default='csv')
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    series = series_completas()
+    ciclos = cargar_ciclos().drop_duplicates('producto')
+    ciclos = dict(zip(ciclos['producto'].astype(str), ciclos['ciclo_meses'].astype(int)))
+    base, _ = crear_base_conocimiento()
+    productos, matriz = matriz_indices(base)
+    indice_base = dict(zip(productos, matriz))
+    t_datos = time.perf_counter() - inicio
+
+    t0 = time.perf_counter()
+    tabla = backtest(series, ciclos, indice_base, args.ventana, args.min_meses, workers=args.workers)
+    t_backtest = time.perf_counter() - t0
+
+    if tabla.empty:
+        print("Ningún producto tiene años suficientes para evaluar.", file=sys.stderr)
+        return 1
+    if args.detalle:
+        escribir_resultados(tabla, args.format, args.detalle)
+    print(resumir(tabla, ['estrategia']).round(2).to_string(index=False))
+    print()
+    print(resumir(tabla).round(2).to_string(index=False))
+    print(f"\n{tabla['producto'].nunique()} productos, {tabla['año'].nunique()} años evaluados | "
+          f"datos: {t_datos:.2f} s | backtest: {t_backtest:.2f} s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
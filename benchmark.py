@@ -0,0 +1,289 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+import cache_datos
+import historial
+import indices_estacionales
+import recomendador
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+PRODUCTOS_BASE = 60       # Productos en escala 1 (similar al catálogo actual)
+AÑOS_BASE = [2024, 2025]  # 2025 debe existir: crear_base_conocimiento lo usa
+MERCADOS_BASE = 1
+RUTA_BASELINE = 'benchmark_base.json'
+TOLERANCIA = 0.25         # Regresión si una etapa es >25% más lenta que la base
+
+MESES_NOMBRE = ['Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto',
+                'Septiembre','Octubre','Noviembre','Diciembre']
+MESES_ABREV = ['Ene','Feb','Mar','Abr','May','Jun','Jul','Ago','Set','Oct','Nov','Dic']
+
+# ============================================
+# 1. GENERADORES DE DATOS SINTÉTICOS
+# ============================================
+def generar_datos(carpeta, escala=1, años=AÑOS_BASE, mercados=MERCADOS_BASE, semilla=0):
+    """
+    Escribe en `carpeta` CSV con los mismos esquemas que los del proyecto,
+    con PRODUCTOS_BASE * escala productos, los años y mercados dados.
+    Retorna un diccionario con el número de filas de cada archivo.
+    """
+    rng = np.random.default_rng(semilla)
+    n = PRODUCTOS_BASE * escala
+    productos = ['Camote', 'Plátano Maduro', 'Plátano Verde'] + [f"Producto {i:06d}" for i in range(n - 3)]
+    estacional = 1 + 0.15 * np.sin(np.linspace(0, 2 * np.pi, 12, endpoint=False)[None, :]
+                                   + rng.uniform(0, 2 * np.pi, (n, 1)))
+    estacional *= rng.normal(1, 0.03, (n, 12))
+    filas = {}
+
+    # Índices estacionales: la mitad frutas, la mitad hortalizas
+    mitad = n // 2
+    for archivo, rango in (('frutas_estacionales.csv', slice(1, mitad)),
+                           ('hortalizas_estacionales.csv', slice(mitad, n))):
+        nombres = productos[rango] + (['Camote'] if archivo.startswith('hortalizas') else [])
+        valores = np.vstack([estacional[rango], estacional[:1]]) if archivo.startswith('hortalizas') \
+            else estacional[rango]
+        df = pd.DataFrame(np.round(valores, 4), columns=MESES_ABREV)
+        df.insert(0, 'Cultivo', nombres)
+        df.to_csv(os.path.join(carpeta, archivo), index=False)
+        filas[archivo] = len(df)
+
+    # Precio base por producto
+    precio_base = rng.uniform(200, 3000, n)
+
+    # Historial (producto x mercado x semana)
+    fechas = pd.date_range(f"{min(años)}-01-01", f"{max(años)}-12-31", freq='7D')
+    n_fechas = len(fechas)
+    total = n * mercados * n_fechas
+    p_idx = np.repeat(np.arange(n), mercados * n_fechas)
+    m_idx = np.tile(np.repeat(np.arange(mercados), n_fechas), n)
+    f_idx = np.tile(np.arange(n_fechas), n * mercados)
+    meses = fechas.month.to_numpy()[f_idx]
+    promedio = precio_base[p_idx] * estacional[p_idx, meses - 1] * rng.normal(1, 0.05, total)
+    nombres = np.array(productos, dtype=object)[p_idx]
+    fechas_txt = fechas.strftime('%Y-%m-%d').to_numpy()[f_idx]
+    hist = pd.DataFrame({
+        'producto': nombres,
+        'unidad': 'Kilo',
+        'mayorista': np.array([f"Mercado {i}" for i in range(mercados)], dtype=object)[m_idx],
+        'minimo': np.round(promedio * 0.9, 2),
+        'maximo': np.round(promedio * 1.1, 2),
+        'moda': np.round(promedio, 2),
+        'promedio': np.round(promedio, 2),
+        'fecha': fechas_txt,
+        'año': fechas.year.to_numpy()[f_idx],
+        'mes': meses,
+        'año_mes': pd.Series(fechas_txt).str[:7].to_numpy(),
+        'producto_limpio': nombres,
+        'producto_estandar': nombres,
+    })
+    hist.to_csv(os.path.join(carpeta, 'historial_limpiado.csv'), index=False)
+    filas['historial_limpiado.csv'] = len(hist)
+
+    # Precios mensuales derivados del historial (mismo formato que el real)
+    precios = historial.AcumuladorMensual()
+    precios.agregar(hist)
+    precios = precios.precios_mensuales()
+    precios.to_csv(os.path.join(carpeta, 'precios_mensuales_producto.csv'), index=False)
+    filas['precios_mensuales_producto.csv'] = len(precios)
+
+    general = precios.groupby('producto')['precio_promedio'].mean().reset_index()
+    general.columns = ['producto', 'precio_general']
+    general.to_csv(os.path.join(carpeta, 'precio_general_producto.csv'), index=False)
+    filas['precio_general_producto.csv'] = len(general)
+
+    # Camote (formato de los PDF)
+    años_camote = list(range(min(años), max(años) + 1))
+    camote = pd.DataFrame([(m, round(float(estacional[0, i]), 4), a) for i, m in enumerate(MESES_NOMBRE)
+                           for a in años_camote], columns=['Mes', 'Indice_Estacional', 'Año'])
+    camote['Precio_ColonesKg'] = np.round(400 * camote['Indice_Estacional'] * rng.normal(1, 0.1, len(camote)), 2)
+    camote.to_csv(os.path.join(carpeta, 'camote_precios.csv'), index=False)
+    oferta = camote.drop(columns='Precio_ColonesKg')
+    oferta['Oferta_Toneladas'] = np.round(rng.uniform(50, 200, len(oferta)), 1)
+    oferta.to_csv(os.path.join(carpeta, 'camote_oferta.csv'), index=False)
+    filas['camote_precios.csv'] = filas['camote_oferta.csv'] = len(camote)
+
+    # FAOSTAT
+    fao = pd.DataFrame([(it, y, round(float(rng.uniform(100, 900)), 1))
+                        for it in ('Bananas', 'Plantains and cooking bananas', 'Sweet potatoes')
+                        for y in range(1991, max(años) + 1)], columns=['Item', 'Year', 'Value'])
+    for col, val in (('Domain Code', 'PP'), ('Domain', 'Producer Prices'), ('Area', 'Costa Rica'),
+                     ('Element', 'Producer Price (USD/tonne)'), ('Unit', 'USD'), ('Flag', 'A')):
+        fao[col] = val
+    fao['Year Code'] = fao['Year']
+    fao.to_csv(os.path.join(carpeta, 'FAOSTAT_data_en_2-19-2026.csv'), index=False)
+    filas['FAOSTAT_data_en_2-19-2026.csv'] = len(fao)
+
+    filas['productos'] = n
+    return filas
+
+# ============================================
+# 2. MEDICIÓN
+# ============================================
+def medir(nombre, funcion, filas, preparar=None, repeticiones=3):
+    """
+    Ejecuta `funcion` (tras `preparar`, si se da) y retorna tiempo mínimo,
+    pico de memoria (tracemalloc, en una corrida aparte) y filas/segundo.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    if preparar:
+        preparar()
+    gc.collect()
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    segundos = min(tiempos)
+    return {
+        'etapa': nombre,
+        'segundos': segundos,
+        'pico_mb': pico / 1e6,
+        'filas': filas,
+        'filas_por_s': filas / segundos if segundos > 0 else float('inf'),
+    }
+
+def _sin_caches():
+    cache_datos.limpiar_cache()
+    indices_estacionales._memoria.clear()
+    if os.path.exists(indices_estacionales.RUTA_COMPILADO):
+        os.remove(indices_estacionales.RUTA_COMPILADO)
+
+def correr_escala(escala, años, mercados, repeticiones=3, incluir_app=False):
+    """Genera datos para una escala en una carpeta temporal y mide cada etapa."""
+    original = os.getcwd()
+    resultados = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        filas = generar_datos(carpeta, escala, años, mercados)
+        os.chdir(carpeta)
+        try:
+            entradas = [f for f in filas if f.endswith('.csv') and f != 'historial_limpiado.csv']
+            filas_entradas = sum(filas[f] for f in entradas)
+
+            def cargar_todo():
+                for f in entradas:
+                    cache_datos.leer_csv(f)
+
+            resultados.append(medir('cargar_datos (CSV, sin caché)', cargar_todo, filas_entradas,
+                                    preparar=_sin_caches, repeticiones=repeticiones))
+            cargar_todo()
+            resultados.append(medir('cargar_datos (Parquet en caché)', cargar_todo, filas_entradas,
+                                    repeticiones=repeticiones))
+            resultados.append(medir('agregar_historial (por bloques)', historial.agregar_historial,
+                                    filas['historial_limpiado.csv'], repeticiones=repeticiones))
+            resultados.append(medir('crear_base_conocimiento', recomendador.crear_base_conocimiento,
+                                    filas['productos'], preparar=indices_estacionales._memoria.clear,
+                                    repeticiones=repeticiones))
+
+            base, _ = recomendador.crear_base_conocimiento()
+            productos = sorted(base['producto'].unique())
+            muestra = productos[:200]  # El lazo por producto es lento; se mide una muestra
+
+            def recomendar_lazo():
+                for p in muestra:
+                    recomendador.recomendar_para_producto(base, p)
+
+            resultados.append(medir(f'recomendar_para_producto (x{len(muestra)})', recomendar_lazo,
+                                    len(muestra), repeticiones=repeticiones))
+            resultados.append(medir('recomendar_todos (ciclo por defecto)',
+                                    lambda: recomendador.recomendar_todos(base), len(productos),
+                                    repeticiones=repeticiones))
+            resultados.append(medir('recomendar_todos (ciclos 1-36)',
+                                    lambda: recomendador.recomendar_todos(base, range(1, 37)),
+                                    len(productos) * 36, repeticiones=repeticiones))
+
+            if incluir_app:
+                from streamlit.testing.v1 import AppTest
+                ruta_app = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+                resultados.append(medir('app.py (rerun completo)',
+                                        lambda: AppTest.from_file(ruta_app, default_timeout=600).run(),
+                                        filas_entradas, repeticiones=1))
+        finally:
+            os.chdir(original)
+
+    for r in resultados:
+        r['escala'] = escala
+    return resultados
+
+# ============================================
+# 3. REPORTE Y COMPARACIÓN
+# ============================================
+def imprimir(resultados):
+    df = pd.DataFrame(resultados)[['escala', 'etapa', 'segundos', 'pico_mb', 'filas', 'filas_por_s']]
+    with pd.option_context('display.max_rows', None, 'display.width', 160,
+                           'display.float_format', '{:,.3f}'.format):
+        print(df.to_string(index=False))
+
+def comparar(resultados, ruta_baseline, tolerancia=TOLERANCIA):
+    """Compara contra una base guardada; retorna la lista de regresiones."""
+    with open(ruta_baseline, encoding='utf-8') as f:
+        base = {(r['escala'], r['etapa']): r for r in json.load(f)['resultados']}
+    regresiones = []
+    print(f"\nComparación con {ruta_baseline} (tolerancia {tolerancia:.0%}):")
+    for r in resultados:
+        previo = base.get((r['escala'], r['etapa']))
+        if previo is None:
+            continue
+        cambio = r['segundos'] / previo['segundos'] - 1 if previo['segundos'] > 0 else 0.0
+        marca = 'REGRESIÓN' if cambio > tolerancia else 'ok'
+        print(f"  x{r['escala']:<5} {r['etapa']:<40} {previo['segundos']:8.3f} s -> "
+              f"{r['segundos']:8.3f} s ({cambio:+.0%}) {marca}")
+        if cambio > tolerancia:
+            regresiones.append(r)
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mide carga de datos, base de conocimiento y recomendaciones con datos sintéticos.")
+    parser.add_argument('--escalas', default='1,10',
+                        help="Multiplicadores de productos separados por coma (p. ej. 1,10,100,1000)")
+    parser.add_argument('--años', type=int, default=len(AÑOS_BASE),
+                        help="Años de historial que terminan en 2025")
+    parser.add_argument('--mercados', type=int, default=MERCADOS_BASE)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--app', action='store_true', help="Incluir un rerun completo de app.py")
+    parser.add_argument('--guardar', nargs='?', const=RUTA_BASELINE,
+                        help="Guardar los resultados como base de comparación")
+    parser.add_argument('--comparar', nargs='?', const=RUTA_BASELINE,
+                        help="Comparar con una base guardada (sale con código 1 si hay regresiones)")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+
+    años = list(range(2025 - args.años + 1, 2026))
+    resultados = []
+    for escala in (int(e) for e in args.escalas.split(',')):
+        print(f"Escala x{escala}: {PRODUCTOS_BASE * escala} productos, {len(años)} años, "
+              f"{args.mercados} mercados...", file=sys.stderr)
+        resultados.extend(correr_escala(escala, años, args.mercados, args.repeticiones, args.app))
+
+    imprimir(resultados)
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({'fecha': time.strftime('%Y-%m-%d %H:%M:%S'), 'resultados': resultados},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\nBase guardada en {args.guardar}")
+
+    if args.comparar:
+        if comparar(resultados, args.comparar, args.tolerancia):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import bisect
+import difflib
+import re
+import threading
+import unicodedata
+
+# ============================================
+# 1. NORMALIZACIÓN
+# ============================================
+def normalizar(texto):
+    """Minúsculas, sin tildes y solo letras/números separados por espacio."""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'[a-z0-9]+', texto.lower()))
+
+def tokens(texto):
+    return normalizar(texto).split()
+
+# ============================================
+# 2. ÍNDICE DE NOMBRES DE PRODUCTO
+# ============================================
+class IndiceProductos:
+    """
+    Índice invertido token normalizado -> ids de producto, con búsqueda por
+    prefijo y aproximada. Se arma una vez y crece con agregar() a medida que
+    aparecen nombres nuevos (p. ej. al cargar otra fuente).
+    """
+
+    def __init__(self, nombres=()):
+        self.nombres = []        # id -> nombre original
+        self.ids = {}            # nombre original -> id
+        self.normalizados = []   # id -> nombre normalizado
+        self.tokens = {}         # token -> set de ids
+        self._ordenados = []     # tokens ordenados (búsqueda por prefijo)
+        self._memo = {}          # término -> frozenset de ids
+        self._lock = threading.Lock()
+        self.agregar(nombres)
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def agregar(self, nombres):
+        """Agrega los nombres que todavía no están en el índice."""
+        nuevos = [n for n in dict.fromkeys(nombres) if isinstance(n, str) and n not in self.ids]
+        if not nuevos:
+            return
+        with self._lock:
+            for nombre in nuevos:
+                if nombre in self.ids:
+                    continue
+                i = len(self.nombres)
+                self.nombres.append(nombre)
+                self.ids[nombre] = i
+                norm = normalizar(nombre)
+                self.normalizados.append(norm)
+                for tok in norm.split():
+                    self.tokens.setdefault(tok, set()).add(i)
+            self._ordenados = sorted(self.tokens)
+            self._memo = {}
+
+    def _ids_prefijo(self, prefijo):
+        """Ids de los productos con algún token que empieza con `prefijo`."""
+        ids = set()
+        i = bisect.bisect_left(self._ordenados, prefijo)
+        while i < len(self._ordenados) and self._ordenados[i].startswith(prefijo):
+            ids |= self.tokens[self._ordenados[i]]
+            i += 1
+        return ids
+
+    def coincidencias(self, termino):
+        """Ids cuyos tokens cubren (por prefijo) todos los tokens del término."""
+        memo = self._memo
+        if termino in memo:
+            return memo[termino]
+        ids = None
+        for tok in tokens(termino):
+            encontrados = self._ids_prefijo(tok)
+            ids = encontrados if ids is None else ids & encontrados
+            if not ids:
+                break
+        resultado = frozenset(ids or ())
+        memo[termino] = resultado
+        return resultado
+
+    def nombres_con(self, termino, excluir=None):
+        """Nombres que contienen `termino` y no contienen `excluir`."""
+        ids = self.coincidencias(termino)
+        if excluir:
+            ids = ids - self.coincidencias(excluir)
+        return {self.nombres[i] for i in ids}
+
+    def mascara(self, serie, termino, excluir=None):
+        """
+        Máscara booleana de una Serie de nombres, equivalente a
+        str.contains(termino) & ~str.contains(excluir) sin tildes ni mayúsculas.
+        Los nombres de la Serie que falten se agregan al índice.
+        """
+        if hasattr(serie, 'cat'):
+            valores = serie.cat.categories
+        else:
+            valores = serie.dropna().unique()
+        self.agregar(valores)
+        return serie.isin(self.nombres_con(termino, excluir))
+
+    def exacto(self, consulta):
+        """Nombre cuyo normalizado es igual al de la consulta; None si no hay uno solo."""
+        norm = normalizar(consulta)
+        exactos = [n for n, nn in zip(self.nombres, self.normalizados) if nn == norm]
+        return exactos[0] if len(exactos) == 1 else None
+
+    def buscar(self, consulta, limite=10):
+        """
+        Nombres ordenados por relevancia: coincidencia exacta, luego todos los
+        tokens por prefijo; si nada coincide, tokens aproximados (errores de
+        tipeo) y por último similitud del nombre completo.
+        """
+        norm = normalizar(consulta)
+        if not norm:
+            return []
+        resultado = []
+
+        exactos = [n for n, nn in zip(self.nombres, self.normalizados) if nn == norm]
+        resultado.extend(exactos)
+
+        por_prefijo = sorted(self.coincidencias(consulta), key=lambda i: (len(self.nombres[i]), self.nombres[i]))
+        resultado.extend(self.nombres[i] for i in por_prefijo)
+
+        if not resultado:
+            ids = None
+            for tok in norm.split():
+                cercanos = self._ids_prefijo(tok)
+                for parecido in difflib.get_close_matches(tok, self._ordenados, n=5, cutoff=0.75):
+                    cercanos |= self.tokens[parecido]
+                ids = cercanos if ids is None else ids & cercanos
+            if ids:
+                resultado.extend(self.nombres[i] for i in sorted(ids, key=lambda i: len(self.nombres[i])))
+
+        if not resultado:
+            for parecido in difflib.get_close_matches(norm, self.normalizados, n=limite, cutoff=0.6):
+                resultado.extend(n for n, nn in zip(self.nombres, self.normalizados) if nn == parecido)
+
+        return list(dict.fromkeys(resultado))[:limite]
@@ -0,0 +1,90 @@
+import os
+import glob
+import hashlib
+import pandas as pd
+
+import calidad
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+DIR_CACHE = '.cache_datos'  # Carpeta con las copias Parquet de los CSV
+
+# Columnas de texto repetitivas que se guardan como categóricas
+COLUMNAS_CATEGORICAS = ('producto', 'producto_limpio', 'producto_estandar')
+
+# ============================================
+# 1. LECTURA DE CSV CON CACHÉ PARQUET
+# ============================================
+def _leer_csv_fuente(ruta, **kwargs):
+    """Lee el CSV original probando utf-8 y luego latin1."""
+    try:
+        return pd.read_csv(ruta, encoding='utf-8', **kwargs)
+    except UnicodeDecodeError:
+        return pd.read_csv(ruta, encoding='latin1', **kwargs)
+
+def _opciones(ruta, categoricas, kwargs):
+    """
+    Hash de la ruta completa y de las opciones de lectura (categóricas y
+    argumentos de read_csv): cada combinación tiene su propia copia.
+    None si algún argumento no tiene una representación estable (funciones).
+    """
+    if any(callable(v) for v in kwargs.values()):
+        return None
+    texto = repr((os.path.abspath(ruta), tuple(categoricas), sorted(kwargs.items())))
+    return hashlib.md5(texto.encode('utf-8')).hexdigest()[:8]
+
+def _ruta_cache(ruta, dir_cache, opciones):
+    """Nombre del Parquet para el estado actual del CSV (opciones, mtime, tamaño y reglas de calidad)."""
+    st = os.stat(ruta)
+    nombre = os.path.basename(ruta)
+    return os.path.join(dir_cache, f"{nombre}.{opciones}.{st.st_mtime_ns}.{st.st_size}"
+                                   f".{calidad.VERSION_REGLAS}.parquet")
+
+def leer_csv(ruta, categoricas=COLUMNAS_CATEGORICAS, dir_cache=DIR_CACHE, **kwargs):
+    """
+    Lee un CSV reutilizando su copia Parquet si el archivo no cambió.
+    Si la copia no existe (o cambió el mtime/tamaño del CSV) se parsea el CSV,
+    se marcan las filas con problemas de calidad (columna 'bandera', ver
+    calidad.REGLAS, elegida por las columnas del archivo), se convierten a categóricas las columnas indicadas y se
+    guarda el Parquet. Sin pyarrow se lee el CSV directamente. Los `kwargs`
+    (de read_csv) y `categoricas` forman parte del nombre de la copia; con
+    argumentos que son funciones no se usa la caché.
+    """
+    opciones = _opciones(ruta, categoricas, kwargs)
+    destino = _ruta_cache(ruta, dir_cache, opciones) if opciones else None
+    if destino and os.path.exists(destino):
+        try:
+            return pd.read_parquet(destino)
+        except Exception:
+            pass  # Copia dañada o sin motor Parquet: se regenera abajo
+
+    df = _leer_csv_fuente(ruta, **kwargs)
+    df = calidad.marcar(df)  # Regla según el esquema; reporte: calidad.resumen_texto o python calidad.py
+    for col in categoricas:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if destino is None:
+        return df
+
+    try:
+        os.makedirs(dir_cache, exist_ok=True)
+        tmp = f"{destino}.{os.getpid()}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, destino)
+        # Borrar copias de versiones anteriores del mismo CSV con las mismas opciones
+        patron = os.path.join(dir_cache, glob.escape(f"{os.path.basename(ruta)}.{opciones}") + '.*.parquet')
+        for viejo in glob.glob(patron):
+            if viejo != destino:
+                os.remove(viejo)
+    except (ImportError, ValueError):
+        pass  # Sin pyarrow o tipos no soportados: se trabaja solo con el CSV
+    except OSError as e:
+        print(f"No se pudo guardar la caché de {ruta}: {e}")
+
+    return df
+
+def limpiar_cache(dir_cache=DIR_CACHE):
+    """Elimina todas las copias Parquet."""
+    for archivo in glob.glob(os.path.join(dir_cache, '*.parquet')):
+        os.remove(archivo)
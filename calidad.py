@@ -0,0 +1,166 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+VERSION_REGLAS = 'c2'   # Cambiarla invalida las copias Parquet ya marcadas
+Z_ATIPICO = 3.5         # |z| robusto (MAD sobre log-precio) para marcar un atípico
+MIN_OBS_MAD = 5         # Grupos (por período) más chicos no se evalúan por MAD
+MAD_MINIMO = 0.1        # Piso de la MAD en log-precio: con precios casi fijos un salto del 20-40 % no es atípico
+VALORES_CENTINELA = (1.0,)  # Valores de relleno que aparecen en lugar de un precio
+
+# Reglas por tipo de fuente: columna de valor, columna que agrupa (para
+# el z robusto y la unidad dominante), columna de unidad, claves que no
+# pueden repetirse y período de referencia del z robusto. La regla de un
+# archivo se elige por su esquema (columnas de valor y grupo), no por su
+# nombre: una copia del historial con otro nombre se valida igual. Los
+# archivos que no coinciden con ninguna regla no se validan.
+# El z robusto compara cada valor con la mediana de su grupo en el mismo
+# período (mes del boletín diario, año de las series mensuales), no con
+# toda la historia: una tendencia o una temporada alta sostenida no son
+# atípicos, un precio con un cero de más sí.
+REGLAS = {
+    'historial': {'valor': 'promedio', 'grupo': 'producto_estandar', 'unidad': 'unidad',
+                  'claves': ['producto', 'mayorista', 'fecha'], 'periodo': ['año', 'mes']},
+    'mensual': {'valor': 'precio_promedio', 'grupo': 'producto',
+                'claves': ['producto', 'año', 'mes'], 'periodo': ['año']},
+    'precio_general': {'valor': 'precio_general', 'grupo': 'producto', 'claves': ['producto']},
+    'camote': {'valor': 'Precio_ColonesKg', 'claves': ['Año', 'Mes'], 'periodo': ['Año']},
+}
+
+# Archivos que revisa `python calidad.py` sin argumentos
+ARCHIVOS = ['historial_limpiado.csv', 'precios_mensuales_producto.csv',
+            'precio_general_producto.csv', 'camote_precios.csv']
+
+COLUMNA_BANDERA = 'bandera'  # '' = fila válida; si no, banderas separadas por coma
+
+# ============================================
+# 1. VALIDACIÓN VECTORIZADA
+# ============================================
+def _z_robusto(valores, grupos):
+    """z robusto de log(valor) respecto a la mediana y MAD de su grupo (NaN si no aplica)."""
+    logv = pd.Series(np.log(valores.where(valores > 0)), index=valores.index)
+    agrupado = logv.groupby(grupos, observed=True, sort=False)
+    mediana = agrupado.transform('median')
+    desvio = (logv - mediana).abs()
+    mad = desvio.groupby(grupos, observed=True, sort=False).transform('median')
+    n = agrupado.transform('count')
+    z = 0.6745 * (logv - mediana) / mad.clip(lower=MAD_MINIMO)
+    return z.where(n >= MIN_OBS_MAD)
+
+def validar(df, valor, grupo=None, unidad=None, claves=None, periodo=None):
+    """
+    Retorna una copia de `df` con la columna 'bandera'. Banderas posibles:
+    no_numerico, no_positivo, centinela, atipico, unidad, duplicado.
+    """
+    df = df.copy()
+    valores = pd.to_numeric(df[valor], errors='coerce')
+    grupos = df[grupo].astype(str).to_numpy() if grupo else np.zeros(len(df), dtype=int)
+    banderas = {
+        'no_numerico': valores.isna().to_numpy(),
+        'no_positivo': (valores <= 0).to_numpy(),
+        'centinela': valores.isin(VALORES_CENTINELA).to_numpy(),
+    }
+
+    # El z robusto se calcula sin los valores ya descartados
+    sospechosos = banderas['no_numerico'] | banderas['no_positivo'] | banderas['centinela']
+    grupos_z = pd.Series(grupos, index=df.index).astype(str)
+    for col in periodo or []:
+        if col in df.columns:
+            grupos_z = grupos_z + '|' + df[col].astype(str)
+    z = _z_robusto(valores.where(~sospechosos), grupos_z.to_numpy())
+    banderas['atipico'] = (z.abs() > Z_ATIPICO).to_numpy()
+
+    # Unidad distinta de la más frecuente del grupo (precios no comparables)
+    if unidad and unidad in df.columns:
+        u = df[unidad].astype(str).str.strip().to_numpy()
+        conteo = pd.DataFrame({'grupo': grupos, 'unidad': u}).value_counts()  # De mayor a menor
+        dominante = conteo.reset_index().drop_duplicates('grupo').set_index('grupo')['unidad']
+        banderas['unidad'] = df[unidad].isna().to_numpy() | (u != dominante.reindex(grupos).to_numpy())
+
+    if claves and all(c in df.columns for c in claves):
+        banderas['duplicado'] = df.duplicated(claves, keep='first').to_numpy()
+
+    texto = np.full(len(df), '', dtype=object)
+    for nombre, mascara in banderas.items():
+        texto = np.where(mascara, texto + nombre + ',', texto)
+    df[COLUMNA_BANDERA] = pd.Series(texto, index=df.index, dtype=object).str.rstrip(',')
+    return df
+
+def rol(columnas):
+    """Tipo de fuente (clave de REGLAS) cuyas columnas de valor y grupo están en `columnas`; None si ninguno."""
+    columnas = set(columnas)
+    roles = [r for r, regla in REGLAS.items()
+             if regla['valor'] in columnas and (not regla.get('grupo') or regla['grupo'] in columnas)]
+    if len(roles) > 1:
+        raise ValueError(f"Las columnas coinciden con varias reglas de calidad: {', '.join(roles)}")
+    return roles[0] if roles else None
+
+def marcar(df, tipo=None):
+    """
+    Aplica la regla del tipo de fuente `tipo` o, sin él, la que corresponde
+    al esquema de df (si no corresponde a ninguna, retorna df igual). Un
+    tipo explícito sin sus columnas de valor y grupo es un error.
+    """
+    if tipo is None:
+        tipo = rol(df.columns)
+        if tipo is None:
+            return df
+    elif tipo not in REGLAS:
+        raise ValueError(f"No hay regla de calidad para '{tipo}' (hay: {', '.join(REGLAS)})")
+    regla = REGLAS[tipo]
+    faltan = [c for c in (regla['valor'], regla.get('grupo')) if c and c not in df.columns]
+    if faltan:
+        raise ValueError(f"Faltan columnas de la regla de calidad '{tipo}': {', '.join(faltan)}")
+    return validar(df, **regla)
+
+def validos(df):
+    """Filas sin bandera, sin la columna 'bandera' (df sin validar pasa igual)."""
+    if df is None or COLUMNA_BANDERA not in df.columns:
+        return df
+    return df[df[COLUMNA_BANDERA] == ''].drop(columns=COLUMNA_BANDERA)
+
+# ============================================
+# 2. REPORTE
+# ============================================
+def reporte(df):
+    """Conteo de filas por bandera (una fila puede tener varias)."""
+    if COLUMNA_BANDERA not in df.columns:
+        return pd.Series(dtype=int)
+    banderas = df[COLUMNA_BANDERA][df[COLUMNA_BANDERA] != ''].str.split(',').explode()
+    return banderas.value_counts()
+
+def resumen_texto(nombre, df):
+    """Una línea: cuántas filas se marcaron y por qué."""
+    conteo = reporte(df)
+    marcadas = int((df[COLUMNA_BANDERA] != '').sum()) if COLUMNA_BANDERA in df.columns else 0
+    detalle = ', '.join(f"{b}: {n}" for b, n in conteo.items())
+    return f"{nombre}: {marcadas} de {len(df)} filas marcadas" + (f" ({detalle})" if detalle else "")
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de calidad de los archivos de precios.")
+    parser.add_argument('archivos', nargs='*', default=ARCHIVOS, help="Por defecto, los archivos de precios conocidos")
+    parser.add_argument('--detalle', action='store_true', help="Mostrar las filas marcadas")
+    args = parser.parse_args()
+
+    for ruta in args.archivos:
+        if not os.path.exists(ruta):
+            print(f"{ruta}: no encontrado")
+            continue
+        # Se valida el CSV original (la caché de cache_datos guarda el mismo resultado)
+        try:
+            df = pd.read_csv(ruta, encoding='utf-8')
+        except UnicodeDecodeError:
+            df = pd.read_csv(ruta, encoding='latin1')
+        df = marcar(df)
+        print(resumen_texto(ruta, df))
+        if args.detalle and COLUMNA_BANDERA in df.columns:
+            marcadas = df[df[COLUMNA_BANDERA] != '']
+            if not marcadas.empty:
+                print(marcadas.to_string(max_rows=50))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import historial
+from recomendador import (CICLOS_TABLA, RUTA_TABLA_RECOMENDACIONES, calcular_indices_reales,
+                          cargar_camote, cargar_ciclos, cargar_indices, cargar_precios_mensuales,
+                          integrar_base, recomendar_todos)
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+WORKERS = os.cpu_count() or 1
+PARTICIONES_POR_WORKER = 4  # Particiones más pequeñas reparten mejor la carga
+MIN_BYTES_PARTICION = 1 << 22  # Rangos del historial más chicos no compensan el pool
+
+# Cada etapa se divide en particiones independientes (rangos de bytes del
+# historial, grupos de productos) que se procesan en un pool de procesos.
+# Los resultados se unen siempre en el orden de las particiones, así la
+# salida no depende de qué worker termina primero. Con workers=1 todo
+# corre en el proceso actual, sin pool.
+
+def _mapear(funcion, tareas, workers):
+    """map ordenado: en serie con un worker, en un pool de procesos con más."""
+    if workers <= 1 or len(tareas) <= 1:
+        return [funcion(*t) for t in tareas]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tareas))) as pool:
+        return list(pool.map(funcion, *zip(*tareas)))
+
+# ============================================
+# 1. HISTORIAL POR RANGOS DE BYTES
+# ============================================
+def _contar_lineas(f, desde, hasta, tamano=1 << 24):
+    """Saltos de línea en los bytes [desde, hasta) de un archivo abierto en binario."""
+    f.seek(desde)
+    n = 0
+    while desde < hasta:
+        trozo = f.read(min(tamano, hasta - desde))
+        if not trozo:
+            break
+        n += trozo.count(b'\n')
+        desde += len(trozo)
+    return n
+
+def rangos_bytes(ruta, n, minimo=MIN_BYTES_PARTICION):
+    """
+    Divide las filas de datos del CSV en hasta `n` rangos de bytes
+    [desde, hasta) de al menos `minimo` bytes, cortados en inicio de línea
+    (el historial no tiene saltos de línea dentro de los campos).
+    Retorna (desde, hasta, fila) con `fila` = filas de datos antes del rango.
+    """
+    tamano = os.path.getsize(ruta)
+    with open(ruta, 'rb') as f:
+        inicio = len(f.readline())  # Sin el encabezado
+        n = max(1, min(n, (tamano - inicio) // max(minimo, 1)))
+        cortes = [inicio]
+        for objetivo in np.linspace(inicio, tamano, n + 1)[1:-1]:
+            f.seek(int(objetivo) - 1)
+            f.readline()  # Avanza hasta el próximo inicio de línea
+            cortes.append(max(f.tell(), cortes[-1]))
+        cortes.append(tamano)
+        rangos, fila = [], 0
+        for a, b in zip(cortes[:-1], cortes[1:]):
+            if b > a:
+                rangos.append((a, b, fila))
+                fila += _contar_lineas(f, a, b)
+    return rangos
+
+def _agregar_rango(ruta, desde, hasta, tamano, mascara):
+    """Acumuladores (producto, año, mes) de las filas válidas de un rango de bytes del historial."""
+    acumulador = historial.AcumuladorMensual()
+    for bloque in historial.leer_bloques(ruta, tamano, desde=desde, hasta=hasta, mascara=mascara):
+        acumulador.agregar(bloque)
+    return acumulador.tabla
+
+def agregar_historial_paralelo(ruta=historial.RUTA_HISTORIAL, workers=WORKERS, tamano=historial.TAMANO_BLOQUE,
+                               minimo=MIN_BYTES_PARTICION):
+    """
+    Igual que historial.agregar_historial, pero cada worker parsea solo su
+    rango de bytes del archivo y los acumuladores se combinan en orden
+    (fórmula de Chan). La validación se hace una vez sobre todo el archivo
+    (historial.mascara_validos) y cada worker recibe la parte de su rango.
+    """
+    mascara = historial.mascara_validos(ruta)
+    rangos = rangos_bytes(ruta, workers * PARTICIONES_POR_WORKER, minimo)
+    limites = [fila for _, _, fila in rangos[1:]] + [len(mascara)]
+    tareas = [(ruta, a, b, tamano, mascara[fila:fin]) for (a, b, fila), fin in zip(rangos, limites)]
+    acumulador = historial.AcumuladorMensual()
+    for tabla in _mapear(_agregar_rango, tareas, workers):
+        acumulador.combinar(tabla)
+    return acumulador
+
+# ============================================
+# 2. BASE Y RECOMENDACIONES POR GRUPOS DE PRODUCTOS
+# ============================================
+def _procesar_productos(indices, precios, camote, ciclos, lista_ciclos):
+    """Base de conocimiento y recomendaciones de un grupo de productos."""
+    indices_reales = calcular_indices_reales(precios) if not precios.empty else None
+    base = integrar_base(indices, indices_reales, camote, ciclos)
+    return base, recomendar_todos(base, lista_ciclos)
+
+def particionar_productos(productos, n):
+    """Reparte los productos ordenados en `n` grupos contiguos."""
+    productos = sorted(productos)
+    return [list(p) for p in np.array_split(np.array(productos, dtype=object), n) if len(p)]
+
+def construir_paralelo(precios=None, workers=WORKERS, ciclos_tabla=CICLOS_TABLA):
+    """
+    Construye la base de conocimiento y la tabla de recomendaciones
+    repartiendo los productos entre `workers` procesos.
+    Retorna (base, ciclos, tabla) con la tabla ordenada por (producto, ciclo).
+    """
+    indices = cargar_indices()
+    if precios is None:
+        precios = cargar_precios_mensuales()
+    camote = cargar_camote()
+    ciclos = cargar_ciclos()
+
+    productos = set()
+    if not indices.empty:
+        productos |= set(indices['producto'].astype(str))
+    if not precios.empty:
+        precios = precios.assign(producto=precios['producto'].astype(str))
+        productos |= set(precios['producto'])
+    if not camote.empty:
+        productos.add('Camote')
+    if not productos:
+        return pd.DataFrame(), ciclos, recomendar_todos(pd.DataFrame(), ciclos_tabla)
+
+    grupos = particionar_productos(productos, max(1, workers * PARTICIONES_POR_WORKER))
+    tareas = []
+    for grupo in grupos:
+        miembros = set(grupo)
+        tareas.append((
+            indices[indices['producto'].isin(miembros)] if not indices.empty else indices,
+            precios[precios['producto'].isin(miembros)] if not precios.empty else precios,
+            camote if 'Camote' in miembros else camote.iloc[0:0],
+            ciclos,
+            list(ciclos_tabla),
+        ))
+
+    partes = _mapear(_procesar_productos, tareas, workers)
+    base = pd.concat([b for b, _ in partes], ignore_index=True)
+    tabla = pd.concat([t for _, t in partes if not t.empty], ignore_index=True)
+    tabla = tabla.sort_values(['producto', 'ciclo_meses'], kind='stable', ignore_index=True)
+    return base, ciclos, tabla
+
+# ============================================
+# 3. VERIFICACIÓN DE EQUIVALENCIA
+# ============================================
+def _iguales(a, b):
+    """Mismas filas y conteos; medias y desviaciones salvo el redondeo de combinar acumuladores."""
+    try:
+        pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True),
+                                      check_exact=False, rtol=1e-9, check_dtype=False)
+        return True
+    except AssertionError:
+        return False
+
+def verificar(ruta=historial.RUTA_HISTORIAL, workers=WORKERS):
+    """
+    Compara precios_mensuales() de una pasada con: bloques de otros tamaños,
+    el armado paralelo con varios workers y rangos chicos, y la actualización
+    incremental (reconstruir con las filas hasta una fecha de corte y
+    actualizar con el resto). Retorna una lista de (caso, bool).
+    """
+    import incremental  # Importa recomendador; solo hace falta aquí
+    ruta = os.path.abspath(ruta)
+    base = historial.agregar_historial(ruta).precios_mensuales()
+    minimo = max(1, os.path.getsize(ruta) // 16)
+    casos = []
+    for tamano in (97, 1000, historial.TAMANO_BLOQUE):
+        casos.append((f"bloques de {tamano} filas",
+                      _iguales(base, historial.agregar_historial(ruta, tamano).precios_mensuales())))
+    for w in sorted({1, 2, max(workers, 1)}):
+        paralelo = agregar_historial_paralelo(ruta, w, 97, minimo).precios_mensuales()
+        casos.append((f"paralelo, {w} workers", _iguales(base, paralelo)))
+
+    # Incremental en una carpeta temporal (el estado usa rutas relativas)
+    crudo = pd.read_csv(ruta)
+    corte = crudo['fecha'].dropna().sort_values().iloc[len(crudo) // 2]
+    previo, resto = crudo[crudo['fecha'] <= corte], crudo[~(crudo['fecha'] <= corte)]
+    carpeta, actual = tempfile.mkdtemp(prefix='verificar_'), os.getcwd()
+    try:
+        os.chdir(carpeta)
+        previo.to_csv('historial.csv', index=False)
+        incremental.reconstruir('historial.csv', 'incremental.csv')
+        pd.concat([previo, resto]).to_csv('historial.csv', index=False)
+        incremental.actualizar_desde_historial('historial.csv', 'incremental.csv')
+        completo = incremental.reconstruir('historial.csv', 'completo.csv')
+        casos.append((f"incremental (corte {corte})",
+                      _iguales(completo, pd.read_csv('incremental.csv'))
+                      and _iguales(base, completo)))
+    finally:
+        os.chdir(actual)
+        shutil.rmtree(carpeta, ignore_errors=True)
+    return casos
+
+# ============================================
+# 4. ETAPA COMPLETA
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(
+        description="Construye la base de conocimiento y recomendaciones.parquet en paralelo.")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="Procesos a usar (1 = sin pool)")
+    parser.add_argument('--historial', nargs='?', const=historial.RUTA_HISTORIAL,
+                        help="Reagregar antes los precios mensuales desde el historial")
+    parser.add_argument('--salida', default=RUTA_TABLA_RECOMENDACIONES)
+    parser.add_argument('--verificar', action='store_true',
+                        help="Solo comprobar que bloques, workers e incremental dan la misma agregación")
+    args = parser.parse_args()
+
+    if args.verificar:
+        casos = verificar(args.historial or historial.RUTA_HISTORIAL, args.workers)
+        for caso, igual in casos:
+            print(f"{caso}: {'igual' if igual else 'DISTINTO'}")
+        return 0 if all(igual for _, igual in casos) else 1
+
+    inicio = time.perf_counter()
+    precios = None
+    if args.historial:
+        precios = agregar_historial_paralelo(args.historial, args.workers).precios_mensuales()
+        precios.to_csv(historial.RUTA_PRECIOS_MENSUALES, index=False)
+        print(f"{len(precios)} filas (producto, año, mes) -> {historial.RUTA_PRECIOS_MENSUALES} "
+              f"({time.perf_counter() - inicio:.2f} s)")
+
+    t0 = time.perf_counter()
+    base, _, tabla = construir_paralelo(precios, args.workers)
+    tmp = f"{args.salida}.{os.getpid()}.tmp"
+    tabla.to_parquet(tmp, index=False)
+    os.replace(tmp, args.salida)
+    print(f"{base['producto'].nunique() if not base.empty else 0} productos, {len(tabla)} recomendaciones "
+          f"-> {args.salida} ({time.perf_counter() - t0:.2f} s)")
+    print(f"Tiempo total con {args.workers} workers: {time.perf_counter() - inicio:.2f} s")
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,215 @@
+import argparse
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+from cache_datos import leer_csv
+from calidad import validos
+from historial import RUTA_HISTORIAL, agregar_historial
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+RUTA_CAMOTE_PRECIOS = 'camote_precios.csv'
+RUTA_CACHE = 'estacionalidad.parquet'  # Índices por producto con la firma de su serie
+Z_ATIPICO = 3.5    # |z| robusto (MAD) sobre el cual una observación se descarta
+Z_BANDA = 1.96     # Banda de confianza del 95 %
+MESES_NOMBRE = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+                'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+# Método (razón a media móvil): para cada producto la serie mensual se
+# arma como un arreglo productos x años x 12. La tendencia es la media
+# móvil centrada 2x12; donde no hay 13 meses seguidos se usa el promedio
+# del año calendario (el criterio de calcular_indices_reales). Las razones
+# precio / tendencia se pasan a logaritmo, se descartan las atípicas con un
+# z robusto (mediana y MAD por producto) y el índice de cada mes es la
+# media geométrica entre años, normalizada para que el promedio sea 1.
+# Todo se calcula con operaciones sobre arreglos para el catálogo completo.
+
+# ============================================
+# 1. SERIES DE ENTRADA (producto, año, mes, precio)
+# ============================================
+def series_historial(ruta=RUTA_HISTORIAL):
+    """Precio promedio mensual por producto a partir del historial del CENADA."""
+    precios = agregar_historial(ruta).precios_mensuales()
+    return precios[['producto', 'año', 'mes', 'precio_promedio']].rename(columns={'precio_promedio': 'precio'})
+
+def series_camote(ruta=RUTA_CAMOTE_PRECIOS):
+    """Serie 2017-2024 del camote (PDF), sin las filas marcadas por calidad.py."""
+    if not os.path.exists(ruta):
+        return pd.DataFrame(columns=['producto', 'año', 'mes', 'precio'])
+    df = validos(leer_csv(ruta))
+    return pd.DataFrame({
+        'producto': 'Camote',
+        'año': df['Año'].astype(int),
+        'mes': df['Mes'].map({m: i + 1 for i, m in enumerate(MESES_NOMBRE)}),
+        'precio': pd.to_numeric(df['Precio_ColonesKg'], errors='coerce'),
+    }).dropna(subset=['mes'])
+
+# ============================================
+# 2. MOTOR VECTORIZADO
+# ============================================
+def panel(series):
+    """
+    Arreglo productos x años x 12 (NaN = sin dato) con los precios positivos.
+    Retorna (productos, años, arreglo).
+    """
+    series = series[series['precio'] > 0]
+    productos = np.array(sorted(series['producto'].astype(str).unique()), dtype=object)
+    años = np.arange(int(series['año'].min()), int(series['año'].max()) + 1) if len(series) else np.array([], int)
+    datos = np.full((len(productos), len(años), 12), np.nan)
+    if len(series):
+        p = pd.Index(productos).get_indexer(series['producto'].astype(str))
+        a = series['año'].to_numpy(dtype=int) - años[0]
+        m = series['mes'].to_numpy(dtype=int) - 1
+        datos[p, a, m] = series['precio'].to_numpy(dtype=float)
+    return productos, años, datos
+
+def tendencia(datos):
+    """
+    Media móvil centrada 2x12 sobre la serie continua de cada producto.
+    Retorna (tendencia con la forma de `datos`, máscara de meses con media móvil).
+    """
+    n_prod, n_años, _ = datos.shape
+    serie = datos.reshape(n_prod, n_años * 12)
+    pesos = np.r_[0.5, np.ones(11), 0.5] / 12
+    media = np.full_like(serie, np.nan)
+    if serie.shape[1] >= 13:
+        ventanas = np.lib.stride_tricks.sliding_window_view(serie, 13, axis=1)
+        media[:, 6:-6] = ventanas @ pesos  # NaN si falta algún mes de la ventana
+    movil = ~np.isnan(media)
+
+    # Respaldo: promedio del año calendario de cada producto
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        anual = np.nanmean(datos, axis=2, keepdims=True)
+    respaldo = np.broadcast_to(anual, datos.shape).reshape(n_prod, n_años * 12)
+    media = np.where(movil, media, respaldo)
+    return media.reshape(datos.shape), movil.reshape(datos.shape)
+
+def estimar(series):
+    """
+    Índices estacionales robustos de todos los productos de `series`.
+    Retorna un DataFrame (producto, mes, indice, inferior, superior, n_obs,
+    atipicos, metodo) con una fila por producto y mes con datos.
+    """
+    columnas = ['producto', 'mes', 'indice', 'inferior', 'superior', 'n_obs', 'atipicos', 'metodo']
+    productos, _, datos = panel(series)
+    if len(productos) == 0:
+        return pd.DataFrame(columns=columnas)
+
+    base, movil = tendencia(datos)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        log_razon = np.log(datos / base)
+
+        # Atípicos: desvío respecto a la mediana del mismo mes, escalado por la MAD del producto
+        mediana_mes = np.nanmedian(log_razon, axis=1, keepdims=True)
+        residuo = log_razon - mediana_mes
+        mad = np.nanmedian(np.abs(residuo), axis=(1, 2), keepdims=True)
+        z = np.where(mad > 0, 0.6745 * residuo / mad, 0.0)
+        atipico = np.abs(z) > Z_ATIPICO
+        limpio = np.where(atipico, np.nan, log_razon)
+
+        n_obs = np.sum(~np.isnan(limpio), axis=1)                 # productos x 12
+        log_indice = np.nanmean(limpio, axis=1)
+        log_indice -= np.nanmean(log_indice, axis=1, keepdims=True)  # promedio geométrico = 1
+
+        # Dispersión robusta por producto (sin atípicos) para la banda de confianza
+        residuo_limpio = limpio - np.nanmean(limpio, axis=1, keepdims=True)
+        sigma = 1.4826 * np.nanmedian(np.abs(residuo_limpio), axis=(1, 2))
+        error = sigma[:, None] / np.sqrt(np.maximum(n_obs, 1))
+        error = np.where(n_obs > 1, error, np.nan)
+
+    metodo = np.where(movil.any(axis=(1, 2)), 'media_movil', 'anual')
+    fila, mes = np.nonzero(n_obs > 0)
+    return pd.DataFrame({
+        'producto': productos[fila].astype(str),
+        'mes': mes + 1,
+        'indice': np.exp(log_indice[fila, mes]),
+        'inferior': np.exp(log_indice[fila, mes] - Z_BANDA * error[fila, mes]),
+        'superior': np.exp(log_indice[fila, mes] + Z_BANDA * error[fila, mes]),
+        'n_obs': n_obs[fila, mes],
+        'atipicos': atipico.sum(axis=1)[fila, mes],
+        'metodo': metodo[fila],
+    }, columns=columnas)
+
+# ============================================
+# 3. CACHÉ POR PRODUCTO
+# ============================================
+def firmas(series):
+    """Hash de la serie (año, mes, precio) de cada producto."""
+    if series.empty:
+        return pd.Series(dtype=str)
+    hashes = pd.util.hash_pandas_object(series[['año', 'mes', 'precio']], index=False)
+    por_producto = hashes.groupby(series['producto'].astype(str).to_numpy()).sum()
+    return por_producto.astype(str)
+
+def calcular_indices(series, ruta_cache=RUTA_CACHE):
+    """
+    estimar() con caché en disco: solo se recalculan (en un solo lote) los
+    productos cuya serie cambió desde la última corrida.
+    """
+    actuales = firmas(series)
+    previo = pd.DataFrame()
+    if ruta_cache and os.path.exists(ruta_cache):
+        try:
+            previo = pd.read_parquet(ruta_cache)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer {ruta_cache}: {e}")
+
+    vigentes = set()
+    if not previo.empty:
+        guardadas = previo.drop_duplicates('producto').set_index('producto')['firma']
+        comunes = guardadas.index.intersection(actuales.index)
+        vigentes = set(comunes[guardadas[comunes].to_numpy() == actuales[comunes].to_numpy()])
+        previo = previo[previo['producto'].isin(vigentes)]
+
+    pendientes = series[~series['producto'].astype(str).isin(vigentes)]
+    nuevos = estimar(pendientes)
+    nuevos['firma'] = nuevos['producto'].map(actuales)
+
+    resultado = pd.concat([previo, nuevos], ignore_index=True) if not previo.empty else nuevos
+    resultado = resultado.sort_values(['producto', 'mes'], ignore_index=True)
+    if ruta_cache:
+        tmp = f"{ruta_cache}.{os.getpid()}.tmp"
+        resultado.to_parquet(tmp, index=False)
+        os.replace(tmp, ruta_cache)
+    return resultado
+
+def series_completas(ruta_historial=RUTA_HISTORIAL):
+    """Historial del CENADA más la serie larga del camote (si un mes se repite, gana el CENADA)."""
+    series = pd.concat([series_camote(), series_historial(ruta_historial)], ignore_index=True)
+    return series.drop_duplicates(['producto', 'año', 'mes'], keep='last')
+
+def indices_reales_robustos(ruta_historial=RUTA_HISTORIAL, ruta_cache=RUTA_CACHE):
+    """Índices (producto, mes, indice) listos para crear_base_conocimiento(indices_reales=...)."""
+    return calcular_indices(series_completas(ruta_historial), ruta_cache)[['producto', 'mes', 'indice']]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Índices estacionales robustos (razón a media móvil) desde el historial.")
+    parser.add_argument('--historial', default=RUTA_HISTORIAL)
+    parser.add_argument('--sin-cache', action='store_true', help="Recalcular todos los productos")
+    parser.add_argument('--producto', help="Mostrar el índice y su banda para un producto")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    resultado = calcular_indices(series_completas(args.historial), None if args.sin_cache else RUTA_CACHE)
+    duracion = time.perf_counter() - inicio
+
+    print(f"{resultado['producto'].nunique()} productos, {len(resultado)} índices mensuales "
+          f"({(resultado.drop_duplicates('producto')['metodo'] == 'media_movil').sum()} con media móvil)")
+    print(f"Observaciones atípicas descartadas: {int(resultado['atipicos'].sum())}")
+    print(f"Tiempo: {duracion:.2f} s")
+    if args.producto:
+        fila = resultado[resultado['producto'] == args.producto]
+        if fila.empty:
+            print(f"Sin índice para {args.producto}")
+        else:
+            print(fila[['mes', 'indice', 'inferior', 'superior', 'n_obs', 'atipicos']].to_string(index=False))
+
+if __name__ == "__main__":
+    main()
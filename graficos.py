@@ -0,0 +1,124 @@
+import io
+from functools import lru_cache
+from matplotlib.figure import Figure
+
+import instrumentacion
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+TAMANO_CACHE = 128  # Gráficos PNG guardados en memoria (LRU) por proceso
+DPI = 100
+
+# Todas las funciones reciben tuplas (hashables) para poder memorizarse: la
+# misma combinación de datos y parámetros retorna los mismos bytes PNG sin
+# volver a dibujar. Se usa Figure directamente (sin pyplot), así ninguna
+# figura queda registrada en el estado global ni se acumula entre reruns.
+
+# ============================================
+# 1. RENDER A PNG
+# ============================================
+def _a_png(fig):
+    """Renderiza la figura a bytes PNG y libera sus recursos."""
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format='png', dpi=DPI, bbox_inches='tight')
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def png_estacionalidad(meses, indices, titulo):
+    """Barras del índice estacional; el mes de mayor índice se resalta en azul."""
+    instrumentacion.fallo_cache('png_estacionalidad')
+    fig = Figure(figsize=(8, 3))
+    ax = fig.subplots()
+    colores = ['green' if x < 1 else 'orange' if x < 1.1 else 'red' for x in indices]
+    bars = ax.bar(meses, indices, color=colores, alpha=0.7)
+    ax.axhline(y=1, color='black', linestyle='--', linewidth=0.8)
+    ax.set_ylabel('Índice de Estacionalidad')
+    ax.set_title(f'Estacionalidad - {titulo}')
+    ax.set_ylim(0, max(indices) * 1.1)
+
+    # Resaltar mejor venta
+    mejor_idx = max(range(len(indices)), key=lambda i: indices[i])
+    bars[mejor_idx].set_color('blue')
+    bars[mejor_idx].set_alpha(0.9)
+    return _a_png(fig)
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def png_linea(etiquetas, valores, titulo, ylabel, xlabel='Mes', color='green'):
+    """Línea con marcadores (p. ej. precio histórico por mes)."""
+    instrumentacion.fallo_cache('png_linea')
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    ax.plot(etiquetas, valores, marker='o', linewidth=2, color=color)
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel(xlabel)
+    ax.set_title(titulo)
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
+    return _a_png(fig)
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def png_barras(etiquetas, valores, titulo, ylabel, xlabel='Mes', color='orange'):
+    """Barras simples (p. ej. oferta por mes)."""
+    instrumentacion.fallo_cache('png_barras')
+    fig = Figure(figsize=(10, 3))
+    ax = fig.subplots()
+    ax.bar(etiquetas, valores, color=color, alpha=0.7)
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel(xlabel)
+    ax.set_title(titulo)
+    ax.tick_params(axis='x', labelrotation=45)
+    return _a_png(fig)
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def png_comparacion(etiquetas, series, titulo, ylabel='Índice (1 = promedio)'):
+    """Varias líneas sobre los mismos meses; `series` = ((nombre, marcador, valores), ...)."""
+    instrumentacion.fallo_cache('png_comparacion')
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    for nombre, marcador, valores in series:
+        ax.plot(etiquetas, valores, marker=marcador, label=nombre, linewidth=2)
+    ax.axhline(y=1, color='gray', linestyle='--', alpha=0.5)
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel('Mes')
+    ax.set_title(titulo)
+    if series:
+        ax.legend()
+    ax.grid(True, alpha=0.3)
+    return _a_png(fig)
+
+def info_cache():
+    """Aciertos/fallos de la caché de cada tipo de gráfico."""
+    return {f.__name__: f.cache_info()._asdict()
+            for f in (png_estacionalidad, png_linea, png_barras, png_comparacion)}
+
+# ============================================
+# 2. GRÁFICOS NATIVOS (VEGA-LITE, SIN MATPLOTLIB)
+# ============================================
+def vega_barras(x, y, titulo, orden, color='orange', ylabel=None):
+    """Especificación Vega-Lite de barras con el eje x en el orden dado."""
+    return {
+        'title': titulo,
+        'mark': {'type': 'bar', 'color': color, 'opacity': 0.8},
+        'encoding': {
+            'x': {'field': x, 'type': 'nominal', 'sort': list(orden), 'title': None},
+            'y': {'field': y, 'type': 'quantitative', 'title': ylabel or y},
+        },
+    }
+
+def vega_lineas(x, y, titulo, orden, serie=None, ylabel=None):
+    """Especificación Vega-Lite de líneas; `serie` es la columna que separa colores."""
+    encoding = {
+        'x': {'field': x, 'type': 'nominal', 'sort': list(orden), 'title': None},
+        'y': {'field': y, 'type': 'quantitative', 'title': ylabel or y},
+    }
+    if serie is not None:
+        encoding['color'] = {'field': serie, 'type': 'nominal', 'title': None}
+    return {
+        'title': titulo,
+        'mark': {'type': 'line', 'point': True},
+        'encoding': encoding,
+    }
@@ -0,0 +1,224 @@
+import argparse
+import io
+import os
+import time
+import numpy as np
+import pandas as pd
+
+import calidad
+from cache_datos import leer_csv
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+RUTA_HISTORIAL = 'historial_limpiado.csv'
+RUTA_PRECIOS_MENSUALES = 'precios_mensuales_producto.csv'
+RUTA_INDICE_MENSUAL = 'indice_precios_mensual.csv'
+TAMANO_BLOQUE = 100_000  # Filas por bloque al leer el historial
+
+CLAVES = ['producto_estandar', 'año', 'mes']
+COLUMNAS_HISTORIAL = CLAVES + ['promedio']
+
+# ============================================
+# 1. LECTURA POR BLOQUES
+# ============================================
+class _RangoBytes(io.RawIOBase):
+    """Lectura binaria del encabezado del CSV seguido solo de los bytes [desde, hasta)."""
+
+    def __init__(self, ruta, desde, hasta):
+        self._archivo = open(ruta, 'rb')
+        self._pendiente = self._archivo.readline()  # Encabezado
+        self._archivo.seek(max(desde, len(self._pendiente)))
+        self._restante = hasta - self._archivo.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        if self._pendiente:
+            n = min(len(destino), len(self._pendiente))
+            destino[:n] = self._pendiente[:n]
+            self._pendiente = self._pendiente[n:]
+            return n
+        n = min(len(destino), self._restante)
+        if n <= 0:
+            return 0
+        leidos = self._archivo.readinto(memoryview(destino)[:n])
+        self._restante -= leidos
+        return leidos
+
+    def close(self):
+        self._archivo.close()
+        super().close()
+
+def mascara_validos(ruta=RUTA_HISTORIAL):
+    """
+    Filas del historial que pasan la regla 'historial' de calidad.py, como
+    arreglo booleano en el orden del archivo. La regla se evalúa una sola
+    vez sobre todo el archivo (duplicados, unidad dominante y atípicos por
+    período dependen de filas de cualquier parte), con la copia marcada de
+    cache_datos.leer_csv; así el resultado no depende de cómo se lea después
+    el archivo (bloques, rangos de bytes, actualización incremental).
+    """
+    df = leer_csv(ruta)
+    if calidad.rol(df.columns) != 'historial' or calidad.COLUMNA_BANDERA not in df.columns:
+        raise ValueError(f"{ruta} no tiene el esquema del historial (regla 'historial' de calidad.py)")
+    return (df[calidad.COLUMNA_BANDERA] == '').to_numpy()
+
+def leer_bloques(ruta=RUTA_HISTORIAL, tamano=TAMANO_BLOQUE, columnas=COLUMNAS_HISTORIAL, desde=0, hasta=None,
+                 mascara=None):
+    """
+    Generador que recorre el historial en bloques de `tamano` filas.
+    Solo lee las columnas necesarias, así la memoria no depende del tamaño del archivo.
+    Con `desde`/`hasta` (offsets en bytes en inicio de línea) recorre solo
+    las filas de ese rango, sin tokenizar el resto del archivo.
+    Con `mascara` (booleano por fila del rango, ver mascara_validos) se
+    descartan las filas marcadas; sin ella se entregan todas.
+    """
+    emitidos = 0
+    for encoding in ('utf-8', 'latin1'):
+        fuente = ruta if not desde and hasta is None else io.BufferedReader(
+            _RangoBytes(ruta, desde, os.path.getsize(ruta) if hasta is None else hasta))
+        fila = 0
+        try:
+            for bloque in pd.read_csv(fuente, usecols=columnas, chunksize=tamano, encoding=encoding):
+                if mascara is not None:
+                    validas = mascara[fila:fila + len(bloque)]
+                    fila += len(bloque)
+                    if len(validas) != len(bloque):
+                        raise ValueError(f"{ruta} tiene más filas que su máscara de validación (¿cambió el archivo?)")
+                    bloque = bloque[validas]
+                emitidos += 1
+                yield bloque
+            if mascara is not None and fila != len(mascara):
+                raise ValueError(f"{ruta} tiene menos filas que su máscara de validación (¿cambió el archivo?)")
+            return
+        except UnicodeDecodeError:
+            # Solo se reintenta con latin1 si aún no se entregó ningún bloque
+            if emitidos or encoding == 'latin1':
+                raise
+        finally:
+            if fuente is not ruta:
+                fuente.close()
+
+# ============================================
+# 2. ACUMULADORES POR PRODUCTO Y MES
+# ============================================
+class AcumuladorMensual:
+    """
+    Estadísticas de `promedio` por (producto_estandar, año, mes) que se
+    actualizan bloque a bloque: conteo, media, M2 (suma de cuadrados de
+    desviaciones), mínimo y máximo. La memoria es proporcional al número de
+    grupos, no de filas.
+    """
+
+    COLUMNAS = ['n', 'media', 'm2', 'minimo', 'maximo']
+
+    def __init__(self, tabla=None):
+        if tabla is None:
+            indice = pd.MultiIndex.from_arrays([[], [], []], names=CLAVES)
+            tabla = pd.DataFrame(columns=self.COLUMNAS, index=indice, dtype=float)
+        self.tabla = tabla
+
+    def agregar(self, bloque):
+        """Incorpora un bloque de filas del historial."""
+        bloque = bloque.dropna(subset=['promedio'])
+        if bloque.empty:
+            return
+        g = bloque.groupby(CLAVES, observed=True)['promedio']
+        parcial = pd.DataFrame({
+            'n': g.count().astype(float),
+            'media': g.mean(),
+            'm2': g.var(ddof=0).fillna(0.0) * g.count(),
+            'minimo': g.min(),
+            'maximo': g.max(),
+        })
+        self.combinar(parcial)
+
+    def combinar(self, otra):
+        """Une otra tabla de acumuladores (fórmula de Chan para media y M2)."""
+        if self.tabla.empty:
+            self.tabla = otra[self.COLUMNAS].copy()
+            return
+        indice = self.tabla.index.union(otra.index)
+        a = self.tabla.reindex(indice)
+        b = otra.reindex(indice)
+        na = a['n'].fillna(0.0).to_numpy()
+        nb = b['n'].fillna(0.0).to_numpy()
+        ma = a['media'].fillna(0.0).to_numpy()
+        mb = b['media'].fillna(0.0).to_numpy()
+        n = na + nb
+        delta = mb - ma
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = np.where(n > 0, ma + delta * nb / n, np.nan)
+            m2 = (a['m2'].fillna(0.0).to_numpy() + b['m2'].fillna(0.0).to_numpy()
+                  + np.where(n > 0, delta ** 2 * na * nb / n, 0.0))
+        self.tabla = pd.DataFrame({
+            'n': n,
+            'media': media,
+            'm2': m2,
+            'minimo': np.fmin(a['minimo'].to_numpy(), b['minimo'].to_numpy()),
+            'maximo': np.fmax(a['maximo'].to_numpy(), b['maximo'].to_numpy()),
+        }, index=indice)
+
+    def precios_mensuales(self):
+        """Tabla con el formato de precios_mensuales_producto.csv."""
+        t = self.tabla.sort_index()
+        n = t['n'].to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            desv = np.where(n > 1, np.sqrt(t['m2'].to_numpy() / (n - 1)), np.nan)
+        df = t.index.to_frame(index=False).rename(columns={'producto_estandar': 'producto'})
+        df['año'] = df['año'].astype(int)
+        df['mes'] = df['mes'].astype(int)
+        df['precio_promedio'] = t['media'].to_numpy()
+        df['desv_estandar'] = desv
+        df['num_registros'] = n.astype(int)
+        return df
+
+# ============================================
+# 3. ÍNDICE MENSUAL DE PRECIOS
+# ============================================
+def indice_precios_mensual(precios):
+    """
+    Índice de cada mes respecto al promedio anual del producto
+    (precio_promedio / media de los meses del mismo año).
+    """
+    df = precios[['producto', 'año', 'mes', 'precio_promedio']].copy()
+    anual = df.groupby(['producto', 'año'], observed=True)['precio_promedio'].transform('mean')
+    df['precio_anual'] = anual
+    df['indice'] = df['precio_promedio'] / anual
+    return df
+
+# ============================================
+# 4. ETAPA COMPLETA
+# ============================================
+def agregar_historial(ruta=RUTA_HISTORIAL, tamano=TAMANO_BLOQUE):
+    """Recorre el historial validado por bloques y retorna el AcumuladorMensual resultante."""
+    acumulador = AcumuladorMensual()
+    for bloque in leer_bloques(ruta, tamano, mascara=mascara_validos(ruta)):
+        acumulador.agregar(bloque)
+    return acumulador
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genera precios_mensuales_producto.csv e indice_precios_mensual.csv "
+                    "a partir del historial del CENADA, leyendo por bloques.")
+    parser.add_argument('--historial', default=RUTA_HISTORIAL)
+    parser.add_argument('--salida', default=RUTA_PRECIOS_MENSUALES)
+    parser.add_argument('--salida-indice', default=RUTA_INDICE_MENSUAL)
+    parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help="Filas por bloque")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    acumulador = agregar_historial(args.historial, args.bloque)
+    precios = acumulador.precios_mensuales()
+    precios.to_csv(args.salida, index=False)
+    indice_precios_mensual(precios).to_csv(args.salida_indice, index=False)
+    duracion = time.perf_counter() - inicio
+
+    print(f"{len(precios)} filas (producto, año, mes) -> {args.salida}")
+    print(f"Índice mensual -> {args.salida_indice}")
+    print(f"Tiempo: {duracion:.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+import numpy as np
+import pandas as pd
+
+from cache_datos import leer_csv
+from calidad import COLUMNA_BANDERA, marcar, validos
+from historial import (AcumuladorMensual, CLAVES, COLUMNAS_HISTORIAL, RUTA_HISTORIAL, RUTA_PRECIOS_MENSUALES,
+                       TAMANO_BLOQUE, leer_bloques, mascara_validos)
+from recomendador import AÑO_INDICE_REAL, calcular_indices_reales, crear_base_conocimiento
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+DIR_ESTADO = 'estado_incremental'
+RUTA_ACUMULADORES = os.path.join(DIR_ESTADO, 'acumuladores.parquet')
+RUTA_MARCA = os.path.join(DIR_ESTADO, 'marca.json')
+DIR_PARTICIONES = os.path.join(DIR_ESTADO, 'indices_reales')  # Una partición por producto
+COLUMNAS_FIRMA = CLAVES + ['promedio', 'fecha']
+
+# La validación del historial (calidad.py) mira todo el archivo: una fila
+# nueva puede cambiar la validez de filas ya incorporadas (unidad
+# dominante, mediana del mes). El estado guarda una firma de las filas
+# incorporadas y de su validez; si al actualizar no coincide, se
+# reconstruye, así el resultado siempre es el de procesar todo de nuevo.
+
+# ============================================
+# 1. ESTADO PERSISTENTE
+# ============================================
+def _escribir_atomico(df, ruta):
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    df.to_parquet(tmp)
+    os.replace(tmp, ruta)
+
+def cargar_estado():
+    """Retorna (AcumuladorMensual, marca de fecha o None, firma o None) desde disco."""
+    if not os.path.exists(RUTA_ACUMULADORES):
+        return AcumuladorMensual(), None, None
+    tabla = pd.read_parquet(RUTA_ACUMULADORES)
+    marca = firma = None
+    if os.path.exists(RUTA_MARCA):
+        with open(RUTA_MARCA, encoding='utf-8') as f:
+            datos = json.load(f)
+        marca, firma = datos.get('fecha'), datos.get('firma')
+    return AcumuladorMensual(tabla), marca, firma
+
+def guardar_estado(acumulador, marca, firma=None):
+    os.makedirs(DIR_ESTADO, exist_ok=True)
+    _escribir_atomico(acumulador.tabla, RUTA_ACUMULADORES)
+    tmp = f"{RUTA_MARCA}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'fecha': marca, 'firma': firma}, f)
+    os.replace(tmp, RUTA_MARCA)
+
+def _firmar(firma, bloque, validas):
+    """Agrega al md5 las filas de un bloque (COLUMNAS_FIRMA) con su validez, fila por fila."""
+    # Tipos fijos: la inferencia de read_csv puede cambiar según el bloque
+    normal = pd.DataFrame({
+        'producto_estandar': bloque['producto_estandar'].astype(str),
+        'año': pd.to_numeric(bloque['año'], errors='coerce').astype(float),
+        'mes': pd.to_numeric(bloque['mes'], errors='coerce').astype(float),
+        'promedio': pd.to_numeric(bloque['promedio'], errors='coerce').astype(float),
+        'fecha': bloque['fecha'].astype(str),
+        'valida': validas,
+    })
+    firma.update(pd.util.hash_pandas_object(normal, index=False).to_numpy().tobytes())
+
+def _recorrer(ruta_historial, marca=None, acumulador=None):
+    """
+    Recorre el historial validado una vez. Retorna (filas válidas posteriores
+    a `marca`, firma de las filas hasta `marca`, firma de todas, fecha máxima
+    leída). Con `acumulador` esas filas se agregan ahí en vez de retornarse.
+    """
+    mascara = mascara_validos(ruta_historial)
+    previa, total = hashlib.md5(), hashlib.md5()
+    partes, maximo, fila = [], None, 0
+    for bloque in leer_bloques(ruta_historial, TAMANO_BLOQUE, COLUMNAS_FIRMA):
+        validas = mascara[fila:fila + len(bloque)]
+        fila += len(bloque)
+        nueva = (bloque['fecha'] > marca).to_numpy() if marca is not None else np.ones(len(bloque), dtype=bool)
+        _firmar(previa, bloque[~nueva], validas[~nueva])
+        _firmar(total, bloque, validas)
+        if (nueva & validas).any():
+            if acumulador is not None:
+                acumulador.agregar(bloque[nueva & validas][COLUMNAS_HISTORIAL])
+            else:
+                partes.append(bloque[nueva & validas])
+        m = bloque['fecha'].max()
+        if pd.notna(m) and (maximo is None or m > maximo):
+            maximo = m
+    if fila != len(mascara):
+        raise ValueError(f"{ruta_historial} cambió mientras se leía")
+    nuevas = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS_FIRMA)
+    return nuevas, previa.hexdigest(), total.hexdigest(), maximo
+
+# ============================================
+# 2. PARTICIONES DE LA BASE DE CONOCIMIENTO
+# ============================================
+def _archivo_particion(producto):
+    """Nombre de archivo estable para un producto (ascii + hash corto)."""
+    ascii_ = unicodedata.normalize('NFKD', producto).encode('ascii', 'ignore').decode()
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', ascii_).strip('_').lower()
+    sufijo = hashlib.md5(producto.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(DIR_PARTICIONES, f"{slug}-{sufijo}.parquet")
+
+def escribir_particiones(precios, productos):
+    """Recalcula y reescribe solo las particiones de `productos`."""
+    os.makedirs(DIR_PARTICIONES, exist_ok=True)
+    subset = precios[precios['producto'].isin(productos)]
+    indices = calcular_indices_reales(subset)
+    for producto in productos:
+        datos = indices[indices['producto'] == producto].reset_index(drop=True)
+        ruta = _archivo_particion(producto)
+        if datos.empty:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            continue
+        _escribir_atomico(datos, ruta)
+
+def leer_particiones():
+    """Une todas las particiones en un DataFrame (producto, mes, indice)."""
+    if not os.path.isdir(DIR_PARTICIONES):
+        return pd.DataFrame(columns=['producto', 'mes', 'indice'])
+    partes = [pd.read_parquet(os.path.join(DIR_PARTICIONES, f))
+              for f in sorted(os.listdir(DIR_PARTICIONES)) if f.endswith('.parquet')]
+    if not partes:
+        return pd.DataFrame(columns=['producto', 'mes', 'indice'])
+    return pd.concat(partes, ignore_index=True)
+
+def cargar_base_incremental():
+    """Base de conocimiento armada con los índices reales de las particiones."""
+    return crear_base_conocimiento(indices_reales=leer_particiones())
+
+# ============================================
+# 3. ACTUALIZACIÓN
+# ============================================
+def reconstruir(ruta_historial=RUTA_HISTORIAL, ruta_salida=RUTA_PRECIOS_MENSUALES):
+    """Procesa todo el historial y deja el estado, la marca y las particiones al día."""
+    acumulador = AcumuladorMensual()
+    _, _, firma, marca = _recorrer(ruta_historial, acumulador=acumulador)  # Marca de todo lo leído
+    precios = acumulador.precios_mensuales()
+    precios.to_csv(ruta_salida, index=False)
+    if os.path.isdir(DIR_PARTICIONES):
+        for f in os.listdir(DIR_PARTICIONES):
+            os.remove(os.path.join(DIR_PARTICIONES, f))
+    escribir_particiones(precios, sorted(precios['producto'].unique()))
+    guardar_estado(acumulador, marca, firma)
+    return precios
+
+def actualizar_con_filas(nuevas, ruta_salida=RUTA_PRECIOS_MENSUALES, marca_leida=None, firma=None):
+    """
+    Incorpora filas nuevas del historial (columnas de historial_limpiado.csv,
+    ya validadas: ver filas_validas).
+    Se descartan las que no superan la marca de fecha; se actualizan los
+    acumuladores de los meses tocados y se reescriben solo las particiones
+    de los productos cuyo año de referencia cambió. `marca_leida` y `firma`
+    (de todas las filas leídas del historial) se guardan con el estado.
+    Retorna un diccionario con el resumen de la actualización.
+    """
+    if not os.path.exists(RUTA_ACUMULADORES):
+        raise FileNotFoundError(f"No hay estado en {DIR_ESTADO}; ejecute primero con --reconstruir.")
+    acumulador, marca, _ = cargar_estado()
+    if marca is not None:
+        nuevas = nuevas[nuevas['fecha'] > marca]
+    nuevas = nuevas.dropna(subset=['promedio'])
+    if nuevas.empty:
+        return {'filas': 0, 'meses': 0, 'particiones': 0, 'marca': marca}
+
+    acumulador.agregar(nuevas[CLAVES + ['promedio']])
+    precios = acumulador.precios_mensuales()
+    precios.to_csv(ruta_salida, index=False)
+
+    tocados = nuevas[CLAVES].drop_duplicates()
+    afectados = sorted(tocados.loc[tocados['año'] == AÑO_INDICE_REAL, 'producto_estandar'].unique())
+    if afectados:
+        escribir_particiones(precios, afectados)
+
+    marca = max(m for m in (nuevas['fecha'].max(), marca, marca_leida) if m is not None)
+    guardar_estado(acumulador, marca, firma)
+    return {'filas': len(nuevas), 'meses': len(tocados), 'particiones': len(afectados), 'marca': marca}
+
+def filas_validas(df, ruta_historial=RUTA_HISTORIAL):
+    """
+    Filas de `df` que pasan la regla de calidad del historial evaluada sobre
+    el historial más esas filas, como si se hubieran agregado al archivo.
+    Si cambian la validez de filas del historial, el estado incremental ya
+    no equivaldría a reconstruir: ValueError.
+    """
+    previo = leer_csv(ruta_historial)
+    previo = previo.astype({c: object for c in previo.columns if isinstance(previo[c].dtype, pd.CategoricalDtype)})
+    todo = marcar(pd.concat([previo.drop(columns=COLUMNA_BANDERA), df], ignore_index=True), 'historial')
+    if not (todo[COLUMNA_BANDERA].iloc[:len(previo)].to_numpy() == previo[COLUMNA_BANDERA].to_numpy()).all():
+        raise ValueError("Las filas nuevas cambian la validación de filas del historial; "
+                         "agréguelas al historial y ejecute con --reconstruir.")
+    return validos(todo.iloc[len(previo):].reset_index(drop=True))
+
+def actualizar_desde_historial(ruta_historial=RUTA_HISTORIAL, ruta_salida=RUTA_PRECIOS_MENSUALES):
+    """
+    Busca en el historial las filas posteriores a la marca y las incorpora.
+    Si cambiaron las filas ya incorporadas o su validez, reconstruye.
+    """
+    if not os.path.exists(RUTA_ACUMULADORES):
+        precios = reconstruir(ruta_historial, ruta_salida)
+        return {'filas': None, 'meses': len(precios), 'particiones': None, 'marca': cargar_estado()[1]}
+    _, marca, firma = cargar_estado()
+    nuevas, previa, total, maximo = _recorrer(ruta_historial, marca)
+    if firma is not None and previa != firma:
+        precios = reconstruir(ruta_historial, ruta_salida)
+        return {'filas': None, 'meses': len(precios), 'particiones': None, 'marca': cargar_estado()[1],
+                'reconstruido': True}
+    if nuevas.empty:
+        return {'filas': 0, 'meses': 0, 'particiones': 0, 'marca': marca}
+    return actualizar_con_filas(nuevas, ruta_salida, maximo, total)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Actualiza precios mensuales e índices solo con los boletines nuevos.")
+    parser.add_argument('--historial', default=RUTA_HISTORIAL)
+    parser.add_argument('--nuevos', help="CSV solo con las filas nuevas (mismo formato que el historial)")
+    parser.add_argument('--reconstruir', action='store_true', help="Recalcular todo desde cero")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.reconstruir:
+        precios = reconstruir(args.historial)
+        print(f"Estado reconstruido: {len(precios)} meses-producto.")
+    else:
+        if args.nuevos:
+            try:
+                nuevas = filas_validas(pd.read_csv(args.nuevos), args.historial)
+            except ValueError as e:
+                print(e)
+                return
+            resumen = actualizar_con_filas(nuevas)  # Sin firma: el historial no incluye estas filas
+        else:
+            resumen = actualizar_desde_historial(args.historial)
+        if resumen.get('reconstruido'):
+            print("Cambiaron filas ya incorporadas o su validación: se reconstruyó el estado.")
+        print(f"Filas nuevas: {resumen['filas']} | meses actualizados: {resumen['meses']} | "
+              f"particiones reescritas: {resumen['particiones']} | marca: {resumen['marca']}")
+    print(f"Tiempo: {time.perf_counter() - inicio:.2f} s")
+
+if __name__ == "__main__":
+    main()
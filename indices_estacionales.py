@@ -0,0 +1,157 @@
+import os
+import numpy as np
+import pandas as pd
+
+from cache_datos import leer_csv
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+RUTA_FRUTAS = 'frutas_estacionales.csv'
+RUTA_HORTALIZAS = 'hortalizas_estacionales.csv'
+RUTA_COMPILADO = 'indices_estacionales.npz'  # Archivo binario generado
+
+MESES_ABREV = ['Ene','Feb','Mar','Abr','May','Jun','Jul','Ago','Set','Oct','Nov','Dic']
+
+# ============================================
+# 1. ÍNDICE COMPILADO
+# ============================================
+class IndiceEstacional:
+    """
+    Índices estacionales de todos los cultivos en una matriz float32
+    productos x 12 (NaN = mes sin dato) y un diccionario producto -> fila.
+    """
+
+    def __init__(self, productos, tipos, matriz):
+        self.productos = list(productos)
+        self.tipos = list(tipos)
+        self.matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+        self.filas = {p: i for i, p in enumerate(self.productos)}
+
+    def __len__(self):
+        return len(self.productos)
+
+    def __contains__(self, producto):
+        return producto in self.filas
+
+    def fila(self, producto):
+        """Retorna los 12 índices del producto (vista de la matriz) o None."""
+        i = self.filas.get(producto)
+        if i is None:
+            return None
+        return self.matriz[i]
+
+    def indice(self, producto, mes):
+        """Índice de un producto en un mes (1-12); None si no hay dato."""
+        fila = self.fila(producto)
+        if fila is None or np.isnan(fila[mes - 1]):
+            return None
+        return float(fila[mes - 1])
+
+    def a_largo(self):
+        """Formato largo (producto, mes, indice, tipo) sin meses vacíos."""
+        if not self.productos:
+            return pd.DataFrame(columns=['producto', 'mes', 'indice', 'tipo'])
+        n = len(self.productos)
+        df = pd.DataFrame({
+            'producto': np.repeat(np.array(self.productos, dtype=object), 12),
+            'mes': np.tile(np.arange(1, 13), n),
+            # float32 -> float64 conserva el ruido binario (1.2187 -> 1.21870005...);
+            # redondear a 6 decimales recupera el valor del CSV
+            'indice': self.matriz.astype(float).round(6).ravel(),
+            'tipo': np.repeat(np.array(self.tipos, dtype=object), 12),
+        })
+        return df.dropna().reset_index(drop=True)
+
+    def guardar(self, ruta, firma):
+        """Serializa el índice a un .npz (sin pickle) junto con la firma de las fuentes."""
+        tmp = f"{ruta}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f,
+                     productos=np.array(self.productos, dtype=str),
+                     tipos=np.array(self.tipos, dtype=str),
+                     matriz=self.matriz,
+                     firma=np.array(firma, dtype=str))
+        os.replace(tmp, ruta)  # Reemplazo atómico para otros procesos
+
+    @classmethod
+    def abrir(cls, ruta):
+        """Carga un índice compilado; retorna (indice, firma)."""
+        with np.load(ruta, allow_pickle=False) as npz:
+            indice = cls(npz['productos'].tolist(), npz['tipos'].tolist(), npz['matriz'])
+            firma = npz['firma'].tolist()
+        return indice, firma
+
+# ============================================
+# 2. COMPILACIÓN DESDE LOS CSV
+# ============================================
+def compilar_indices(fuentes):
+    """
+    Lee los CSV de índices (lista de (ruta, tipo)) y arma el IndiceEstacional.
+    Si un cultivo aparece en varios archivos se conserva el primero.
+    """
+    productos, tipos, filas = [], [], []
+    vistos = set()
+    for ruta, tipo in fuentes:
+        if not os.path.exists(ruta):
+            continue
+        df = leer_csv(ruta)
+        if 'Cultivo' not in df.columns:
+            print(f"El archivo '{ruta}' no tiene la columna 'Cultivo'.")
+            continue
+        valores = (df.reindex(columns=MESES_ABREV)
+                     .apply(pd.to_numeric, errors='coerce')
+                     .to_numpy(dtype=np.float32))
+        for cultivo, fila in zip(df['Cultivo'], valores):
+            if pd.isna(cultivo) or cultivo in vistos:
+                continue
+            vistos.add(cultivo)
+            productos.append(cultivo)
+            tipos.append(tipo)
+            filas.append(fila)
+    matriz = np.vstack(filas) if filas else np.empty((0, 12), dtype=np.float32)
+    return IndiceEstacional(productos, tipos, matriz)
+
+def _firma(fuentes):
+    """Identifica el estado de las fuentes (ruta, mtime y tamaño)."""
+    firma = []
+    for ruta, tipo in fuentes:
+        if os.path.exists(ruta):
+            st = os.stat(ruta)
+            firma.append(f"{ruta}|{tipo}|{st.st_mtime_ns}|{st.st_size}")
+    return firma
+
+_memoria = {}
+
+def cargar_indice_estacional(ruta_frutas=RUTA_FRUTAS, ruta_hortalizas=RUTA_HORTALIZAS,
+                             ruta_compilado=RUTA_COMPILADO):
+    """
+    Retorna el IndiceEstacional compartido por app.py y recomendador.py.
+    Usa el archivo compilado si las fuentes no cambiaron; si no, recompila
+    y lo vuelve a escribir. Dentro del proceso queda en memoria.
+    """
+    fuentes = [(ruta_frutas, 'fruta'), (ruta_hortalizas, 'hortaliza')]
+    firma = _firma(fuentes)
+    clave = (ruta_compilado, tuple(firma))
+    if clave in _memoria:
+        return _memoria[clave]
+
+    indice = None
+    if os.path.exists(ruta_compilado):
+        try:
+            guardado, firma_guardada = IndiceEstacional.abrir(ruta_compilado)
+            if firma_guardada == firma:
+                indice = guardado
+        except (OSError, ValueError, KeyError):
+            indice = None
+
+    if indice is None:
+        indice = compilar_indices(fuentes)
+        try:
+            indice.guardar(ruta_compilado, firma)
+        except OSError as e:
+            print(f"No se pudo guardar {ruta_compilado}: {e}")
+
+    _memoria.clear()
+    _memoria[clave] = indice
+    return indice
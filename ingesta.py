@@ -0,0 +1,379 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+import calidad
+from buscador import normalizar
+from cache_datos import leer_csv
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+DIR_HECHOS = 'hechos'  # Una partición Parquet por fuente: hechos/fuente=<nombre>/datos.parquet
+RUTA_MANIFIESTO = os.path.join(DIR_HECHOS, 'manifiesto.json')
+RUTA_ALIAS = 'alias_productos.csv'  # Opcional: alias,producto[,familia] para ampliar ALIAS sin tocar código
+
+# Nombre de cada fuente -> producto del catálogo (comparación sin tildes ni mayúsculas)
+ALIAS = {
+    'Sweet potatoes': 'Camote',
+    'Bananas': 'Plátano',
+    'Plantains': 'Plátano',
+    'Plantains and cooking bananas': 'Plátano',
+    'Cassava, fresh': 'Yuca',
+    'Maize (corn)': 'Maíz',
+}
+
+# Familia que agrupa variedades y calidades entre mercados: la primera
+# palabra del producto ('Plátano Primera' -> 'Plátano'), salvo las
+# excepciones de FAMILIAS (o la columna familia de RUTA_ALIAS)
+FAMILIAS = {
+    'Elote': 'Maíz',
+}
+
+# Unidad de una fuente -> (unidad base, cantidad de la unidad base)
+UNIDADES = {
+    'kilo': ('kg', 1.0), 'kg': ('kg', 1.0), 'g': ('kg', 0.001),
+    'tonne': ('kg', 1000.0), 'tonelada': ('kg', 1000.0),
+    'unidad': ('unidad', 1.0), 'und': ('unidad', 1.0),
+    'plástica': ('caja plástica', 1.0),
+}
+
+# Tamaño del empaque al final del nombre, p. ej. 'Malla (45 kg)', 'Caja (80-100 und)'
+EMPAQUE = re.compile(r'\((\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?))?[\s,]*(kg|g|und)\)\W*$', re.IGNORECASE)
+EMPAQUE_ROLLOS = re.compile(r'de (\d+)\W+rollitos$', re.IGNORECASE)  # 'Rollo de 10 rollitos'
+
+MESES = {normalizar(m): i + 1 for i, m in enumerate(
+    ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+     'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'])}
+MESES['setiembre'] = 9
+
+# Columnas que entrega cada adaptador y columnas de la tabla de hechos
+COLUMNAS_ADAPTADOR = ['producto_fuente', 'fecha', 'unidad', 'cantidad', 'moneda', 'precio',
+                      'precio_min', 'precio_max', 'desv_estandar', 'num_registros']
+COLUMNAS_HECHOS = ['producto_id', 'producto', 'familia', 'mercado', 'fuente', 'frecuencia'] + COLUMNAS_ADAPTADOR
+
+# ============================================
+# 1. ADAPTADORES
+# ============================================
+# Cada adaptador lee su archivo (con la validación de calidad.py ya
+# aplicada) y devuelve COLUMNAS_ADAPTADOR. El precio es el de `cantidad`
+# unidades base (kg, unidad, mata...): precio / cantidad da ₡/kg en las
+# filas con unidad 'kg'. Para sumar un mercado basta registrar una función
+# con @adaptador; el resto del sistema consulta la tabla de hechos y no
+# cambia. Una fuente calculada a partir de otra se registra con
+# `deriva_de`: su partición se rehace cuando cambia la original y
+# TablaHechos.consultar no la mezcla con ella salvo que se pida.
+ADAPTADORES = {}
+
+def adaptador(nombre, ruta, mercado, frecuencia, deriva_de=None):
+    """Registra una función df -> DataFrame con COLUMNAS_ADAPTADOR."""
+    def registrar(funcion):
+        ADAPTADORES[nombre] = {'ruta': ruta, 'mercado': mercado, 'frecuencia': frecuencia,
+                               'deriva_de': deriva_de, 'funcion': funcion}
+        return funcion
+    return registrar
+
+def _empaque(texto):
+    """'Papa blanca primera Malla (45 kg)' -> ('kg', 45.0); 'Kilo' -> ('kg', 1.0)."""
+    texto = str(texto).strip()
+    m = EMPAQUE.search(texto)
+    if m:
+        desde = float(m.group(1))
+        cantidad = (desde + float(m.group(2))) / 2 if m.group(2) else desde  # Rango: valor medio
+        base, factor = UNIDADES[m.group(3).lower()]
+        return base, cantidad * factor
+    m = EMPAQUE_ROLLOS.search(texto)
+    if m:
+        return 'rollito', float(m.group(1))
+    limpio = texto.lower()
+    return UNIDADES.get(limpio, (limpio, 1.0))
+
+def _unidad(nombre, unidad):
+    """
+    Unidad base y cantidad de cada fila. El historial trae el tamaño del
+    empaque partido por la coma entre las columnas producto y unidad
+    ('... Malla (45' y 'kg)'), así que se reconstruye antes de leerlo.
+    """
+    unidad = unidad.astype(str).str.strip()
+    texto = (nombre.astype(str) + ' ' + unidad).where(unidad.str.contains(r'\)|rollitos'), unidad)
+    unicos = pd.unique(texto)
+    mapa = pd.DataFrame([_empaque(t) for t in unicos], columns=['unidad', 'cantidad'], index=unicos)
+    return mapa.reindex(texto).reset_index(drop=True)
+
+def _unidades_cenada():
+    """Unidad base y cantidad más frecuentes de cada producto en el historial diario."""
+    config = ADAPTADORES['cenada_diario']
+    if not os.path.exists(config['ruta']):
+        return pd.DataFrame(columns=['unidad', 'cantidad'])
+    df = calidad.validos(leer_csv(config['ruta']))
+    unidades = _unidad(df['producto'], df['unidad']).assign(producto=df['producto_estandar'].astype(str).to_numpy())
+    conteo = unidades.value_counts(['producto', 'unidad', 'cantidad'], sort=True)  # De mayor a menor
+    return conteo.reset_index().drop_duplicates('producto').set_index('producto')[['unidad', 'cantidad']]
+
+@adaptador('cenada_diario', 'historial_limpiado.csv', 'CENADA', 'diaria')
+def _cenada_diario(df):
+    unidad = _unidad(df['producto'], df['unidad'])
+    return pd.DataFrame({
+        'producto_fuente': df['producto_estandar'].astype(str),
+        'fecha': pd.to_datetime(df['fecha'], errors='coerce'),
+        'unidad': unidad['unidad'].to_numpy(),
+        'cantidad': unidad['cantidad'].to_numpy(),
+        'moneda': 'CRC',
+        'precio': pd.to_numeric(df['promedio'], errors='coerce'),
+        'precio_min': pd.to_numeric(df['minimo'], errors='coerce'),
+        'precio_max': pd.to_numeric(df['maximo'], errors='coerce'),
+        'desv_estandar': np.nan,
+        'num_registros': 1,
+    })
+
+@adaptador('cenada_mensual', 'precios_mensuales_producto.csv', 'CENADA', 'mensual', deriva_de='cenada_diario')
+def _cenada_mensual(df):
+    # Promedios mensuales del historial diario: la unidad es la de sus filas
+    unidad = _unidades_cenada().reindex(df['producto'].astype(str))
+    return pd.DataFrame({
+        'producto_fuente': df['producto'].astype(str),
+        'fecha': pd.to_datetime(pd.DataFrame({'year': df['año'], 'month': df['mes'], 'day': 1})),
+        'unidad': unidad['unidad'].fillna('kg').to_numpy(),
+        'cantidad': unidad['cantidad'].fillna(1.0).to_numpy(dtype=float),
+        'moneda': 'CRC',
+        'precio': df['precio_promedio'],
+        'precio_min': np.nan,
+        'precio_max': np.nan,
+        'desv_estandar': df['desv_estandar'],
+        'num_registros': df['num_registros'],
+    })
+
+@adaptador('camote_pdf', 'camote_precios.csv', 'CENADA', 'mensual')
+def _camote_pdf(df):
+    mes = df['Mes'].map(lambda m: MESES.get(normalizar(m)))
+    df, mes = df[mes.notna()], mes.dropna()
+    return pd.DataFrame({
+        'producto_fuente': 'Camote',
+        'fecha': pd.to_datetime(pd.DataFrame({'year': df['Año'].astype(int), 'month': mes.astype(int), 'day': 1})),
+        'unidad': 'kg',
+        'cantidad': 1.0,
+        'moneda': 'CRC',
+        'precio': pd.to_numeric(df['Precio_ColonesKg'], errors='coerce'),
+        'precio_min': np.nan,
+        'precio_max': np.nan,
+        'desv_estandar': np.nan,
+        'num_registros': 1,
+    })
+
+@adaptador('faostat', 'FAOSTAT_data_en_2-19-2026.csv', 'Productor', 'anual')
+def _faostat(df):
+    df = df[df['Element'].astype(str).str.contains('Producer Price')]
+    # El elemento trae la unidad completa, p. ej. 'Producer Price (USD/tonne)'
+    unidad = df['Element'].astype(str).str.extract(r'\((\w+)/(\w+)\)')
+    base = pd.DataFrame([_empaque(u) for u in unidad[1].fillna('')], columns=['unidad', 'cantidad'])
+    return pd.DataFrame({
+        'producto_fuente': df['Item'].astype(str),
+        'fecha': pd.to_datetime(df['Year'].astype(int).astype(str) + '-01-01'),
+        'unidad': base['unidad'].to_numpy(),
+        'cantidad': base['cantidad'].to_numpy(),
+        'moneda': unidad[0].fillna(df['Unit']),
+        'precio': pd.to_numeric(df['Value'], errors='coerce'),
+        'precio_min': np.nan,
+        'precio_max': np.nan,
+        'desv_estandar': np.nan,
+        'num_registros': 1,
+    })
+
+# ============================================
+# 2. ALIAS DE PRODUCTOS
+# ============================================
+def familia(producto):
+    """Familia de un producto del catálogo: FAMILIAS o su primera palabra."""
+    producto = str(producto)
+    return FAMILIAS.get(producto) or (producto.split() or [producto])[0]
+
+def tabla_alias(ruta=RUTA_ALIAS):
+    """Alias normalizado -> (producto, familia), con ALIAS, FAMILIAS y el CSV opcional."""
+    alias = {normalizar(a): (p, familia(p)) for a, p in ALIAS.items()}
+    if os.path.exists(ruta):
+        extra = leer_csv(ruta)
+        familias = extra['familia'] if 'familia' in extra.columns else extra['producto'].map(familia)
+        for a, p, f in zip(extra['alias'].astype(str), extra['producto'].astype(str), familias.astype(str)):
+            alias[normalizar(a)] = (p, f)
+    return alias
+
+def resolver(nombres, alias):
+    """Nombres de una fuente -> (producto, familia) del catálogo."""
+    unicos = pd.Series(pd.unique(nombres))
+    clave = unicos.map(normalizar)
+    producto = [alias.get(c, (n, None))[0] for c, n in zip(clave, unicos)]
+    familias = [alias.get(c, (None, None))[1] or familia(p) for c, p in zip(clave, producto)]
+    mapa = pd.DataFrame({'producto': producto, 'familia': familias}, index=unicos)
+    return mapa.reindex(nombres).reset_index(drop=True)
+
+# ============================================
+# 3. TABLA DE HECHOS PARTICIONADA
+# ============================================
+def _firma_alias(ruta=RUTA_ALIAS):
+    partes = [json.dumps([ALIAS, FAMILIAS, UNIDADES, COLUMNAS_ADAPTADOR], ensure_ascii=False, sort_keys=True)]
+    if os.path.exists(ruta):
+        st = os.stat(ruta)
+        partes.append(f"{st.st_mtime_ns}|{st.st_size}")
+    return hashlib.md5('\n'.join(partes).encode('utf-8')).hexdigest()[:8]
+
+def _firma(nombre, firma_alias):
+    partes = []
+    while nombre:
+        st = os.stat(ADAPTADORES[nombre]['ruta'])
+        partes.append(f"{st.st_mtime_ns}|{st.st_size}")
+        nombre = ADAPTADORES[nombre]['deriva_de']  # Una derivada cambia si cambia su original
+    return '|'.join(partes + [str(calidad.VERSION_REGLAS), firma_alias])
+
+def _ruta_particion(nombre, dir_hechos):
+    return os.path.join(dir_hechos, f"fuente={nombre}", 'datos.parquet')
+
+def normalizar_fuente(nombre, alias=None):
+    """Lee la fuente con su adaptador y la lleva al formato de la tabla de hechos."""
+    config = ADAPTADORES[nombre]
+    crudo = calidad.validos(leer_csv(config['ruta']))
+    df = config['funcion'](crudo)[COLUMNAS_ADAPTADOR].reset_index(drop=True)
+    df = df[df['fecha'].notna() & (df['precio'] > 0)].reset_index(drop=True)
+    catalogo = resolver(df['producto_fuente'], alias if alias is not None else tabla_alias())
+    df.insert(0, 'producto', catalogo['producto'].to_numpy())
+    df.insert(1, 'familia', catalogo['familia'].to_numpy())
+    df.insert(2, 'mercado', config['mercado'])
+    df.insert(3, 'frecuencia', config['frecuencia'])
+    df['num_registros'] = pd.to_numeric(df['num_registros'], errors='coerce').fillna(1).astype(int)
+    df['cantidad'] = pd.to_numeric(df['cantidad'], errors='coerce').astype(float)
+    return df
+
+def actualizar_hechos(dir_hechos=DIR_HECHOS, forzar=False):
+    """
+    Reescribe solo las particiones cuya fuente (o los alias) cambió.
+    Retorna un dict fuente -> 'actualizada' / 'vigente' / 'sin archivo' / error.
+    """
+    manifiesto_ruta = os.path.join(dir_hechos, 'manifiesto.json')
+    manifiesto = {}
+    if os.path.exists(manifiesto_ruta):
+        with open(manifiesto_ruta, encoding='utf-8') as f:
+            manifiesto = json.load(f)
+
+    firma_alias = _firma_alias()
+    alias = tabla_alias()
+    estado = {}
+    for nombre, config in ADAPTADORES.items():
+        destino = _ruta_particion(nombre, dir_hechos)
+        if not os.path.exists(config['ruta']):
+            estado[nombre] = 'sin archivo'
+            if os.path.exists(destino):
+                shutil.rmtree(os.path.dirname(destino), ignore_errors=True)
+            manifiesto.pop(nombre, None)
+            continue
+        firma = _firma(nombre, firma_alias)
+        if not forzar and manifiesto.get(nombre) == firma and os.path.exists(destino):
+            estado[nombre] = 'vigente'
+            continue
+        try:
+            df = normalizar_fuente(nombre, alias)
+        except (KeyError, ValueError) as e:
+            print(f"No se pudo normalizar {config['ruta']}: {e}")
+            estado[nombre] = f"error: {e}"
+            continue
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        tmp = f"{destino}.{os.getpid()}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, destino)
+        manifiesto[nombre] = firma
+        estado[nombre] = 'actualizada'
+
+    os.makedirs(dir_hechos, exist_ok=True)
+    tmp = f"{manifiesto_ruta}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=1)
+    os.replace(tmp, manifiesto_ruta)
+    return estado
+
+# ============================================
+# 4. CONSULTAS
+# ============================================
+class TablaHechos:
+    """
+    Todas las fuentes en una tabla, ordenada por familia, producto y fecha,
+    con las posiciones de cada producto y familia precalculadas: una
+    consulta toma sus filas directamente en vez de filtrar texto.
+    """
+
+    def __init__(self, hechos):
+        hechos = hechos.sort_values(['familia', 'producto', 'fuente', 'fecha'], ignore_index=True)
+        for col in ('producto', 'familia', 'mercado', 'fuente', 'frecuencia', 'unidad', 'moneda'):
+            hechos[col] = hechos[col].astype('category')
+        hechos.insert(0, 'producto_id', hechos['producto'].cat.codes.astype(np.int32))
+        self.hechos = hechos[COLUMNAS_HECHOS]
+        self._por_producto = self.hechos.groupby('producto', observed=True).indices
+        self._por_familia = self.hechos.groupby('familia', observed=True).indices
+
+    def __len__(self):
+        return len(self.hechos)
+
+    @property
+    def productos(self):
+        return list(self.hechos['producto'].cat.categories)
+
+    def consultar(self, producto=None, familia=None, derivadas=False, **filtros):
+        """
+        Filas de un producto o familia (nombres del catálogo o alias de una
+        fuente), opcionalmente filtradas por columna: fuente='faostat', mercado=...
+        Las fuentes derivadas de otra (cenada_mensual resume cenada_diario)
+        solo se incluyen con derivadas=True o pidiéndolas con fuente=.
+        """
+        filas = None
+        if producto is not None or familia is not None:
+            alias = tabla_alias()
+            if producto is not None:
+                nombre = alias.get(normalizar(producto), (producto,))[0]
+                filas = self._por_producto.get(nombre, np.array([], dtype=np.int64))
+            if familia is not None:
+                nombre = alias.get(normalizar(familia), (None, familia))[1]
+                de_familia = self._por_familia.get(nombre, np.array([], dtype=np.int64))
+                filas = de_familia if filas is None else np.intersect1d(filas, de_familia)
+        resultado = self.hechos if filas is None else self.hechos.iloc[filas]
+        if not derivadas and 'fuente' not in filtros:
+            excluidas = [n for n, c in ADAPTADORES.items() if c['deriva_de']]
+            resultado = resultado[~resultado['fuente'].isin(excluidas)]
+        for col, valor in filtros.items():
+            resultado = resultado[resultado[col] == valor]
+        return resultado
+
+def cargar_hechos(dir_hechos=DIR_HECHOS):
+    """Actualiza las particiones que cambiaron y carga la tabla de hechos completa."""
+    actualizar_hechos(dir_hechos)
+    partes = []
+    for nombre in ADAPTADORES:
+        ruta = _ruta_particion(nombre, dir_hechos)
+        if os.path.exists(ruta):
+            partes.append(pd.read_parquet(ruta).assign(fuente=nombre))
+    if not partes:
+        return TablaHechos(pd.DataFrame(columns=[c for c in COLUMNAS_HECHOS if c != 'producto_id']))
+    return TablaHechos(pd.concat(partes, ignore_index=True))
+
+def main():
+    parser = argparse.ArgumentParser(description="Normaliza todas las fuentes de precios en la tabla de hechos.")
+    parser.add_argument('--forzar', action='store_true', help="Reescribir todas las particiones")
+    parser.add_argument('--producto', help="Mostrar las filas de un producto o alias")
+    parser.add_argument('--familia', help="Mostrar las filas de una familia")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    for fuente, resultado in actualizar_hechos(forzar=args.forzar).items():
+        print(f"{fuente}: {resultado}")
+    tabla = cargar_hechos()
+    print(f"{len(tabla)} filas, {len(tabla.productos)} productos | {time.perf_counter() - inicio:.2f} s")
+    print(tabla.hechos.groupby(['fuente', 'mercado', 'frecuencia', 'moneda'], observed=True)
+                      .size().rename('filas').reset_index().to_string(index=False))
+    if args.producto or args.familia:
+        filas = tabla.consultar(producto=args.producto, familia=args.familia)
+        print(filas.drop(columns=['producto_id']).to_string(index=False, max_rows=40))
+
+if __name__ == "__main__":
+    main()
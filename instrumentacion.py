@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+MAX_EVENTOS = 10_000  # Eventos recientes guardados en memoria por proceso
+
+# ============================================
+# 1. REGISTRO DE MÉTRICAS (POR PROCESO)
+# ============================================
+_lock = threading.Lock()
+_eventos = deque(maxlen=MAX_EVENTOS)
+_agregados = {}   # nombre -> {'llamadas', 'total_s', 'max_s', 'ultimo_s', 'aciertos', 'fallos', 'filas'}
+_local = threading.local()  # Fallos de caché marcados durante la llamada en curso
+
+def _filas(resultado):
+    """Número de filas de un DataFrame, de los DataFrames de un dict o del primero de una tupla."""
+    if resultado is None:
+        return None
+    if hasattr(resultado, 'shape') and hasattr(resultado, 'columns'):
+        return int(resultado.shape[0])
+    if isinstance(resultado, dict):
+        filas = [_filas(v) for v in resultado.values()]
+        filas = [f for f in filas if f is not None]
+        return sum(filas) if filas else None
+    if isinstance(resultado, tuple) and resultado:
+        return _filas(resultado[0])
+    return None
+
+def registrar(nombre, segundos, filas=None, cache=None):
+    """Guarda un evento; `cache` es True (acierto), False (fallo) o None (sin caché)."""
+    evento = {'ts': time.time(), 'nombre': nombre, 'segundos': segundos}
+    if filas is not None:
+        evento['filas'] = filas
+    if cache is not None:
+        evento['cache'] = 'acierto' if cache else 'fallo'
+    with _lock:
+        _eventos.append(evento)
+        a = _agregados.setdefault(nombre, {'llamadas': 0, 'total_s': 0.0, 'max_s': 0.0, 'ultimo_s': 0.0,
+                                           'aciertos': 0, 'fallos': 0, 'filas': None})
+        a['llamadas'] += 1
+        a['total_s'] += segundos
+        a['max_s'] = max(a['max_s'], segundos)
+        a['ultimo_s'] = segundos
+        if cache is True:
+            a['aciertos'] += 1
+        elif cache is False:
+            a['fallos'] += 1
+        if filas is not None:
+            a['filas'] = filas
+
+def fallo_cache(nombre):
+    """
+    Llamar dentro del cuerpo de una función cacheada: solo corre cuando la
+    caché falla, y marca como fallo la sección que la envuelve.
+    """
+    fallos = getattr(_local, 'fallos', None)
+    if fallos is not None:
+        fallos.add(nombre)
+
+@contextmanager
+def seccion(nombre, cache=False):
+    """
+    Mide un bloque. Con cache=True se registra un fallo de caché si dentro
+    del bloque se llamó fallo_cache(...) y un acierto si no.
+    """
+    anteriores = getattr(_local, 'fallos', None)
+    _local.fallos = set()
+    inicio = time.perf_counter()
+    info = {}
+    try:
+        yield info
+    finally:
+        segundos = time.perf_counter() - inicio
+        estado = (not _local.fallos) if cache else None
+        if anteriores is not None:
+            anteriores |= _local.fallos
+        _local.fallos = anteriores
+        registrar(nombre, segundos, info.get('filas'), estado)
+
+def medir(nombre=None, cache=False):
+    """Decorador: mide cada llamada y registra las filas del resultado."""
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with seccion(etiqueta, cache=cache) as info:
+                resultado = funcion(*args, **kwargs)
+                info['filas'] = _filas(resultado)
+            return resultado
+        return envoltura
+    return decorador
+
+# ============================================
+# 2. CONSULTA Y EXPORTACIÓN
+# ============================================
+def resumen():
+    """Lista de agregados por nombre (copia), ordenada por tiempo total."""
+    with _lock:
+        filas = [dict(nombre=n, **a) for n, a in _agregados.items()]
+    for f in filas:
+        f['promedio_s'] = f['total_s'] / f['llamadas'] if f['llamadas'] else 0.0
+    return sorted(filas, key=lambda f: f['total_s'], reverse=True)
+
+def eventos():
+    with _lock:
+        return list(_eventos)
+
+def exportar_jsonl(ruta=None):
+    """Eventos recientes como JSONL; si se da `ruta`, se agregan al archivo."""
+    texto = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in eventos())
+    if ruta:
+        with open(ruta, 'a', encoding='utf-8') as f:
+            f.write(texto)
+    return texto
+
+def _etiqueta(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"')
+
+# (métrica, tipo, campo del agregado, formato); cada familia se escribe
+# completa tras su línea TYPE, como exige el formato de texto
+_FAMILIAS_PROMETHEUS = [
+    ('seccion_segundos_total', 'counter', 'total_s', '{:.6f}'),
+    ('seccion_llamadas_total', 'counter', 'llamadas', '{}'),
+    ('seccion_segundos_max', 'gauge', 'max_s', '{:.6f}'),
+    ('cache_aciertos_total', 'counter', 'aciertos', '{}'),
+    ('cache_fallos_total', 'counter', 'fallos', '{}'),
+    ('seccion_filas', 'gauge', 'filas', '{}'),
+]
+
+def exportar_prometheus(prefijo='app'):
+    """Agregados en formato de texto de Prometheus."""
+    filas = resumen()
+    lineas = []
+    for metrica, tipo, campo, formato in _FAMILIAS_PROMETHEUS:
+        lineas.append(f"# TYPE {prefijo}_{metrica} {tipo}")
+        for f in filas:
+            if campo in ('aciertos', 'fallos') and not (f['aciertos'] or f['fallos']):
+                continue  # Sección sin caché
+            if f[campo] is None:
+                continue
+            e = f'{{seccion="{_etiqueta(f["nombre"])}"}}'
+            lineas.append(f"{prefijo}_{metrica}{e} {formato.format(f[campo])}")
+    return '\n'.join(lineas) + '\n'
+
+def reiniciar():
+    with _lock:
+        _eventos.clear()
+        _agregados.clear()
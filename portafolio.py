@@ -0,0 +1,317 @@
+import argparse
+import heapq
+import math
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+import simulacion
+from cache_datos import leer_csv
+from recomendador import FORMATOS_SALIDA, cargar_ciclos, escribir_resultados
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+PARCELAS = 10               # Unidades de tierra a sembrar
+HORIZONTE = 12              # Meses del plan
+MES_INICIO = 1              # Mes calendario del primer mes del plan
+MAX_POR_MES = 3             # Parcelas que pueden cosecharse el mismo mes
+MAX_POR_CULTIVO_MES = 1     # Parcelas de un mismo cultivo que se cosechan el mismo mes
+MIN_MESES_COSECHA = 0       # Meses distintos con cosecha exigidos
+BUSQUEDA_BONO = 12          # Pasos de la búsqueda binaria del bono por mes con cosecha
+
+COLUMNAS_CALENDARIO = ['parcela', 'producto', 'ciclo_meses', 'periodo_siembra', 'mes_siembra',
+                       'mes_cosecha', 'cosecha_en_horizonte', 'valor']
+
+# Cada parcela se usa mes a mes durante HORIZONTE meses: una siembra la
+# ocupa desde el mes de siembra hasta el de cosecha (convención del
+# recomendador: cosecha = siembra + ciclo - 1) y al mes siguiente puede
+# sembrarse otra vez. Así una parcela puede llevar varios cultivos cortos
+# seguidos y un cultivo largo la ocupa todo su ciclo.
+#
+# Valor de una siembra: precio esperado del mes de cosecha (simulacion.
+# distribuciones) por el rendimiento del cultivo. Sin rendimientos los
+# cultivos no son comparables en colones y el valor es relativo: precio
+# esperado / precio promedio del cultivo (1.0 = cosechar en un mes promedio),
+# así que sin rendimientos los ciclos cortos ganan por número de cosechas. Con `aversion` > 0 se resta esa fracción de la desviación estándar. Si la
+# cosecha cae después del horizonte se cuenta la fracción del ciclo que está
+# dentro (valor por mes-parcela), así un cultivo de 36 meses y uno de 2
+# se comparan por la tierra que ocupan.
+#
+# El plan es un flujo de costo mínimo sobre los meses: cada parcela es una
+# unidad de flujo que va del mes 0 al HORIZONTE, esperando (arco de un mes)
+# o sembrando (arco de la siembra a la cosecha). Las cosechas de cada mes
+# pasan por un nodo con capacidad MAX_POR_MES y cada siembra (cultivo, mes)
+# admite MAX_POR_CULTIVO_MES parcelas. El flujo entero óptimo se descompone
+# en el calendario de cada parcela. Los meses distintos con cosecha no son
+# una restricción de flujo: se agrega un bono a la primera cosecha de cada
+# mes y se busca el menor bono que cumple MIN_MESES_COSECHA (puede no ser
+# el óptimo exacto con esa restricción).
+
+# ============================================
+# 1. MATRIZ DE VALORES
+# ============================================
+def matriz_valores(dist, ciclos, rendimientos=None, aversion=0.0):
+    """
+    Valor por parcela de cada cultivo según su mes de cosecha.
+    `ciclos`: dict producto -> meses; `rendimientos`: dict producto -> kg por parcela.
+    Solo entran los cultivos con ciclo (y con precio si hay rendimientos).
+    Retorna (productos, ciclos, valor cultivos x 12).
+    """
+    productos = dist['productos']
+    ciclo = np.array([ciclos.get(p, np.nan) for p in productos], dtype=float)
+    usar = ~np.isnan(ciclo) & (ciclo >= 1)
+    if rendimientos is not None:
+        rend = np.array([rendimientos.get(p, np.nan) for p in productos], dtype=float)
+        usar &= dist['con_precio'] & ~np.isnan(rend)
+        escala = rend[:, None]
+    else:
+        escala = 1.0 / dist['nivel'][:, None]
+
+    media = dist['media'] * escala
+    desv = media * np.sqrt(np.expm1(dist['sigma'] ** 2))  # Desviación de la lognormal
+    valor = media - aversion * desv
+    return productos[usar], ciclo[usar].astype(np.int64), valor[usar]
+
+# ============================================
+# 2. FLUJO DE COSTO MÍNIMO
+# ============================================
+class _Red:
+    """
+    Red de flujo con listas de adyacencia. Arco: [destino, capacidad
+    residual, costo, índice del inverso, dato, es_original].
+    """
+
+    def __init__(self, nodos):
+        self.arcos = [[] for _ in range(nodos)]
+
+    def agregar(self, origen, destino, capacidad, costo, dato=None):
+        self.arcos[origen].append([destino, capacidad, costo, len(self.arcos[destino]), dato, True])
+        self.arcos[destino].append([origen, 0, -costo, len(self.arcos[origen]) - 1, None, False])
+
+    def flujo(self, u, k):
+        """Flujo de un arco original: capacidad residual de su inverso."""
+        arco = self.arcos[u][k]
+        return self.arcos[arco[0]][arco[3]][1]
+
+    def flujo_costo_minimo(self, origen, destino, unidades, orden):
+        """
+        Envía `unidades` de `origen` a `destino` por caminos más cortos
+        sucesivos (Dijkstra con potenciales). `orden` es un orden topológico
+        de la red inicial, para los potenciales con costos negativos.
+        Retorna el costo total.
+        """
+        n = len(self.arcos)
+        potencial = [math.inf] * n
+        potencial[origen] = 0.0
+        for u in orden:
+            if potencial[u] < math.inf:
+                for v, cap, costo, *_ in self.arcos[u]:
+                    if cap > 0 and potencial[u] + costo < potencial[v]:
+                        potencial[v] = potencial[u] + costo
+        potencial = [p if p < math.inf else 0.0 for p in potencial]
+
+        total = 0.0
+        while unidades > 0:
+            distancia = [math.inf] * n
+            previo = [None] * n
+            distancia[origen] = 0.0
+            cola = [(0.0, origen)]
+            while cola:
+                d, u = heapq.heappop(cola)
+                if d > distancia[u]:
+                    continue
+                for k, (v, cap, costo, *_) in enumerate(self.arcos[u]):
+                    nd = d + costo + potencial[u] - potencial[v]
+                    if cap > 0 and nd < distancia[v] - 1e-12:
+                        distancia[v] = nd
+                        previo[v] = (u, k)
+                        heapq.heappush(cola, (nd, v))
+            if distancia[destino] == math.inf:
+                break
+            for u in range(n):
+                if distancia[u] < math.inf:
+                    potencial[u] += distancia[u]
+
+            # Capacidad del camino y actualización de la red residual
+            envio, v = unidades, destino
+            while v != origen:
+                u, k = previo[v]
+                envio = min(envio, self.arcos[u][k][1])
+                v = u
+            v = destino
+            while v != origen:
+                u, k = previo[v]
+                arco = self.arcos[u][k]
+                arco[1] -= envio
+                self.arcos[v][arco[3]][1] += envio
+                total += envio * arco[2]
+                v = u
+            unidades -= envio
+        return total
+
+def _siembras(ciclos, horizonte):
+    """(cultivo, periodo de siembra, periodo de cosecha) de todas las siembras posibles."""
+    return [(c, s, s + int(ciclo) - 1) for c, ciclo in enumerate(ciclos) for s in range(horizonte)]
+
+def _valor_siembra(valor, ciclos, c, s, h, horizonte, inicio):
+    """Valor de una siembra; si cosecha después del horizonte, la fracción del ciclo dentro de él."""
+    v = float(valor[c, (inicio - 1 + h) % 12])
+    return v if h < horizonte else v * (horizonte - s) / int(ciclos[c])
+
+def _resolver(valor, ciclos, parcelas, max_por_mes, max_por_cultivo_mes, horizonte, inicio, bono):
+    """Un flujo de costo mínimo con `bono` para la primera cosecha de cada mes. Retorna la red."""
+    # Nodos: mes t = t (0..horizonte) y cosechas del mes t = horizonte + 1 + t
+    cosecha = lambda t: horizonte + 1 + t
+    red = _Red(2 * horizonte + 1)
+    for t in range(horizonte):
+        red.agregar(t, t + 1, parcelas, 0.0)                         # Parcela en espera
+        if bono > 0 and max_por_mes > 0:
+            red.agregar(cosecha(t), t + 1, 1, -bono)
+            red.agregar(cosecha(t), t + 1, max_por_mes - 1, 0.0)
+        else:
+            red.agregar(cosecha(t), t + 1, max_por_mes, 0.0)
+    for c, s, h in _siembras(ciclos, horizonte):
+        v = _valor_siembra(valor, ciclos, c, s, h, horizonte, inicio)
+        destino = cosecha(h) if h < horizonte else horizonte
+        red.agregar(s, destino, max_por_cultivo_mes, -v, dato=(c, s, h))
+    orden = [n for t in range(horizonte) for n in (t, cosecha(t))] + [horizonte]
+    red.flujo_costo_minimo(0, horizonte, parcelas, orden)
+    return red
+
+def _descomponer(red, horizonte):
+    """Calendario de cada parcela: lista de siembras (cultivo, siembra, cosecha) por unidad de flujo."""
+    flujo = {(u, k): red.flujo(u, k) for u, arcos in enumerate(red.arcos)
+             for k, arco in enumerate(arcos) if arco[5]}
+    calendarios = []
+    for _ in range(sum(f for (u, _), f in flujo.items() if u == 0)):
+        u, siembras = 0, []
+        while u != horizonte:
+            salidas = [k for k, arco in enumerate(red.arcos[u]) if arco[5] and flujo[(u, k)] > 0]
+            k = min(salidas, key=lambda k: red.arcos[u][k][4] is None)  # Siembras antes que la espera
+            flujo[(u, k)] -= 1
+            arco = red.arcos[u][k]
+            if arco[4] is not None:
+                siembras.append(arco[4])
+            u = arco[0]
+        calendarios.append(siembras)
+    return calendarios
+
+def optimizar(valor, ciclos, parcelas=PARCELAS, max_por_mes=MAX_POR_MES,
+              max_por_cultivo_mes=MAX_POR_CULTIVO_MES, min_meses=MIN_MESES_COSECHA,
+              horizonte=HORIZONTE, inicio=MES_INICIO):
+    """
+    Elige las siembras de cada parcela durante `horizonte` meses (el primero
+    es el mes calendario `inicio`) para maximizar el valor total.
+    Retorna (calendarios, valor total): una lista de siembras (cultivo,
+    periodo de siembra, periodo de cosecha) por parcela con alguna siembra;
+    valor total = -inf si no se pueden cumplir los meses con cosecha exigidos.
+    """
+    resolver = lambda bono: _descomponer(
+        _resolver(valor, ciclos, parcelas, max_por_mes, max_por_cultivo_mes, horizonte, inicio, bono), horizonte)
+    meses = lambda calendarios: len({h for cal in calendarios for _, _, h in cal if h < horizonte})
+    total = lambda calendarios: sum(_valor_siembra(valor, ciclos, c, s, h, horizonte, inicio)
+                                    for cal in calendarios for c, s, h in cal)
+
+    calendarios = resolver(0.0)
+    min_meses = min(min_meses, horizonte)
+    if meses(calendarios) < min_meses:
+        # Bono suficiente para que un mes con cosecha valga más que cualquier siembra
+        alto = 1.0 + 2 * horizonte * parcelas * max(float(np.abs(valor).max()) if valor.size else 0.0, 1.0)
+        mejor = resolver(alto)
+        if meses(mejor) < min_meses:
+            return [], -np.inf
+        bajo = 0.0
+        for _ in range(BUSQUEDA_BONO):
+            medio = (bajo + alto) / 2
+            candidato = resolver(medio)
+            if meses(candidato) >= min_meses:
+                alto, mejor = medio, candidato
+            else:
+                bajo = medio
+        calendarios = mejor
+    calendarios = [cal for cal in calendarios if cal]
+    return calendarios, float(total(calendarios))
+
+def calendario(productos, ciclos, valor, calendarios, horizonte=HORIZONTE, inicio=MES_INICIO):
+    """Calendarios de optimizar() -> DataFrame con una fila por siembra, ordenado por parcela y periodo."""
+    filas = []
+    for parcela, siembras in enumerate(calendarios, start=1):
+        for c, s, h in sorted(siembras, key=lambda x: x[1]):
+            filas.append({
+                'parcela': parcela,
+                'producto': productos[c],
+                'ciclo_meses': int(ciclos[c]),
+                'periodo_siembra': s + 1,
+                'mes_siembra': (inicio - 1 + s) % 12 + 1,
+                'mes_cosecha': (inicio - 1 + h) % 12 + 1,
+                'cosecha_en_horizonte': h < horizonte,
+                'valor': _valor_siembra(valor, ciclos, c, s, h, horizonte, inicio),
+            })
+    return pd.DataFrame(filas, columns=COLUMNAS_CALENDARIO)
+
+# ============================================
+# 3. USO DESDE LA LÍNEA DE COMANDOS
+# ============================================
+def cargar_rendimientos(ruta):
+    """CSV con columnas producto, rendimiento (kg por parcela)."""
+    df = leer_csv(ruta)
+    return dict(zip(df['producto'].astype(str), pd.to_numeric(df['rendimiento'], errors='coerce')))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calendario de siembras escalonadas en varias parcelas. Cada parcela puede llevar "
+                    "varias siembras seguidas en el horizonte; una siembra la ocupa de la siembra a la cosecha.")
+    parser.add_argument('--parcelas', type=int, default=PARCELAS)
+    parser.add_argument('--horizonte', type=int, default=HORIZONTE, help="Meses del plan")
+    parser.add_argument('--inicio', type=int, default=MES_INICIO, choices=range(1, 13), metavar='MES',
+                        help="Mes calendario (1-12) del primer mes del plan")
+    parser.add_argument('--max-por-mes', type=int, default=MAX_POR_MES,
+                        help="Parcelas que pueden cosecharse el mismo mes")
+    parser.add_argument('--max-por-cultivo-mes', type=int, default=MAX_POR_CULTIVO_MES)
+    parser.add_argument('--min-meses', type=int, default=MIN_MESES_COSECHA,
+                        help="Meses distintos con cosecha dentro del horizonte exigidos")
+    parser.add_argument('--cultivos', default='all',
+                        help="'all' (los de cargar_ciclos) o nombres exactos separados por coma")
+    parser.add_argument('--rendimientos', help="CSV producto,rendimiento (kg por parcela); sin él, valor relativo "
+                             "(cada cosecha vale ~1, así que los ciclos cortos suman más cosechas)")
+    parser.add_argument('--aversion', type=float, default=0.0,
+                        help="Fracción de la desviación estándar que se resta al valor esperado")
+    parser.add_argument('--format', choices=FORMATOS_SALIDA, default='csv')
+    parser.add_argument('--out', help="Archivo de salida (csv/jsonl: stdout si se omite)")
+    args = parser.parse_args(argv)
+
+    if args.format == 'parquet' and not args.out:
+        print("El formato parquet requiere --out.", file=sys.stderr)
+        return 2
+
+    inicio = time.perf_counter()
+    ciclos = cargar_ciclos().drop_duplicates('producto')
+    ciclos = dict(zip(ciclos['producto'].astype(str), ciclos['ciclo_meses']))
+    if args.cultivos != 'all':
+        pedidos = {p.strip() for p in args.cultivos.split(',') if p.strip()}
+        ciclos = {p: c for p, c in ciclos.items() if p in pedidos}
+    rendimientos = cargar_rendimientos(args.rendimientos) if args.rendimientos else None
+    productos, ciclo, valor = matriz_valores(simulacion.distribuciones_catalogo(), ciclos,
+                                             rendimientos, args.aversion)
+    t_datos = time.perf_counter() - inicio
+
+    t0 = time.perf_counter()
+    calendarios, total = optimizar(valor, ciclo, args.parcelas, args.max_por_mes, args.max_por_cultivo_mes,
+                                   args.min_meses, args.horizonte, args.inicio)
+    t_optimizacion = time.perf_counter() - t0
+
+    if not np.isfinite(total):
+        print("No hay calendario que cumpla las restricciones.", file=sys.stderr)
+        return 1
+    resultado = calendario(productos, ciclo, valor, calendarios, args.horizonte, args.inicio)
+    escribir_resultados(resultado, args.format, args.out)
+    unidad = 'colones' if rendimientos is not None else 'relativo'
+    print(f"{len(productos)} cultivos, {len(resultado)} siembras en {len(calendarios)} parcelas | "
+          f"valor total ({unidad}): "
+          f"{total:.3f} | datos: {t_datos:.2f} s | optimización: {t_optimizacion:.3f} s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
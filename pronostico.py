@@ -0,0 +1,337 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from construccion_paralela import WORKERS, _mapear, particionar_productos
+from estacionalidad import RUTA_CAMOTE_PRECIOS, firmas, series_completas
+from historial import RUTA_HISTORIAL
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+RUTA_MODELOS = 'pronosticos.npz'  # Estado ajustado de todos los productos
+FUENTES = [RUTA_HISTORIAL, RUTA_CAMOTE_PRECIOS]
+MODELOS = ('ingenuo_estacional', 'regresion', 'holt_winters')
+GRILLA_HW = [(a, b, g) for a in (0.1, 0.3, 0.6) for b in (0.0, 0.1) for g in (0.1, 0.3)]  # (alfa, beta, gamma)
+AMORTIGUAMIENTO = 0.9   # phi de la tendencia amortiguada de Holt-Winters
+RIDGE = 1.0             # Penalización de la regresión (tendencia y meses)
+RIDGE_INTERCEPTO = 1e-6  # Casi sin penalización para el intercepto
+MIN_ERRORES = 3         # Errores de un paso necesarios para elegir modelo por desempeño
+N_REG = 13              # Intercepto, tendencia (años) y 11 meses
+
+# Los modelos trabajan con el logaritmo del precio mensual y se actualizan
+# de forma recursiva, un mes a la vez, para todos los productos juntos:
+# - ingenuo estacional: último valor visto de cada mes del año;
+# - Holt-Winters aditivo (estacionalidad multiplicativa en precio) con
+#   tendencia amortiguada, una trayectoria por cada punto de GRILLA_HW;
+# - regresión estacional ridge (intercepto, tendencia y meses) por mínimos
+#   cuadrados recursivos: coeficientes e inversa de X'X + penalización,
+#   actualizada con Sherman-Morrison en O(13^2) por mes.
+# Antes de incorporar cada mes se suma el error del pronóstico a un paso de
+# cada modelo; el modelo (y el punto de la grilla) con menor error medio es
+# el que pronostica. Como todo el estado es recursivo, agregar un mes nuevo
+# da exactamente lo mismo que reajustar desde cero. Si cambian meses ya
+# incorporados (firma distinta), ese producto se reajusta completo.
+
+# ============================================
+# 1. ESTADO
+# ============================================
+def _estado_vacio(productos):
+    n, g = len(productos), len(GRILLA_HW)
+    return {
+        'productos': np.array(productos, dtype=object),
+        'origen': np.full(n, -1, dtype=np.int64),     # Primer período observado
+        'ultimo': np.full(n, -1, dtype=np.int64),     # Último período incorporado
+        'n_obs': np.zeros(n, dtype=np.int64),
+        'firma': np.full(n, '', dtype=object),
+        'ultimo_valor': np.full(n, np.nan),
+        'ingenuo': np.full((n, 12), np.nan),
+        'hw': np.zeros((n, g, 14)),                   # nivel, tendencia, 12 estacionales
+        'reg_inversa': np.broadcast_to(np.diag(1 / _penalizacion()), (n, N_REG, N_REG)).copy(),
+        'reg_coef': np.zeros((n, N_REG)),
+        'errores': np.zeros((n, 2 + g)),              # ingenuo, regresión, grilla HW
+        'n_errores': np.zeros(n, dtype=np.int64),
+    }
+
+def _filas(estado, filas):
+    return {clave: valores[filas] for clave, valores in estado.items()}
+
+def guardar_modelos(estado, ruta=RUTA_MODELOS):
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, **{clave: (valores.astype(str) if valores.dtype == object else valores)
+                       for clave, valores in estado.items()})
+    os.replace(tmp, ruta)  # Reemplazo atómico para otros procesos
+
+def abrir_modelos(ruta=RUTA_MODELOS):
+    with np.load(ruta, allow_pickle=False) as npz:
+        estado = {clave: npz[clave] for clave in npz.files}
+    for clave in ('productos', 'firma'):
+        estado[clave] = estado[clave].astype(object)
+    return estado
+
+# ============================================
+# 2. ACTUALIZACIÓN RECURSIVA
+# ============================================
+def _x(periodos, origen):
+    """Fila de la regresión para cada (período, origen): 1, años desde el origen, mes."""
+    x = np.zeros((len(periodos), N_REG))
+    x[:, 0] = 1.0
+    x[:, 1] = (periodos - origen) / 12
+    mes = periodos % 12
+    con_mes = mes > 0
+    x[np.flatnonzero(con_mes), 1 + mes[con_mes]] = 1.0
+    return x
+
+def _penalizacion():
+    return np.r_[RIDGE_INTERCEPTO, np.full(N_REG - 1, RIDGE)]
+
+def avanzar(estado, valores, periodo0):
+    """
+    Incorpora al estado (modificándolo) la matriz `valores` (productos x
+    meses, log-precio, NaN = sin dato) que empieza en `periodo0`
+    (año * 12 + mes - 1). Se ignoran los meses ya incorporados.
+    """
+    n, largo = valores.shape
+    alfa, beta, gamma = (np.array(c)[None, :] for c in zip(*GRILLA_HW))
+    phi = AMORTIGUAMIENTO
+    con_dato = ~np.isnan(valores)
+    fin = np.where(con_dato.any(axis=1), periodo0 + largo - 1 - np.argmax(con_dato[:, ::-1], axis=1), -1)
+    hw = estado['hw']
+
+    for j in range(largo):
+        periodo = periodo0 + j
+        mes = periodo % 12
+        y = valores[:, j]
+        activo = (periodo > estado['ultimo']) & (periodo <= fin)
+        if not activo.any():
+            continue
+        iniciado = activo & (estado['n_obs'] > 0)
+        observado = activo & con_dato[:, j]
+
+        # Errores de un paso de los productos que ya tenían datos
+        medir = np.flatnonzero(observado & iniciado)
+        if len(medir):
+            ym = y[medir]
+            ingenuo = estado['ingenuo'][medir, mes]
+            ingenuo = np.where(np.isnan(ingenuo), estado['ultimo_valor'][medir], ingenuo)
+            reg = np.einsum('pk,pk->p', estado['reg_coef'][medir],
+                            _x(np.full(len(medir), periodo), estado['origen'][medir]))
+            pred_hw = hw[medir, :, 0] + phi * hw[medir, :, 1] + hw[medir, :, 2 + mes]
+            estado['errores'][medir, 0] += np.abs(ym - ingenuo)
+            estado['errores'][medir, 1] += np.abs(ym - reg)
+            estado['errores'][medir, 2:] += np.abs(ym[:, None] - pred_hw)
+            estado['n_errores'][medir] += 1
+
+        # Holt-Winters: corrección con dato, solo proyección en los huecos
+        corregir = observado & iniciado
+        proyectar = np.flatnonzero(iniciado & ~observado)
+        if len(proyectar):
+            hw[proyectar, :, 0] += phi * hw[proyectar, :, 1]
+            hw[proyectar, :, 1] *= phi
+        c = np.flatnonzero(corregir)
+        if len(c):
+            yc = y[c][:, None]
+            nivel, tend, est = hw[c, :, 0], hw[c, :, 1], hw[c, :, 2 + mes]
+            nuevo_nivel = alfa * (yc - est) + (1 - alfa) * (nivel + phi * tend)
+            hw[c, :, 1] = beta * (nuevo_nivel - nivel) + (1 - beta) * phi * tend
+            hw[c, :, 2 + mes] = gamma * (yc - nuevo_nivel) + (1 - gamma) * est
+            hw[c, :, 0] = nuevo_nivel
+        nuevos = np.flatnonzero(observado & ~iniciado)
+        if len(nuevos):
+            hw[nuevos] = 0.0
+            hw[nuevos, :, 0] = y[nuevos][:, None]
+            estado['origen'][nuevos] = periodo
+
+        # Ingenuo estacional y regresión (Sherman-Morrison)
+        o = np.flatnonzero(observado)
+        if len(o):
+            estado['ingenuo'][o, mes] = y[o]
+            estado['ultimo_valor'][o] = y[o]
+            x = _x(np.full(len(o), periodo), estado['origen'][o])
+            inversa = estado['reg_inversa'][o]
+            px = np.einsum('pij,pj->pi', inversa, x)
+            inversa -= px[:, :, None] * px[:, None, :] / (1 + np.einsum('pi,pi->p', x, px))[:, None, None]
+            residuo = y[o] - np.einsum('pi,pi->p', estado['reg_coef'][o], x)
+            estado['reg_coef'][o] += np.einsum('pij,pj->pi', inversa, x) * residuo[:, None]
+            estado['reg_inversa'][o] = inversa
+            estado['n_obs'][o] += 1
+        estado['ultimo'][activo] = periodo
+    return estado
+
+def _panel(series, productos, desde):
+    """Matriz log-precio productos x meses desde el menor período pendiente."""
+    filas = pd.Index(productos).get_indexer(series['producto'])
+    periodo = series['periodo'].to_numpy()
+    pendientes = (filas >= 0) & (periodo > desde[np.maximum(filas, 0)])
+    if not pendientes.any():
+        return np.full((len(productos), 0), np.nan), 0
+    filas, periodo = filas[pendientes], periodo[pendientes]
+    periodo0 = int(periodo.min())
+    valores = np.full((len(productos), int(periodo.max()) - periodo0 + 1), np.nan)
+    valores[filas, periodo - periodo0] = np.log(series['precio'].to_numpy()[pendientes])
+    return valores, periodo0
+
+def _avanzar_grupo(estado, series):
+    """Avanza un grupo de productos con sus series (se usa en el pool de procesos)."""
+    valores, periodo0 = _panel(series, estado['productos'], estado['ultimo'])
+    return avanzar(estado, valores, periodo0)
+
+def _preparar(series):
+    series = series[series['precio'] > 0]
+    return pd.DataFrame({
+        'producto': series['producto'].astype(str).to_numpy(dtype=object),
+        'año': series['año'].to_numpy(dtype=int),
+        'mes': series['mes'].to_numpy(dtype=int),
+        'periodo': series['año'].to_numpy(dtype=np.int64) * 12 + series['mes'].to_numpy(dtype=np.int64) - 1,
+        'precio': series['precio'].to_numpy(dtype=float),
+    })
+
+def actualizar_modelos(series, estado=None, workers=1):
+    """
+    Ajusta los productos nuevos o con meses ya incorporados modificados, y
+    agrega a los demás solo los meses posteriores a su último período.
+    Retorna (estado, resumen con el número de productos por caso).
+    """
+    series = _preparar(series)
+    productos = sorted(series['producto'].unique())
+    previo = estado if estado is not None else _estado_vacio([])
+
+    # Alinear el estado guardado al catálogo actual
+    posicion = pd.Index(previo['productos']).get_indexer(productos)
+    estado = _estado_vacio(productos)
+    conocidos = np.flatnonzero(posicion >= 0)
+    for clave in estado:
+        estado[clave][conocidos] = previo[clave][posicion[conocidos]]
+
+    # Revisiones: la firma de los meses ya incorporados cambió -> desde cero
+    ultimo = pd.Series(estado['ultimo'], index=productos)
+    incorporadas = series[series['periodo'].to_numpy() <= ultimo.reindex(series['producto']).to_numpy()]
+    actuales = firmas(incorporadas).reindex(productos).fillna('').to_numpy(dtype=object)
+    revisados = np.flatnonzero((posicion >= 0) & (actuales != estado['firma']))
+    if len(revisados):
+        vacio = _estado_vacio(np.array(productos, dtype=object)[revisados])
+        for clave in estado:
+            estado[clave][revisados] = vacio[clave]
+
+    fin = series.groupby('producto')['periodo'].max().reindex(productos).to_numpy()
+    pendientes = np.flatnonzero(fin > estado['ultimo'])
+    if len(pendientes):
+        grupos = particionar_productos(pendientes, max(1, min(workers, len(pendientes))))
+        tareas = [(_filas(estado, g), series[series['producto'].isin(estado['productos'][g])]) for g in grupos]
+        for g, parte in zip(grupos, _mapear(_avanzar_grupo, tareas, workers)):
+            for clave in estado:
+                estado[clave][g] = parte[clave]
+
+    ultimo = pd.Series(estado['ultimo'], index=productos)
+    incorporadas = series[series['periodo'].to_numpy() <= ultimo.reindex(series['producto']).to_numpy()]
+    estado['firma'] = firmas(incorporadas).reindex(productos).fillna('').to_numpy(dtype=object)
+    resumen = {
+        'productos': len(productos),
+        'nuevos': int((posicion < 0).sum()),
+        'reajustados': len(revisados),
+        'actualizados': int(len(pendientes) - (posicion[pendientes] < 0).sum() - len(revisados)),
+    }
+    return estado, resumen
+
+def cargar_modelos(ruta=RUTA_MODELOS, workers=1):
+    """Estado al día con las series actuales: se abre el guardado y se actualiza si hace falta."""
+    estado = None
+    if os.path.exists(ruta):
+        try:
+            estado = abrir_modelos(ruta)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudo leer {ruta}: {e}")
+    estado, resumen = actualizar_modelos(series_completas(), estado, workers)
+    if estado is None or resumen['nuevos'] or resumen['reajustados'] or resumen['actualizados']:
+        guardar_modelos(estado, ruta)
+    return estado
+
+# ============================================
+# 3. PRONÓSTICO
+# ============================================
+def elegir_modelo(estado):
+    """Índice en MODELOS y punto de la grilla HW del modelo con menor error medio por producto."""
+    errores = estado['errores']
+    mejor_hw = np.argmin(errores[:, 2:], axis=1)
+    candidatos = np.column_stack([errores[:, 0], errores[:, 1], errores[np.arange(len(errores)), 2 + mejor_hw]])
+    modelo = np.argmin(candidatos, axis=1)
+    modelo = np.where(estado['n_errores'] >= MIN_ERRORES, modelo, 0)  # Pocos datos: ingenuo estacional
+    return modelo, mejor_hw
+
+def pronosticar(estado, meses=12, productos=None):
+    """
+    Precio pronosticado de los próximos `meses` después del último mes con
+    dato de cada producto, con los tres modelos y el elegido.
+    """
+    if productos is not None:
+        estado = _filas(estado, np.flatnonzero(np.isin(estado['productos'], list(productos))))
+    estado = _filas(estado, np.flatnonzero(estado['n_obs'] > 0))
+    n = len(estado['productos'])
+    if n == 0:
+        return pd.DataFrame(columns=['producto', 'año', 'mes', 'horizonte', 'modelo', 'precio']
+                                    + [f'precio_{m}' for m in MODELOS])
+
+    modelo, mejor_hw = elegir_modelo(estado)
+    h = np.tile(np.arange(1, meses + 1), n)
+    fila = np.repeat(np.arange(n), meses)
+    periodo = estado['ultimo'][fila] + h
+    mes = periodo % 12
+
+    ingenuo = estado['ingenuo'][fila, mes]
+    ingenuo = np.where(np.isnan(ingenuo), estado['ultimo_valor'][fila], ingenuo)
+    reg = np.einsum('pk,pk->p', estado['reg_coef'][fila], _x(periodo, estado['origen'][fila]))
+    hw = estado['hw'][fila, mejor_hw[fila]]
+    suma_phi = AMORTIGUAMIENTO * (1 - AMORTIGUAMIENTO ** h) / (1 - AMORTIGUAMIENTO)
+    holt = hw[:, 0] + suma_phi * hw[:, 1] + hw[np.arange(len(fila)), 2 + mes]
+
+    precios = np.exp(np.column_stack([ingenuo, reg, holt]))
+    elegido = modelo[fila]
+    df = pd.DataFrame({
+        'producto': estado['productos'][fila],
+        'año': periodo // 12,
+        'mes': mes + 1,
+        'horizonte': h,
+        'modelo': np.array(MODELOS, dtype=object)[elegido],
+        'precio': precios[np.arange(len(fila)), elegido],
+    })
+    for i, nombre in enumerate(MODELOS):
+        df[f'precio_{nombre}'] = precios[:, i]
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Pronóstico de precios mensuales por producto.")
+    parser.add_argument('--historial', default=RUTA_HISTORIAL)
+    parser.add_argument('--reconstruir', action='store_true', help="Ajustar todos los productos desde cero")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--producto', help="Mostrar el pronóstico de un producto")
+    parser.add_argument('--meses', type=int, default=12)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    series = series_completas(args.historial)
+    t_series = time.perf_counter() - inicio
+
+    t0 = time.perf_counter()
+    previo = None if args.reconstruir or not os.path.exists(RUTA_MODELOS) else abrir_modelos()
+    estado, resumen = actualizar_modelos(series, previo, args.workers)
+    guardar_modelos(estado)
+    t_ajuste = time.perf_counter() - t0
+
+    modelo, _ = elegir_modelo(estado)
+    conteo = pd.Series(np.array(MODELOS, dtype=object)[modelo]).value_counts()
+    print(f"{resumen['productos']} productos | nuevos: {resumen['nuevos']} | reajustados: {resumen['reajustados']} "
+          f"| actualizados: {resumen['actualizados']}")
+    print("Modelo elegido: " + ', '.join(f"{m}: {c}" for m, c in conteo.items()))
+    print(f"Tiempo: series {t_series:.2f} s | ajuste {t_ajuste:.2f} s")
+    if args.producto:
+        tabla = pronosticar(estado, args.meses, [args.producto])
+        if tabla.empty:
+            print(f"Sin pronóstico para {args.producto}")
+        else:
+            print(tabla.drop(columns='producto').to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
+import argparse
+import hashlib
+import sys
+import time
 import pandas as pd
 import numpy as np
 import os
 
+from buscador import IndiceProductos
+from cache_datos import leer_csv
+from calidad import VERSION_REGLAS, validos
+from estacionalidad import indices_reales_robustos
+from indices_estacionales import cargar_indice_estacional
+
 # ============================================
 # CONFIGURACIÓN
 # ============================================
@@ -12,43 +22,21 @@ RUTA_PRECIOS_MENSUALES = 'precios_mensuales_producto.csv'
 RUTA_CAMOTE_PRECIOS = 'camote_precios.csv'
 RUTA_FAOSTAT = 'FAOSTAT_data_en_2-19-2026.csv'
 RUTA_CICLOS = 'ciclos_cultivo.csv'  # Lo crearemos
+RUTA_TABLA_RECOMENDACIONES = 'recomendaciones.parquet'  # Generado por construir_tabla_recomendaciones
+AÑO_INDICE_REAL = 2025  # Año completo usado para derivar índices desde precios reales
 
 # ============================================
 # 1. CARGAR ÍNDICES ESTACIONALES
 # ============================================
 def cargar_indices():
     """Carga los índices estacionales de frutas y hortalizas y los unifica."""
-    indices_list = []
-    
-    # Frutas
-    if os.path.exists(RUTA_FRUTAS):
-        df_frutas = pd.read_csv(RUTA_FRUTAS)
-        df_frutas['tipo'] = 'fruta'
-        indices_list.append(df_frutas)
-    
-    # Hortalizas
-    if os.path.exists(RUTA_HORTALIZAS):
-        df_hortalizas = pd.read_csv(RUTA_HORTALIZAS)
-        df_hortalizas['tipo'] = 'hortaliza'
-        indices_list.append(df_hortalizas)
-    
-    if not indices_list:
+    indice = cargar_indice_estacional(RUTA_FRUTAS, RUTA_HORTALIZAS)
+    if len(indice) == 0:
         print("No se encontraron archivos de índices estacionales.")
         return pd.DataFrame()
     
-    df_indices = pd.concat(indices_list, ignore_index=True)
-    
-    # Convertir a formato largo (producto, mes, indice)
-    meses = ['Ene','Feb','Mar','Abr','May','Jun','Jul','Ago','Set','Oct','Nov','Dic']
-    meses_num = {m:i+1 for i,m in enumerate(meses)}
-    
-    df_largo = pd.melt(df_indices, id_vars=['Cultivo', 'tipo'], value_vars=meses,
-                        var_name='mes_str', value_name='indice')
-    df_largo['mes'] = df_largo['mes_str'].map(meses_num)
-    df_largo.rename(columns={'Cultivo': 'producto'}, inplace=True)
-    df_largo = df_largo[['producto', 'mes', 'indice', 'tipo']].dropna()
-    
-    return df_largo
+    # Formato largo (producto, mes, indice, tipo)
+    return indice.a_largo()
 
 # ============================================
 # 2. CARGAR PRECIOS MENSUALES DEL JSON (CENADA)
@@ -58,7 +46,7 @@ def cargar_precios_mensuales():
     if not os.path.exists(RUTA_PRECIOS_MENSUALES):
         print(f"No se encontró {RUTA_PRECIOS_MENSUALES}")
         return pd.DataFrame()
-    df = pd.read_csv(RUTA_PRECIOS_MENSUALES)
+    df = validos(leer_csv(RUTA_PRECIOS_MENSUALES))  # Sin filas marcadas en la ingesta
     # Asegurar tipos
     df['año'] = df['año'].astype(int)
     df['mes'] = df['mes'].astype(int)
@@ -70,7 +58,7 @@ def cargar_precios_mensuales():
 def cargar_camote():
     if not os.path.exists(RUTA_CAMOTE_PRECIOS):
         return pd.DataFrame()
-    df = pd.read_csv(RUTA_CAMOTE_PRECIOS)
+    df = validos(leer_csv(RUTA_CAMOTE_PRECIOS))  # Sin centinelas 1.0 ni atípicos
     # Convertir nombres de mes a número
     meses_map = {'Enero':1,'Febrero':2,'Marzo':3,'Abril':4,'Mayo':5,'Junio':6,
                  'Julio':7,'Agosto':8,'Septiembre':9,'Octubre':10,'Noviembre':11,'Diciembre':12}
@@ -85,7 +73,7 @@ def cargar_camote():
 def cargar_ciclos():
     """Carga ciclos de cultivo desde CSV o usa valores por defecto."""
     if os.path.exists(RUTA_CICLOS):
-        df = pd.read_csv(RUTA_CICLOS)
+        df = leer_csv(RUTA_CICLOS)
         # Asegurar columnas: producto, ciclo_meses
         if 'producto' in df.columns and 'ciclo_meses' in df.columns:
             return df
@@ -155,16 +143,47 @@ def cargar_ciclos():
 # ============================================
 # 5. INTEGRAR TODO EN UNA BASE DE CONOCIMIENTO
 # ============================================
-def crear_base_conocimiento():
-    """Combina índices, precios y ciclos en una estructura unificada."""
+def calcular_indices_reales(precios_mensuales, año=AÑO_INDICE_REAL):
+    """
+    Índice real por producto y mes: precio del mes / precio promedio del año.
+    Retorna un DataFrame (producto, mes, indice).
+    """
+    # Usamos solo un año para tener un año completo (si hay datos)
+    precios_año = precios_mensuales[precios_mensuales['año'] == año]
+    if precios_año.empty:
+        return pd.DataFrame(columns=['producto', 'mes', 'indice'])
+    precio_anual = precios_año.groupby('producto', observed=True)['precio_promedio'].mean().reset_index()
+    precio_anual.columns = ['producto', 'precio_anual']
+    precios_con_anual = pd.merge(precios_año, precio_anual, on='producto')
+    precios_con_anual['indice'] = precios_con_anual['precio_promedio'] / precios_con_anual['precio_anual']
+    return precios_con_anual[['producto', 'mes', 'indice']]
+
+def crear_base_conocimiento(indices_reales=None):
+    """
+    Combina índices, precios y ciclos en una estructura unificada.
+    Si se pasan `indices_reales` ya calculados (p. ej. desde la base
+    incremental) no se leen ni procesan los precios mensuales.
+    """
     indices = cargar_indices()
-    precios_mensuales = cargar_precios_mensuales()
+    precios_mensuales = cargar_precios_mensuales() if indices_reales is None else pd.DataFrame()
     camote = cargar_camote()
     ciclos = cargar_ciclos()
     
+    # Si tenemos precios mensuales, podemos calcular índices reales para productos sin índice PDF
+    if indices_reales is None and not precios_mensuales.empty:
+        indices_reales = calcular_indices_reales(precios_mensuales)
+    base = integrar_base(indices, indices_reales, camote, ciclos)
+    return base, ciclos
+
+def integrar_base(indices, indices_reales, camote, ciclos):
+    """
+    Une índices de PDF, índices reales y el índice derivado del camote con
+    los ciclos (prioridad: PDF, luego precios reales, luego camote).
+    No lee archivos, así puede aplicarse a un subconjunto de productos.
+    """
     # Crear un DataFrame base con todos los productos únicos de índices y precios
     productos_indices = set(indices['producto'].unique()) if not indices.empty else set()
-    productos_precios = set(precios_mensuales['producto'].unique()) if not precios_mensuales.empty else set()
+    productos_precios = set(indices_reales['producto'].unique()) if indices_reales is not None and not indices_reales.empty else set()
     productos_camote = set(['Camote']) if not camote.empty else set()
     todos_productos = productos_indices.union(productos_precios).union(productos_camote)
     
@@ -178,23 +197,13 @@ def crear_base_conocimiento():
     else:
         indice_df = pd.DataFrame(columns=['producto', 'mes', 'indice'])
     
-    # Si tenemos precios mensuales, podemos calcular índices reales para productos sin índice PDF
-    if not precios_mensuales.empty:
-        # Calcular precio promedio anual por producto para 2025 (o todos los años)
-        # Usamos solo 2025 para tener un año completo (si hay datos)
-        precios_2025 = precios_mensuales[precios_mensuales['año'] == 2025]
-        if not precios_2025.empty:
-            precio_anual = precios_2025.groupby('producto')['precio_promedio'].mean().reset_index()
-            precio_anual.columns = ['producto', 'precio_anual']
-            precios_con_anual = pd.merge(precios_2025, precio_anual, on='producto')
-            precios_con_anual['indice_real'] = precios_con_anual['precio_promedio'] / precios_con_anual['precio_anual']
-            # Unir con índices existentes para priorizar PDF
-            # Para productos sin índice PDF, agregamos estos índices reales
-            productos_sin_indice = set(precios_con_anual['producto'].unique()) - set(indice_df['producto'].unique())
-            if productos_sin_indice:
-                indices_reales = precios_con_anual[precios_con_anual['producto'].isin(productos_sin_indice)]
-                indices_reales = indices_reales[['producto', 'mes', 'indice_real']].rename(columns={'indice_real':'indice'})
-                indice_df = pd.concat([indice_df, indices_reales], ignore_index=True)
+    if indices_reales is not None and not indices_reales.empty:
+        # Unir con índices existentes para priorizar PDF
+        # Para productos sin índice PDF, agregamos estos índices reales
+        productos_sin_indice = set(indices_reales['producto'].unique()) - set(indice_df['producto'].unique())
+        if productos_sin_indice:
+            nuevos = indices_reales[indices_reales['producto'].isin(productos_sin_indice)]
+            indice_df = pd.concat([indice_df, nuevos[['producto', 'mes', 'indice']]], ignore_index=True)
     
     # Agregar datos de camote (si ya está en índices, no duplicar)
     if not camote.empty and 'Camote' not in indice_df['producto'].unique():
@@ -210,18 +219,50 @@ def crear_base_conocimiento():
         indice_df = pd.concat([indice_df, camote_indice_mensual[['producto', 'mes', 'indice']]], ignore_index=True)
     
     # Unir con ciclos
-    base = pd.merge(indice_df, ciclos, on='producto', how='left')
-    
-    return base, ciclos
+    return pd.merge(indice_df, ciclos, on='producto', how='left')
+
+def indices_pronosticados(pronosticos):
+    """
+    Índice por producto y mes a partir de pronostico.pronosticar(): precio
+    pronosticado del mes / promedio pronosticado de los 12 meses siguientes
+    al último dato. Retorna un DataFrame (producto, mes, indice).
+    """
+    if pronosticos is None or pronosticos.empty:
+        return pd.DataFrame(columns=['producto', 'mes', 'indice'])
+    df = pronosticos[pronosticos['horizonte'] <= 12]
+    promedio = df.groupby('producto')['precio'].transform('mean')
+    return pd.DataFrame({'producto': df['producto'].astype(str).to_numpy(),
+                         'mes': df['mes'].astype(int).to_numpy(),
+                         'indice': (df['precio'] / promedio).to_numpy(dtype=float)})
+
+def aplicar_pronostico(base, pronosticos):
+    """
+    Base de conocimiento con el índice de cada producto pronosticado
+    reemplazado por indices_pronosticados(); los demás productos y los
+    ciclos no cambian. Así las recomendaciones ordenan los meses de cosecha
+    por el precio pronosticado en lugar del patrón histórico.
+    """
+    nuevos = indices_pronosticados(pronosticos)
+    nuevos = nuevos[nuevos['producto'].isin(set(base['producto'].unique()))]
+    if nuevos.empty:
+        return base
+    ciclos = base.drop_duplicates('producto')[['producto', 'ciclo_meses']]
+    resto = base[~base['producto'].isin(set(nuevos['producto']))]
+    return pd.concat([resto, pd.merge(nuevos, ciclos, on='producto', how='left')],
+                     ignore_index=True)
 
 # ============================================
 # 6. FUNCIÓN DE RECOMENDACIÓN
 # ============================================
-def recomendar_para_producto(base, producto, ciclo_usuario=None):
+def recomendar_para_producto(base, producto, ciclo_usuario=None, pronosticos=None):
     """
     Para un producto dado, encuentra mejor mes de siembra y venta.
+    Con `pronosticos` (salida de pronostico.pronosticar) los meses se
+    ordenan por el precio pronosticado (ver aplicar_pronostico).
     Retorna un diccionario con resultados.
     """
+    if pronosticos is not None:
+        base = aplicar_pronostico(base[base['producto'] == producto], pronosticos)
     # Filtrar datos del producto
     prod_data = base[base['producto'] == producto].copy()
     if prod_data.empty:
@@ -296,9 +337,228 @@ def recomendar_para_producto(base, producto, ciclo_usuario=None):
     }
 
 # ============================================
-# 7. INTERFAZ SIMPLE (LÍNEA DE COMANDOS)
+# 7. RECOMENDACIÓN PARA TODO EL CATÁLOGO (VECTORIZADA)
+# ============================================
+COLUMNAS_RECOMENDACION = [
+    'producto', 'ciclo_meses', 'mejor_mes_siembra', 'mes_cosecha_mejor_siembra',
+    'indice_cosecha_mejor_siembra', 'beneficio_siembra_%', 'mejor_mes_venta',
+    'indice_mejor_venta', 'beneficio_venta_%', 'peor_mes_venta',
+    'indice_peor_venta', 'rango_venta_%'
+]
+
+def matriz_indices(base):
+    """
+    Pivota la base a una matriz productos x 12 (columna 0 = enero).
+    Los meses sin dato quedan en 1.0, igual que en recomendar_para_producto.
+    Retorna (array de productos, matriz float64).
+    """
+    if base.empty:
+        return np.array([], dtype=object), np.ones((0, 12))
+    tabla = (base.drop_duplicates(['producto', 'mes'])
+                 .pivot(index='producto', columns='mes', values='indice')
+                 .reindex(columns=range(1, 13)))
+    matriz = tabla.fillna(1.0).to_numpy(dtype=float, copy=True)
+    return tabla.index.to_numpy(dtype=object), matriz
+
+def recomendar_todos(base, ciclos=None, pronosticos=None):
+    """
+    Calcula las recomendaciones de todos los productos en una sola pasada.
+
+    `base` puede ser el DataFrame largo o una BaseCompacta.
+    Si `ciclos` es None se usa el ciclo de cada producto en la base (los
+    productos sin ciclo se omiten). Si es una lista de meses, se evalúa cada
+    producto con cada ciclo de la lista. Con `pronosticos` se usa el índice
+    pronosticado de cada producto que lo tenga (ver aplicar_pronostico).
+    Retorna un DataFrame con las mismas claves que recomendar_para_producto.
+    """
+    if pronosticos is not None:
+        if isinstance(base, BaseCompacta):
+            base = BaseCompacta.desde_base(aplicar_pronostico(base.a_dataframe(), pronosticos))
+        else:
+            base = aplicar_pronostico(base, pronosticos)
+    if isinstance(base, BaseCompacta):
+        productos, matriz = base.matriz_recomendacion()
+    else:
+        productos, matriz = matriz_indices(base)
+
+    if ciclos is None:
+        if isinstance(base, BaseCompacta):
+            ciclo_prod = base.ciclos.astype(float)
+        else:
+            ciclo_prod = (base.groupby('producto')['ciclo_meses'].first()
+                              .reindex(productos).to_numpy(dtype=float))
+        filas = np.flatnonzero(~np.isnan(ciclo_prod))
+        ciclo_col = ciclo_prod[filas].astype(np.int64)
+    else:
+        ciclos = np.asarray(list(ciclos), dtype=np.int64)
+        filas = np.repeat(np.arange(len(productos)), len(ciclos))
+        ciclo_col = np.tile(ciclos, len(productos))
+
+    if len(filas) == 0:
+        return pd.DataFrame(columns=COLUMNAS_RECOMENDACION)
+
+    # Estadísticas de venta: una vez por producto, luego se reparten por fila
+    mejor_venta = matriz.argmax(axis=1)
+    peor_venta = matriz.argmin(axis=1)
+    max_indice = matriz.max(axis=1)
+    min_indice = matriz.min(axis=1)
+
+    # Mes de cosecha (base 0) para cada fila y cada mes de siembra
+    meses = np.arange(12)
+    cosecha = (meses[None, :] + ciclo_col[:, None] - 1) % 12
+    indice_cosecha = matriz[filas[:, None], cosecha]
+
+    mejor_siembra = indice_cosecha.argmax(axis=1)
+    rango = np.arange(len(filas))
+    indice_mejor_siembra = indice_cosecha[rango, mejor_siembra]
+    mes_cosecha = cosecha[rango, mejor_siembra]
+
+    return pd.DataFrame({
+        'producto': productos[filas],
+        'ciclo_meses': ciclo_col,
+        'mejor_mes_siembra': mejor_siembra + 1,
+        'mes_cosecha_mejor_siembra': mes_cosecha + 1,
+        'indice_cosecha_mejor_siembra': indice_mejor_siembra,
+        'beneficio_siembra_%': (indice_mejor_siembra - 1.0) * 100,
+        'mejor_mes_venta': mejor_venta[filas] + 1,
+        'indice_mejor_venta': max_indice[filas],
+        'beneficio_venta_%': (max_indice[filas] - 1.0) * 100,
+        'peor_mes_venta': peor_venta[filas] + 1,
+        'indice_peor_venta': min_indice[filas],
+        'rango_venta_%': (max_indice[filas] - min_indice[filas]) * 100,
+    }, columns=COLUMNAS_RECOMENDACION)
+
+# ============================================
+# 8. BASE COMPACTA EN MEMORIA
+# ============================================
+class BaseCompacta:
+    """
+    La base de conocimiento como arreglos: nombres de producto internados
+    (uno por producto), matriz productos x 12 float32 (NaN = mes sin dato)
+    y ciclos float32 por producto (NaN = sin ciclo). Ocupa una fracción del
+    DataFrame largo, que repite nombre, mes y ciclo en cada fila.
+    """
+
+    __slots__ = ('productos', 'matriz', 'ciclos', 'filas')
+
+    def __init__(self, productos, matriz, ciclos):
+        self.productos = np.array([sys.intern(str(p)) for p in productos], dtype=object)
+        self.matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+        self.ciclos = np.ascontiguousarray(ciclos, dtype=np.float32)
+        self.filas = {p: i for i, p in enumerate(self.productos)}
+
+    @classmethod
+    def desde_base(cls, base):
+        """Compacta el DataFrame de crear_base_conocimiento."""
+        if base.empty:
+            return cls([], np.empty((0, 12)), [])
+        base = base.drop_duplicates(['producto', 'mes'])
+        tabla = base.pivot(index='producto', columns='mes', values='indice').reindex(columns=range(1, 13))
+        ciclos = base.groupby('producto')['ciclo_meses'].first().reindex(tabla.index)
+        return cls(tabla.index, tabla.to_numpy(dtype=float), ciclos.to_numpy(dtype=float))
+
+    def __len__(self):
+        return len(self.productos)
+
+    def __contains__(self, producto):
+        return producto in self.filas
+
+    def subconjunto(self, productos):
+        """Base compacta solo con los productos dados (en el orden de esta base)."""
+        pedidos = set(productos)
+        filas = [i for i, p in enumerate(self.productos) if p in pedidos]
+        return BaseCompacta(self.productos[filas], self.matriz[filas], self.ciclos[filas])
+
+    def matriz_recomendacion(self):
+        """
+        (productos, matriz float64) como matriz_indices: meses sin dato en 1.0.
+        Se redondea a 6 decimales para no arrastrar el ruido de float32.
+        """
+        matriz = np.round(self.matriz.astype(float), 6)
+        matriz[np.isnan(matriz)] = 1.0
+        return self.productos, matriz
+
+    def a_dataframe(self):
+        """Formato largo (producto categórico, mes int8, indice float32, ciclo_meses)."""
+        filas, meses = np.nonzero(~np.isnan(self.matriz))
+        return pd.DataFrame({
+            'producto': pd.Categorical.from_codes(filas, categories=self.productos),
+            'mes': (meses + 1).astype(np.int8),
+            'indice': self.matriz[filas, meses],
+            'ciclo_meses': self.ciclos[filas],
+        })
+
+    def memoria(self):
+        """Bytes ocupados por cada componente."""
+        return {
+            'productos': self.productos.nbytes + sum(sys.getsizeof(p) for p in self.productos),
+            'matriz': self.matriz.nbytes,
+            'ciclos': self.ciclos.nbytes,
+            'filas (dict)': sys.getsizeof(self.filas),
+        }
+
+def reporte_memoria(base):
+    """DataFrame con los bytes por columna de la base larga y de la compacta."""
+    largo = base.memory_usage(deep=True, index=True)
+    compacta = BaseCompacta.desde_base(base)
+    filas = [('base larga', str(col), int(b)) for col, b in largo.items()]
+    filas += [('base compacta', nombre, int(b)) for nombre, b in compacta.memoria().items()]
+    df = pd.DataFrame(filas, columns=['estructura', 'componente', 'bytes'])
+    totales = df.groupby('estructura', sort=False)['bytes'].sum()
+    return df, totales
+
+# ============================================
+# 9. TABLA PRECALCULADA DE RECOMENDACIONES
+# ============================================
+CICLOS_TABLA = range(1, 37)  # Todos los ciclos de cargar_ciclos caben en 1-36 meses
+VERSION_TABLA = 2            # Subir al cambiar las columnas o el cálculo de la tabla
+FUENTES_TABLA = [RUTA_FRUTAS, RUTA_HORTALIZAS, RUTA_PRECIOS_MENSUALES, RUTA_CAMOTE_PRECIOS, RUTA_CICLOS]
+
+def firma_fuentes(fuentes, *version):
+    """
+    Firma de un archivo derivado: ruta, mtime (ns) y tamaño de cada fuente
+    más los parámetros de `version`. Cambia si se reemplaza una fuente
+    aunque conserve o retroceda su mtime.
+    """
+    partes = [repr(version)]
+    for ruta in fuentes:
+        if os.path.exists(ruta):
+            st = os.stat(ruta)
+            partes.append(f"{ruta}|{st.st_mtime_ns}|{st.st_size}")
+    return hashlib.md5('\n'.join(partes).encode('utf-8')).hexdigest()[:12]
+
+def _firma_tabla(ciclos):
+    return firma_fuentes(FUENTES_TABLA, VERSION_TABLA, VERSION_REGLAS, list(ciclos))
+
+def construir_tabla_recomendaciones(ruta=RUTA_TABLA_RECOMENDACIONES, ciclos=CICLOS_TABLA):
+    """
+    Precalcula recomendar_todos para cada (producto, ciclo) y lo guarda en
+    Parquet con la firma de sus fuentes (en los attrs). Retorna la tabla.
+    """
+    firma = _firma_tabla(ciclos)
+    base, _ = crear_base_conocimiento()
+    tabla = recomendar_todos(base, ciclos)
+    tabla.attrs['firma'] = firma
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    tabla.to_parquet(tmp, index=False)
+    os.replace(tmp, ruta)
+    return tabla
+
+def cargar_tabla_recomendaciones(ruta=RUTA_TABLA_RECOMENDACIONES):
+    """
+    Lee la tabla precalculada; la reconstruye si no existe o si su firma no
+    coincide con la de las fuentes, CICLOS_TABLA y las versiones actuales.
+    """
+    if os.path.exists(ruta):
+        tabla = pd.read_parquet(ruta)
+        if tabla.attrs.get('firma') == _firma_tabla(CICLOS_TABLA):
+            return tabla
+    return construir_tabla_recomendaciones(ruta)
+
+# ============================================
+# 10. INTERFAZ SIMPLE (LÍNEA DE COMANDOS)
 # ============================================
-def main():
+def modo_interactivo():
     print("Cargando base de conocimiento...")
     base, ciclos = crear_base_conocimiento()
     if base.empty:
@@ -306,23 +566,36 @@ def main():
         return
     
     print(f"Base cargada con {base['producto'].nunique()} productos.")
+    productos_lista = sorted(base['producto'].unique())
+    buscador = IndiceProductos(productos_lista)
     
     while True:
         print("\n--- RECOMENDADOR DE SIEMBRA Y VENTA ---")
         print("Productos disponibles (primeros 20):")
-        productos_lista = sorted(base['producto'].unique())
         for i, p in enumerate(productos_lista[:20]):
             print(f"  {i+1}. {p}")
         if len(productos_lista) > 20:
             print("  ... (hay más)")
         
-        prod_input = input("\nIngrese el nombre exacto del producto (o 'salir'): ").strip()
+        prod_input = input("\nIngrese el nombre del producto (o 'salir'): ").strip()
         if prod_input.lower() == 'salir':
             break
         
-        if prod_input not in productos_lista:
-            print("Producto no encontrado. Intente de nuevo.")
-            continue
+        # Sin tildes ni mayúsculas; acepta prefijos ("plat ver") y errores de tipeo.
+        # Si el nombre coincide exactamente ("camote") se usa aunque sea prefijo de otros
+        if prod_input not in buscador.ids:
+            exacto = buscador.exacto(prod_input)
+            coincidencias = [exacto] if exacto else buscador.buscar(prod_input)
+            if not coincidencias:
+                print("Producto no encontrado. Intente de nuevo.")
+                continue
+            if len(coincidencias) > 1:
+                print("Varios productos coinciden:")
+                for p in coincidencias:
+                    print(f"  - {p}")
+                continue
+            prod_input = coincidencias[0]
+            print(f"Usando: {prod_input}")
         
         # Preguntar si desea usar ciclo por defecto o ingresar uno
         ciclo_op = input("¿Usar ciclo por defecto? (s/n): ").strip().lower()
@@ -354,5 +627,122 @@ def main():
         print(f"   Rango entre mejor y peor mes: {resultado['rango_venta_%']:.1f}%")
         print("="*50)
 
+# ============================================
+# 11. MODO POR LOTES (SIN INTERACCIÓN)
+# ============================================
+FORMATOS_SALIDA = ('csv', 'jsonl', 'parquet')
+
+def parsear_ciclos(texto):
+    """'defecto' -> None; '3-12' -> rango inclusivo; '3,5,8' -> lista."""
+    if texto == 'defecto':
+        return None
+    ciclos = []
+    for parte in texto.split(','):
+        parte = parte.strip()
+        if '-' in parte:
+            desde, hasta = (int(x) for x in parte.split('-', 1))
+            ciclos.extend(range(desde, hasta + 1))
+        elif parte:
+            ciclos.append(int(parte))
+    if not ciclos or min(ciclos) < 1:
+        raise argparse.ArgumentTypeError(f"Ciclos inválidos: {texto}")
+    return sorted(set(ciclos))
+
+def escribir_resultados(df, formato, salida):
+    """Escribe el DataFrame en el formato pedido; sin `salida` usa stdout (csv/jsonl)."""
+    if formato == 'parquet':
+        df.to_parquet(salida, index=False)
+    elif formato == 'jsonl':
+        df.to_json(salida if salida else sys.stdout, orient='records', lines=True, force_ascii=False)
+        if not salida:
+            sys.stdout.write('\n')
+    else:
+        df.to_csv(salida if salida else sys.stdout, index=False)
+
+def modo_batch(args):
+    """Calcula las recomendaciones de los productos pedidos en una sola pasada."""
+    if args.format == 'parquet' and not args.out:
+        print("El formato parquet requiere --out.", file=sys.stderr)
+        return 2
+
+    inicio = time.perf_counter()
+    indices_reales = indices_reales_robustos() if args.indices_reales == 'robustos' else None
+    base, _ = crear_base_conocimiento(indices_reales)
+    t_base = time.perf_counter() - inicio
+
+    if args.productos != 'all':
+        pedidos = [p.strip() for p in args.productos.split(',') if p.strip()]
+        faltantes = sorted(set(pedidos) - set(base['producto'].unique()))
+        if faltantes:
+            print(f"Productos no encontrados: {', '.join(faltantes)}", file=sys.stderr)
+            buscador = IndiceProductos(base['producto'].unique())
+            for p in faltantes:
+                sugerencias = buscador.buscar(p, limite=3)
+                if sugerencias:
+                    print(f"  ¿{p}? Quizás: {', '.join(sugerencias)}", file=sys.stderr)
+        base = base[base['producto'].isin(pedidos)]
+
+    pronosticos = None
+    if args.pronostico:
+        import pronostico  # pronostico importa construccion_paralela, que importa este módulo
+        t0 = time.perf_counter()
+        pronosticos = pronostico.pronosticar(pronostico.cargar_modelos(), 12, base['producto'].unique())
+        print(f"Pronósticos: {pronosticos['producto'].nunique()} productos "
+              f"({time.perf_counter() - t0:.3f} s)", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    resultados = recomendar_todos(base, args.ciclos, pronosticos)
+    t_calculo = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    escribir_resultados(resultados, args.format, args.out)
+    t_escritura = time.perf_counter() - t0
+
+    print(f"{len(resultados)} recomendaciones ({resultados['producto'].nunique()} productos) | "
+          f"base: {t_base:.3f} s | cálculo: {t_calculo:.3f} s | escritura: {t_escritura:.3f} s",
+          file=sys.stderr)
+    return 0
+
+def modo_memoria():
+    """Imprime los bytes por componente de ambas representaciones de la base."""
+    base, _ = crear_base_conocimiento()
+    detalle, totales = reporte_memoria(base)
+    print(detalle.to_string(index=False))
+    print("-" * 40)
+    for estructura, total in totales.items():
+        print(f"{estructura}: {total / 1024:.1f} KiB")
+    if totales.get('base compacta'):
+        print(f"Reducción: {totales['base larga'] / totales['base compacta']:.1f}x")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recomendador de siembra y venta.")
+    sub = parser.add_subparsers(dest='comando')
+    sub.add_parser('interactivo', help="Consulta producto por producto (por defecto)")
+
+    batch = sub.add_parser('batch', help="Recomendaciones de todo el catálogo sin interacción")
+    batch.add_argument('--productos', default='all',
+                       help="'all' o nombres exactos separados por coma")
+    batch.add_argument('--ciclos', type=parsear_ciclos, default=None,
+                       help="'defecto' (ciclo de cada producto), '3-12' o '3,5,8'")
+    batch.add_argument('--format', choices=FORMATOS_SALIDA, default='csv')
+    batch.add_argument('--out', help="Archivo de salida (csv/jsonl: stdout si se omite)")
+    batch.add_argument('--indices-reales', choices=('anual', 'robustos'), default='anual',
+                       help="Productos sin índice PDF: precios de un año ('anual') o el motor "
+                            "de estacionalidad.py sobre todo el historial ('robustos')")
+    batch.add_argument('--pronostico', action='store_true',
+                       help="Ordenar los meses de cosecha por el precio pronosticado de los próximos "
+                            "12 meses (pronostico.py) en los productos que tengan pronóstico")
+
+    sub.add_parser('memoria', help="Memoria de la base larga frente a la compacta")
+
+    args = parser.parse_args(argv)
+    if args.comando == 'batch':
+        return modo_batch(args)
+    if args.comando == 'memoria':
+        return modo_memoria()
+    modo_interactivo()
+    return 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
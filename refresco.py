@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+INTERVALO = 30  # Segundos entre revisiones de los archivos de datos
+
+# ============================================
+# 1. INSTANTÁNEA INMUTABLE
+# ============================================
+class Instantanea:
+    """
+    Conjunto de datos derivados de una versión de los archivos. No se
+    modifica después de creada: una actualización arma otra instantánea y
+    reemplaza la referencia, así quien ya tiene una la ve completa.
+    """
+
+    __slots__ = ('version', 'creada', 'datos')
+
+    def __init__(self, version, datos):
+        self.version = version
+        self.creada = datetime.now()
+        self.datos = MappingProxyType(dict(datos))
+
+    def __getitem__(self, clave):
+        return self.datos[clave]
+
+def firma_archivos(rutas):
+    """Versión corta a partir de ruta, mtime y tamaño de cada archivo existente."""
+    partes = []
+    for ruta in sorted(set(rutas)):
+        if os.path.exists(ruta):
+            st = os.stat(ruta)
+            partes.append(f"{ruta}|{st.st_mtime_ns}|{st.st_size}")
+    return hashlib.md5('\n'.join(partes).encode('utf-8')).hexdigest()[:8]
+
+# ============================================
+# 2. REFRESCO EN SEGUNDO PLANO
+# ============================================
+class Refrescador:
+    """
+    Revisa cada `intervalo` segundos la firma de los archivos (`firmar()`);
+    si cambió, arma una instantánea nueva con `construir()` en un hilo
+    aparte y la publica de una vez. Si la construcción falla, o la firma
+    cambió mientras se armaba, se conserva la instantánea anterior.
+    """
+
+    def __init__(self, construir, firmar, intervalo=INTERVALO):
+        self._construir = construir
+        self._firmar = firmar
+        self.intervalo = intervalo
+        self._actual = None
+        self._parar = threading.Event()
+        self._hilo = None
+        self.ultimo_error = None
+
+    def actual(self):
+        """Instantánea vigente; leerla una vez por rerun da datos consistentes."""
+        return self._actual
+
+    def refrescar(self, forzar=False):
+        """Construye y publica una instantánea si la firma cambió. Retorna True si publicó."""
+        version = self._firmar()
+        if not forzar and self._actual is not None and self._actual.version == version:
+            return False
+        inicio = time.perf_counter()
+        try:
+            nueva = Instantanea(version, self._construir())
+        except Exception as e:
+            self.ultimo_error = f"{datetime.now():%d/%m/%Y %H:%M}: {e}"
+            print(f"No se pudo refrescar los datos (se mantiene la versión anterior): {e}")
+            return False
+        if self._actual is not None and self._firmar() != version:
+            # Un archivo cambió mientras se armaba: los datos podrían mezclar
+            # dos versiones. Se descarta y el próximo ciclo arma la nueva.
+            print(f"Los archivos cambiaron durante el refresco; se descarta la versión {version}")
+            return False
+        self._actual = nueva  # Reemplazo atómico de la referencia
+        self.ultimo_error = None
+        print(f"Datos versión {version} listos en {time.perf_counter() - inicio:.2f} s")
+        return True
+
+    def _ciclo(self):
+        while not self._parar.wait(self.intervalo):
+            self.refrescar()
+
+    def iniciar(self):
+        """Arma la primera instantánea (en este hilo) y arranca el hilo de refresco."""
+        if self._actual is None:
+            self.refrescar(forzar=True)
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._ciclo, name='refresco-datos', daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
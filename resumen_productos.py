@@ -0,0 +1,129 @@
+import os
+import numpy as np
+import pandas as pd
+
+from cache_datos import leer_csv
+from calidad import VERSION_REGLAS, validos
+from recomendador import (RUTA_CAMOTE_PRECIOS, RUTA_CICLOS, RUTA_FRUTAS, RUTA_HORTALIZAS,
+                          RUTA_PRECIOS_MENSUALES, cargar_precios_mensuales, crear_base_conocimiento,
+                          firma_fuentes)
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+RUTA_RESUMEN = 'resumen_productos.parquet'  # Generado por construir_resumen
+RUTA_PRECIO_GENERAL = 'precio_general_producto.csv'
+MESES_RECIENTES = 12  # Precios mensuales recientes guardados por producto
+VERSION_RESUMEN = 1   # Subir al cambiar las columnas o el cálculo del resumen
+FUENTES = [RUTA_FRUTAS, RUTA_HORTALIZAS, RUTA_PRECIOS_MENSUALES, RUTA_CAMOTE_PRECIOS,
+           RUTA_CICLOS, RUTA_PRECIO_GENERAL]
+
+# Una fila por producto del catálogo con todo lo que necesita su vista:
+# índice estacional (12 meses, NaN = sin dato), ciclo por defecto,
+# estadísticas de precio, perfil de precio por mes del año, los últimos
+# precios mensuales y el precio general. Así la vista de un producto lee
+# una sola fila y no recorre los archivos de precios completos.
+
+# ============================================
+# 1. CONSTRUCCIÓN
+# ============================================
+def _por_producto(catalogo, serie):
+    """Reindexa una Serie indexada por producto al orden del catálogo."""
+    return serie.reindex(catalogo).to_numpy()
+
+def _matriz_mensual(df, valor, catalogo):
+    """Pivota (producto, mes, valor) a una lista de 12 valores por producto."""
+    if df.empty:
+        matriz = np.full((len(catalogo), 12), np.nan)
+    else:
+        matriz = (df.pivot_table(index='producto', columns='mes', values=valor, aggfunc='mean', observed=True)
+                    .reindex(index=catalogo, columns=range(1, 13))
+                    .to_numpy(dtype=float))
+    return list(matriz)
+
+def _firma():
+    return firma_fuentes(FUENTES, VERSION_RESUMEN, VERSION_REGLAS, MESES_RECIENTES)
+
+def construir_resumen(ruta=RUTA_RESUMEN):
+    """
+    Calcula el resumen de todos los productos y lo guarda en Parquet con la
+    firma de sus fuentes (en los attrs). Retorna la tabla.
+    """
+    firma = _firma()
+    base, ciclos = crear_base_conocimiento()
+    precios = cargar_precios_mensuales()
+    if not precios.empty:
+        precios = precios.assign(producto=precios['producto'].astype(str))
+
+    catalogo = sorted(set(base['producto']) | set(ciclos['producto'])
+                      | (set(precios['producto']) if not precios.empty else set()))
+
+    resumen = pd.DataFrame({'producto': catalogo})
+    resumen['ciclo_meses'] = _por_producto(catalogo, ciclos.drop_duplicates('producto')
+                                                          .set_index('producto')['ciclo_meses'].astype(float))
+    resumen['indice'] = _matriz_mensual(base, 'indice', catalogo)
+    resumen['tiene_indice'] = resumen['producto'].isin(base['producto'])
+
+    if precios.empty:
+        for col in ('precio_promedio', 'precio_maximo', 'precio_minimo'):
+            resumen[col] = np.nan
+        resumen['meses_con_precio'] = 0
+        resumen['perfil_mensual'] = _matriz_mensual(precios, 'precio_promedio', catalogo)
+        resumen['fechas_recientes'] = [[] for _ in catalogo]
+        resumen['precios_recientes'] = [[] for _ in catalogo]
+        resumen['registros_recientes'] = [[] for _ in catalogo]
+    else:
+        grupos = precios.groupby('producto')['precio_promedio']
+        resumen['precio_promedio'] = _por_producto(catalogo, grupos.mean())
+        resumen['precio_maximo'] = _por_producto(catalogo, grupos.max())
+        resumen['precio_minimo'] = _por_producto(catalogo, grupos.min())
+        resumen['meses_con_precio'] = _por_producto(catalogo, grupos.size()).astype(float)
+        resumen['meses_con_precio'] = resumen['meses_con_precio'].fillna(0).astype(int)
+        resumen['perfil_mensual'] = _matriz_mensual(precios, 'precio_promedio', catalogo)
+
+        # Últimos meses por producto, del más reciente al más antiguo
+        recientes = (precios.sort_values(['producto', 'año', 'mes'], ascending=[True, False, False])
+                            .groupby('producto').head(MESES_RECIENTES))
+        recientes = recientes.assign(
+            fecha=recientes['año'].astype(str) + '-' + recientes['mes'].astype(str).str.zfill(2),
+            num_registros=recientes['num_registros'].astype(int))
+        listas = recientes.groupby('producto').agg(
+            fechas_recientes=('fecha', list),
+            precios_recientes=('precio_promedio', list),
+            registros_recientes=('num_registros', list)).reindex(catalogo)
+        for col in listas.columns:
+            resumen[col] = [v if isinstance(v, list) else [] for v in listas[col]]
+
+    if os.path.exists(RUTA_PRECIO_GENERAL):
+        general = validos(leer_csv(RUTA_PRECIO_GENERAL))
+        general = general.assign(producto=general['producto'].astype(str)).drop_duplicates('producto')
+        resumen['precio_general'] = _por_producto(catalogo, general.set_index('producto')['precio_general'])
+    else:
+        resumen['precio_general'] = np.nan
+
+    resumen.attrs['firma'] = firma
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    resumen.to_parquet(tmp, index=False)
+    os.replace(tmp, ruta)
+    return resumen
+
+# ============================================
+# 2. LECTURA
+# ============================================
+def cargar_resumen(ruta=RUTA_RESUMEN):
+    """
+    Resumen indexado por producto; se reconstruye si no existe o si su firma
+    no coincide con la de las fuentes y las versiones actuales.
+    """
+    resumen = None
+    if os.path.exists(ruta):
+        resumen = pd.read_parquet(ruta)
+        if resumen.attrs.get('firma') != _firma():
+            resumen = None
+    if resumen is None:
+        resumen = construir_resumen(ruta)
+    return resumen.set_index('producto')
+
+if __name__ == "__main__":
+    tabla = construir_resumen()
+    print(f"Resumen de {len(tabla)} productos guardado en {RUTA_RESUMEN}")
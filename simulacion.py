@@ -0,0 +1,236 @@
+import argparse
+import sys
+import time
+import warnings
+import zlib
+import numpy as np
+import pandas as pd
+
+from recomendador import (cargar_precios_mensuales, crear_base_conocimiento, escribir_resultados,
+                          matriz_indices, parsear_ciclos, FORMATOS_SALIDA)
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+SORTEOS = 10_000      # Precios simulados por producto y mes de cosecha
+SEMILLA = 2026        # Misma semilla y mismo producto -> mismos sorteos (sin importar el lote)
+LOTE = 32             # Productos simulados juntos (memoria: LOTE x 12 x SORTEOS float32)
+PESO_INDICE = 10      # Registros equivalentes que vale la media del mes según el índice
+MIN_REGISTROS = 3     # Registros mínimos para usar la dispersión propia de un mes
+CV_DEFECTO = 0.25     # Coeficiente de variación si no hay dispersión en ningún producto
+PERCENTILES = (5, 50, 95)
+
+COLUMNAS_SIMULACION = [
+    'producto', 'ciclo_meses', 'mes_siembra', 'mes_cosecha', 'con_precio',
+    'ingreso_esperado', 'desv_ingreso', 'p5', 'p50', 'p95', 'cvar_5', 'prob_bajo_promedio'
+]
+
+# Modelo: el precio de un producto en el mes m es lognormal con media
+# nivel x índice[m], ajustada hacia el promedio observado del mes cuando
+# hay registros (ponderando num_registros contra PESO_INDICE). La
+# dispersión sale de desv_estandar / precio_promedio: la del mes si tiene
+# al menos MIN_REGISTROS, si no la del producto y si no la del catálogo,
+# inflada por la incertidumbre de la media (1 + 1/n). El nivel es el precio
+# promedio desestacionalizado; los productos sin precios se simulan con
+# nivel 1 (ingreso relativo, con_precio = False).
+#
+# El precio de cosecha depende solo del mes de cosecha, así que se sortea
+# una vez por producto y mes y cada (mes de siembra, ciclo) reutiliza los
+# sorteos de su mes de cosecha.
+
+# ============================================
+# 1. DISTRIBUCIONES POR PRODUCTO Y MES
+# ============================================
+def _sumar(forma, filas, meses, valores):
+    total = np.zeros(forma)
+    np.add.at(total, (filas, meses), valores)
+    return total
+
+def distribuciones(productos, matriz, precios):
+    """
+    Parámetros lognormales por producto y mes a partir de la matriz de
+    índices (productos x 12, NaN = 1.0) y los precios mensuales.
+    Los productos con precios pero sin índice se agregan con índice plano.
+    Retorna un dict con productos, media, sigma (productos x 12), nivel y con_precio.
+    """
+    productos = [str(p) for p in productos]
+    matriz = np.where(np.isnan(matriz), 1.0, np.asarray(matriz, dtype=float)).reshape(-1, 12)
+    precios = precios[pd.to_numeric(precios['precio_promedio'], errors='coerce') > 0] if len(precios) else precios
+    nombres = precios['producto'].astype(str).to_numpy() if len(precios) else np.array([], dtype=object)
+
+    extra = sorted(set(nombres) - set(productos))
+    if extra:
+        productos = productos + extra
+        matriz = np.vstack([matriz, np.ones((len(extra), 12))])
+    forma = (len(productos), 12)
+
+    # Sumas por producto y mes (varios años del mismo mes se combinan)
+    fila = pd.Index(productos).get_indexer(nombres)
+    mes = precios['mes'].to_numpy(dtype=int) - 1 if len(precios) else np.array([], dtype=int)
+    x = precios['precio_promedio'].to_numpy(dtype=float) if len(precios) else np.array([])
+    n = (pd.to_numeric(precios['num_registros'], errors='coerce').fillna(1).clip(lower=1).to_numpy()
+         if len(precios) else np.array([]))
+    s = (pd.to_numeric(precios['desv_estandar'], errors='coerce').fillna(0).to_numpy()
+         if len(precios) else np.array([]))
+    n_mes = _sumar(forma, fila, mes, n)
+    suma = _sumar(forma, fila, mes, n * x)
+    cuadrados = _sumar(forma, fila, mes, (n - 1) * s ** 2 + n * x ** 2)
+
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        media_obs = suma / n_mes
+        varianza = np.maximum(cuadrados - n_mes * media_obs ** 2, 0) / (n_mes - 1)
+        cv_mes = np.where(n_mes >= 2, np.sqrt(varianza) / media_obs, np.nan)
+
+        # Dispersión del producto (meses ponderados por sus grados de libertad) y del catálogo
+        gl = np.where(np.isnan(cv_mes), 0, n_mes - 1)
+        cv_prod = np.sqrt(np.nansum(gl * np.nan_to_num(cv_mes) ** 2, axis=1) / gl.sum(axis=1))
+        cv_catalogo = np.nanmedian(cv_prod) if np.any(~np.isnan(cv_prod)) else CV_DEFECTO
+        cv = np.where(n_mes >= MIN_REGISTROS, cv_mes, np.nan)
+        cv = np.where(np.isnan(cv), cv_prod[:, None], cv)
+        cv = np.where(np.isnan(cv), cv_catalogo, cv)
+
+        # Nivel desestacionalizado y media de cada mes
+        n_total = n_mes.sum(axis=1)
+        nivel = np.nansum(np.nan_to_num(suma / matriz), axis=1) / n_total
+        con_precio = n_total > 0
+        nivel = np.where(con_precio, nivel, 1.0)
+        previa = nivel[:, None] * matriz
+        media = np.where(n_mes > 0, (suma + PESO_INDICE * previa) / (n_mes + PESO_INDICE), previa)
+
+    n_efectivo = np.maximum(n_mes + np.minimum(n_total, PESO_INDICE)[:, None], 1)
+    sigma = np.sqrt(np.log1p(cv ** 2 * (1 + 1 / n_efectivo)))
+    return {
+        'productos': np.array(productos, dtype=object),
+        'media': media,
+        'sigma': sigma,
+        'nivel': nivel,
+        'con_precio': con_precio,
+    }
+
+# ============================================
+# 2. MONTE CARLO POR LOTES
+# ============================================
+def _generador(semilla, producto):
+    """Generador propio de un producto: sus sorteos no dependen del lote ni del orden."""
+    return np.random.default_rng([semilla, zlib.crc32(str(producto).encode('utf-8'))])
+
+def _estadisticas_lote(media, sigma, nivel, sorteos, generadores):
+    """Sortea LOTE x 12 x sorteos precios y resume cada (producto, mes de cosecha)."""
+    z = np.stack([g.standard_normal((12, sorteos), dtype=np.float32) for g in generadores])
+    s = sigma[:, :, None].astype(np.float32)
+    precios = media[:, :, None].astype(np.float32) * np.exp(s * z - 0.5 * s * s)
+
+    k = [int(round(p / 100 * (sorteos - 1))) for p in PERCENTILES]
+    ordenados = np.partition(precios, k, axis=2)
+    resumen = {
+        'ingreso_esperado': precios.mean(axis=2, dtype=np.float64),
+        'desv_ingreso': precios.std(axis=2, dtype=np.float64),
+        'cvar_5': ordenados[:, :, :k[0] + 1].mean(axis=2, dtype=np.float64),
+        'prob_bajo_promedio': (precios < nivel[:, None, None]).mean(axis=2),
+    }
+    for p, kp in zip(PERCENTILES, k):
+        resumen[f'p{p}'] = ordenados[:, :, kp].astype(np.float64)
+    return resumen
+
+def simular(dist, ciclos, sorteos=SORTEOS, semilla=SEMILLA, rendimiento=1.0, lote=LOTE):
+    """
+    Ingreso simulado para cada producto x mes de siembra x ciclo de `ciclos`
+    (convención del recomendador: cosecha = siembra + ciclo - 1).
+    `rendimiento` multiplica el precio (1.0 = ingreso por kg).
+    Retorna un DataFrame con COLUMNAS_SIMULACION.
+    """
+    productos = dist['productos']
+    ciclos = np.asarray(list(ciclos), dtype=np.int64)
+    if len(productos) == 0 or len(ciclos) == 0:
+        return pd.DataFrame(columns=COLUMNAS_SIMULACION)
+
+    # Estadísticas por producto y mes de cosecha, lote por lote
+    stats = {}
+    for desde in range(0, len(productos), lote):
+        hasta = desde + lote
+        generadores = [_generador(semilla, producto) for producto in productos[desde:hasta]]
+        parcial = _estadisticas_lote(dist['media'][desde:hasta], dist['sigma'][desde:hasta],
+                                     dist['nivel'][desde:hasta], sorteos, generadores)
+        for clave, valores in parcial.items():
+            stats.setdefault(clave, []).append(valores)
+    stats = {clave: np.concatenate(partes) for clave, partes in stats.items()}
+
+    # Repartir a cada (producto, ciclo, mes de siembra) según su mes de cosecha
+    n_prod, n_ciclos = len(productos), len(ciclos)
+    fila = np.repeat(np.arange(n_prod), n_ciclos * 12)
+    ciclo = np.tile(np.repeat(ciclos, 12), n_prod)
+    siembra = np.tile(np.arange(12), n_prod * n_ciclos)
+    cosecha = (siembra + ciclo - 1) % 12
+
+    resultado = pd.DataFrame({
+        'producto': productos[fila],
+        'ciclo_meses': ciclo,
+        'mes_siembra': siembra + 1,
+        'mes_cosecha': cosecha + 1,
+        'con_precio': dist['con_precio'][fila],
+    })
+    for clave in COLUMNAS_SIMULACION[5:]:
+        valores = stats[clave][fila, cosecha]
+        resultado[clave] = valores if clave == 'prob_bajo_promedio' else valores * rendimiento
+    return resultado[COLUMNAS_SIMULACION]
+
+def mejores_siembras(resultado, criterio='ingreso_esperado'):
+    """Mejor mes de siembra por producto y ciclo según `criterio` (p. ej. 'p5' para el más prudente)."""
+    if resultado.empty:
+        return resultado
+    mejores = resultado.loc[resultado.groupby(['producto', 'ciclo_meses'], sort=False)[criterio].idxmax()]
+    return mejores.reset_index(drop=True)
+
+# ============================================
+# 3. CATÁLOGO COMPLETO
+# ============================================
+def distribuciones_catalogo(indices_reales=None):
+    """Distribuciones de todos los productos de la base de conocimiento y de los precios mensuales."""
+    base, _ = crear_base_conocimiento(indices_reales)
+    productos, matriz = matriz_indices(base)
+    return distribuciones(productos, matriz, cargar_precios_mensuales())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulación Monte Carlo del ingreso por mes de siembra y ciclo.")
+    parser.add_argument('--ciclos', type=parsear_ciclos, default=list(range(1, 13)),
+                        help="'3-12' o '3,5,8' (por defecto 1-12)")
+    parser.add_argument('--sorteos', type=int, default=SORTEOS)
+    parser.add_argument('--semilla', type=int, default=SEMILLA)
+    parser.add_argument('--productos', default='all', help="'all' o nombres exactos separados por coma")
+    parser.add_argument('--mejores', choices=('ingreso_esperado', 'p5', 'cvar_5'),
+                        help="Solo la mejor siembra por producto y ciclo según este criterio")
+    parser.add_argument('--format', choices=FORMATOS_SALIDA, default='csv')
+    parser.add_argument('--out', help="Archivo de salida (csv/jsonl: stdout si se omite)")
+    args = parser.parse_args(argv)
+
+    if args.format == 'parquet' and not args.out:
+        print("El formato parquet requiere --out.", file=sys.stderr)
+        return 2
+    if args.ciclos is None:
+        print("--ciclos requiere una lista o un rango.", file=sys.stderr)
+        return 2
+
+    inicio = time.perf_counter()
+    dist = distribuciones_catalogo()
+    if args.productos != 'all':
+        pedidos = {p.strip() for p in args.productos.split(',') if p.strip()}
+        filas = np.flatnonzero(np.isin(dist['productos'], list(pedidos)))
+        dist = {clave: valores[filas] for clave, valores in dist.items()}
+    t_datos = time.perf_counter() - inicio
+
+    t0 = time.perf_counter()
+    resultado = simular(dist, args.ciclos, args.sorteos, args.semilla)
+    if args.mejores:
+        resultado = mejores_siembras(resultado, args.mejores)
+    t_simulacion = time.perf_counter() - t0
+
+    escribir_resultados(resultado, args.format, args.out)
+    print(f"{len(dist['productos'])} productos x 12 meses x {len(args.ciclos)} ciclos, "
+          f"{args.sorteos} sorteos | datos: {t_datos:.2f} s | simulación: {t_simulacion:.2f} s",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+from indices_estacionales import IndiceEstacional, cargar_indice_estacional
+from recomendador import (COLUMNAS_RECOMENDACION, RUTA_CAMOTE_PRECIOS, RUTA_CICLOS, RUTA_FRUTAS,
+                          RUTA_HORTALIZAS, RUTA_PRECIOS_MENSUALES, cargar_precios_mensuales,
+                          cargar_tabla_recomendaciones)
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+DIR_TABLAS = 'tablas_compartidas'  # Una subcarpeta por versión de las fuentes
+FUENTES = [RUTA_FRUTAS, RUTA_HORTALIZAS, RUTA_PRECIOS_MENSUALES, RUTA_CAMOTE_PRECIOS, RUTA_CICLOS]
+
+CAMPOS_PRECIO = ['precio_promedio', 'desv_estandar', 'num_registros']
+CAMPOS_RECOMENDACION = COLUMNAS_RECOMENDACION[2:]  # Todo menos producto y ciclo
+CAMPOS_ENTEROS = {'mejor_mes_siembra', 'mes_cosecha_mejor_siembra', 'mejor_mes_venta', 'peor_mes_venta'}
+
+# Las matrices se guardan como .npy sin comprimir y se abren con
+# np.load(mmap_mode='r'): cada proceso mapea el mismo archivo y el sistema
+# operativo comparte las páginas, así N workers usan una sola copia física
+# y arrancan sin leer ni convertir CSV. Los nombres y ejes van en un JSON.
+
+# ============================================
+# 1. TABLAS MAPEADAS EN MEMORIA
+# ============================================
+class TablasCompartidas:
+    """
+    Índice estacional (productos x 12), precios mensuales (productos x
+    periodos x campos) y recomendaciones (productos x ciclos x campos),
+    todos de solo lectura.
+    """
+
+    def __init__(self, carpeta):
+        with open(os.path.join(carpeta, 'manifiesto.json'), encoding='utf-8') as f:
+            m = json.load(f)
+        cargar = lambda nombre: np.load(os.path.join(carpeta, f'{nombre}.npy'), mmap_mode='r')
+
+        self.carpeta = carpeta
+        self.indices = IndiceEstacional(m['estacional']['productos'], m['estacional']['tipos'],
+                                        cargar('estacional'))
+        self.precios_matriz = cargar('precios')
+        self.productos_precio = {p: i for i, p in enumerate(m['precios']['productos'])}
+        self.periodos = [tuple(p) for p in m['precios']['periodos']]  # (año, mes)
+        self.recomendaciones = cargar('recomendaciones')
+        self.productos_recomendacion = {p: i for i, p in enumerate(m['recomendaciones']['productos'])}
+        self.ciclo_minimo = m['recomendaciones']['ciclo_minimo']
+
+    def recomendacion(self, producto, ciclo):
+        """Dict con las columnas de recomendar_todos, o None si no está en la tabla."""
+        i = self.productos_recomendacion.get(producto)
+        j = int(ciclo) - self.ciclo_minimo
+        if i is None or not 0 <= j < self.recomendaciones.shape[1]:
+            return None
+        valores = self.recomendaciones[i, j]
+        if np.isnan(valores[0]):
+            return None
+        fila = {'producto': producto, 'ciclo_meses': int(ciclo)}
+        for campo, valor in zip(CAMPOS_RECOMENDACION, valores.tolist()):
+            fila[campo] = int(valor) if campo in CAMPOS_ENTEROS else valor
+        return fila
+
+    def precios(self, producto):
+        """Precios mensuales del producto con el formato de precios_mensuales_producto.csv."""
+        i = self.productos_precio.get(producto)
+        if i is None:
+            return pd.DataFrame(columns=['producto', 'año', 'mes'] + CAMPOS_PRECIO)
+        valores = np.asarray(self.precios_matriz[i])
+        con_dato = ~np.isnan(valores[:, 2])
+        periodos = np.array(self.periodos, dtype=int).reshape(-1, 2)[con_dato]
+        df = pd.DataFrame(valores[con_dato], columns=CAMPOS_PRECIO)
+        df['num_registros'] = df['num_registros'].astype(int)
+        df.insert(0, 'mes', periodos[:, 1])
+        df.insert(0, 'año', periodos[:, 0])
+        df.insert(0, 'producto', producto)
+        return df
+
+    def precios_varios(self, productos):
+        """precios() de varios productos en una sola tabla, en el orden dado."""
+        partes = [self.precios(p) for p in productos if p in self.productos_precio]
+        if not partes:
+            return self.precios(None)
+        return pd.concat(partes, ignore_index=True)
+
+# ============================================
+# 2. CONSTRUCCIÓN
+# ============================================
+def _matriz_precios(precios):
+    """Pivota los precios mensuales a productos x periodos x campos (NaN = sin dato)."""
+    if precios.empty:
+        return [], [], np.full((0, 0, len(CAMPOS_PRECIO)), np.nan)
+    precios = precios.assign(producto=precios['producto'].astype(str),
+                             periodo=precios['año'] * 12 + precios['mes'] - 1)
+    productos = sorted(precios['producto'].unique())
+    primero, ultimo = int(precios['periodo'].min()), int(precios['periodo'].max())
+    periodos = [(p // 12, p % 12 + 1) for p in range(primero, ultimo + 1)]
+    matriz = np.full((len(productos), len(periodos), len(CAMPOS_PRECIO)), np.nan)
+    filas = pd.Index(productos).get_indexer(precios['producto'])
+    columnas = precios['periodo'].to_numpy() - primero
+    matriz[filas, columnas] = precios[CAMPOS_PRECIO].to_numpy(dtype=float)
+    return productos, periodos, matriz
+
+def _matriz_recomendaciones(tabla):
+    """Pivota la tabla de recomendaciones a productos x ciclos x campos."""
+    productos = sorted(tabla['producto'].astype(str).unique())
+    ciclos = tabla['ciclo_meses'].to_numpy(dtype=int)
+    minimo = int(ciclos.min()) if len(ciclos) else 1
+    n_ciclos = int(ciclos.max()) - minimo + 1 if len(ciclos) else 0
+    matriz = np.full((len(productos), n_ciclos, len(CAMPOS_RECOMENDACION)), np.nan)
+    filas = pd.Index(productos).get_indexer(tabla['producto'].astype(str))
+    matriz[filas, ciclos - minimo] = tabla[CAMPOS_RECOMENDACION].to_numpy(dtype=float)
+    return productos, minimo, matriz
+
+def construir_tablas(carpeta):
+    """Escribe las tres matrices y el manifiesto en `carpeta` (que no debe existir)."""
+    indice = cargar_indice_estacional()
+    productos_precio, periodos, precios = _matriz_precios(cargar_precios_mensuales())
+    productos_rec, ciclo_minimo, recomendaciones = _matriz_recomendaciones(cargar_tabla_recomendaciones())
+
+    tmp = f"{carpeta}.{os.getpid()}.tmp"
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, 'estacional.npy'), indice.matriz)
+    np.save(os.path.join(tmp, 'precios.npy'), precios)
+    np.save(os.path.join(tmp, 'recomendaciones.npy'), recomendaciones)
+    manifiesto = {
+        'estacional': {'productos': indice.productos, 'tipos': indice.tipos},
+        'precios': {'productos': productos_precio, 'periodos': periodos, 'campos': CAMPOS_PRECIO},
+        'recomendaciones': {'productos': productos_rec, 'ciclo_minimo': ciclo_minimo,
+                            'campos': CAMPOS_RECOMENDACION},
+    }
+    with open(os.path.join(tmp, 'manifiesto.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False)
+    try:
+        os.rename(tmp, carpeta)  # Atómico; si otro proceso ganó, se usa su versión
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+# ============================================
+# 3. LECTURA
+# ============================================
+def _version(fuentes):
+    """Nombre de la versión: hash de ruta, mtime y tamaño de las fuentes."""
+    firma = []
+    for ruta in fuentes:
+        if os.path.exists(ruta):
+            st = os.stat(ruta)
+            firma.append(f"{ruta}|{st.st_mtime_ns}|{st.st_size}")
+    return hashlib.md5('\n'.join(firma).encode('utf-8')).hexdigest()[:12]
+
+_memoria = {}
+
+def cargar_tablas(dir_tablas=DIR_TABLAS):
+    """
+    Abre las tablas de la versión actual de las fuentes; si no existen las
+    construye y borra las versiones anteriores. Dentro del proceso quedan
+    en memoria.
+    """
+    version = _version(FUENTES)
+    carpeta = os.path.join(dir_tablas, version)
+    if carpeta in _memoria:
+        return _memoria[carpeta]
+
+    if not os.path.exists(os.path.join(carpeta, 'manifiesto.json')):
+        os.makedirs(dir_tablas, exist_ok=True)
+        construir_tablas(carpeta)
+        # Versiones viejas: los procesos que aún las mapean conservan sus páginas
+        for nombre in os.listdir(dir_tablas):
+            if nombre != version and not nombre.endswith('.tmp'):
+                shutil.rmtree(os.path.join(dir_tablas, nombre), ignore_errors=True)
+
+    tablas = TablasCompartidas(carpeta)
+    _memoria.clear()
+    _memoria[carpeta] = tablas
+    return tablas